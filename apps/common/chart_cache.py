@@ -0,0 +1,88 @@
+# apps/common/chart_cache.py
+import datetime
+import hashlib
+import time
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+DATA_VERSION_KEY = 'chart_data:version'
+
+
+def get_data_version():
+    """
+    返回图表数据的 (版本号, 修改时间戳)，不存在时生成一个新版本
+
+    版本号只保存在缓存中，读取版本号不查询数据库。
+    """
+    version = cache.get(DATA_VERSION_KEY)
+    if version is None:
+        cache.add(DATA_VERSION_KEY, (uuid.uuid4().hex, int(time.time())), None)
+        version = cache.get(DATA_VERSION_KEY)
+    return version
+
+
+def bump_data_version():
+    cache.set(DATA_VERSION_KEY, (uuid.uuid4().hex, int(time.time())), None)
+
+
+def invalidate_chart_cache():
+    """项目、信息价或月度汇总变化后更新图表数据版本号，使缓存的响应和 ETag 失效。在事务提交后执行"""
+    transaction.on_commit(bump_data_version)
+
+
+def _normalized_params(request):
+    """按参数名排序的查询参数，同名参数保持原有顺序"""
+    return '&'.join(
+        f'{key}={value}' for key in sorted(request.GET) for value in request.GET.getlist(key)
+    )
+
+
+def cached_chart_data(view_func):
+    """
+    图表 JSON 接口的条件请求和响应缓存
+
+    ETag 由视图名、规范化的查询参数、当天日期（默认时间范围随日期变化）和数据版本号计算，
+    Last-Modified 为数据版本号的修改时间。浏览器带 If-None-Match / If-Modified-Since
+    重复请求时直接返回 304；否则先查响应缓存，未命中才执行视图。数据版本号更新后旧的
+    ETag 和缓存键都不再使用，无需逐个删除。
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view_func(request, *args, **kwargs)
+
+        version, modified = get_data_version()
+        key = '|'.join([
+            view_func.__module__, view_func.__name__, _normalized_params(request),
+            datetime.date.today().isoformat(), version,
+        ])
+        digest = hashlib.md5(key.encode('utf-8')).hexdigest()
+        etag = quote_etag(digest)
+
+        response = get_conditional_response(request, etag=etag, last_modified=modified)
+        if response is None:
+            cache_key = f'chart_data:response:{digest}'
+            cached = cache.get(cache_key)
+            if cached is not None:
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+            else:
+                response = view_func(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                cache.set(cache_key, (response.content, response['Content-Type']), settings.CHART_CACHE_TIMEOUT)
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(modified)
+        # 登录用户才能访问，浏览器可以保存但每次使用前都要向服务器验证
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    return wrapper
@@ -0,0 +1,18 @@
+# apps/common/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from apps.price.models import ConcretePrice
+from apps.projects.models import Project
+from .chart_cache import invalidate_chart_cache
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+@receiver(post_save, sender=ConcretePrice)
+@receiver(post_delete, sender=ConcretePrice)
+def invalidate_chart_data(sender, raw=False, **kwargs):
+    """项目或信息价增删改后，图表接口的缓存和 ETag 失效"""
+    if raw:
+        return
+    invalidate_chart_cache()
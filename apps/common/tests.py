@@ -1,3 +1,76 @@
+import datetime
+from decimal import Decimal
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+
+from apps.price.models import ConcretePrice
+from apps.projects.models import Project
+from apps.visual.tests import create_chart_data
+
+
+class ChartCacheTests(TestCase):
+    """
+    图表接口带 ETag/Last-Modified，数据未变化时重复请求返回 304 或缓存的响应，不查询业务数据
+    """
+
+    # 会话和用户
+    AUTH_QUERIES = 2
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_chart_data(mappings_per_city=2, months=3)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.url = reverse('price:price_chart_data')
+        self.params = {'cities': 'wuhan,huanggang', 'time_range': 'all'}
+
+    def test_not_modified(self):
+        response = self.client.get(self.url, self.params)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+        with self.assertNumQueries(self.AUTH_QUERIES):
+            response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        with self.assertNumQueries(self.AUTH_QUERIES):
+            response = self.client.get(self.url, self.params, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_cached_response(self):
+        first = self.client.get(reverse('visual:chart_hnt_bar_data'), {'year': '2023'})
+        with self.assertNumQueries(self.AUTH_QUERIES):
+            second = self.client.get(reverse('visual:chart_hnt_bar_data'), {'year': '2023'})
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(first['ETag'], second['ETag'])
+        # 参数顺序不同视为同一请求，参数不同则是另一份缓存
+        self.assertEqual(
+            self.client.get(self.url, {'time_range': 'all', 'cities': 'wuhan,huanggang'})['ETag'],
+            self.client.get(self.url, self.params)['ETag'],
+        )
+        self.assertNotEqual(self.client.get(self.url, {'cities': 'wuhan'})['ETag'], first['ETag'])
+
+    def test_concrete_price_change(self):
+        response = self.client.get(self.url, self.params)
+        with self.captureOnCommitCallbacks(execute=True):
+            price = ConcretePrice.objects.get(date=datetime.date(2023, 1, 1))
+            price.wuhan = Decimal('500')
+            price.save()
+        changed = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+        self.assertNotEqual(changed.json(), response.json())
 
-# Create your tests here.
+    def test_project_bulk_write(self):
+        url = reverse('visual:chart_hnt_bar_data')
+        response = self.client.get(url, {'month': '2023-01'})
+        project = Project.objects.order_by('id').first()
+        with self.captureOnCommitCallbacks(execute=True):
+            Project.objects.filter(pk=project.pk).update(unit_price=Decimal('900'))
+        changed = self.client.get(url, {'month': '2023-01'}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+        self.assertNotEqual(changed.json(), response.json())
@@ -33,6 +33,10 @@ class ConcretePrice(models.Model):
         verbose_name = '混凝土信息价'
         verbose_name_plural = '混凝土信息价'
         ordering = ['-date']
+        indexes = [
+            # 信息价按日期范围过滤并排序
+            models.Index(fields=['date'], name='concrete_price_date_idx'),
+        ]
 
     def __str__(self):
         return f"混凝土信息价 - {self.date}"
@@ -14,6 +14,7 @@ from apps.users.models import User
 from django.contrib.auth.decorators import login_required
 from functools import wraps
 
+from ..common.chart_cache import cached_chart_data
 from ..projects.views import admin_required
 
 
@@ -330,6 +331,7 @@ def price_chart(request):
     return render(request, 'price_chart.html', context)
 
 @login_required
+@cached_chart_data
 def price_chart_data(request):
     """获取图表数据"""
     cities_param = request.GET.get('cities', '')
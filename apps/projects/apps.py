@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class VisualConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.projects'
+
+    def ready(self):
+        # 注册检索文档维护的信号处理函数
+        from . import signals  # noqa: F401
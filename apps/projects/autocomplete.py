@@ -0,0 +1,60 @@
+# apps/projects/autocomplete.py
+from django.core.exceptions import ObjectDoesNotExist
+
+from .models import ProjectMapping, MaterialCategory, Brand
+from ..supplier.models import Supplier
+
+
+def _mapping_text(mapping):
+    """项目名称后附带地区，与原下拉框的显示方式一致"""
+    if mapping.region:
+        return f'{mapping.project_name} ({mapping.region})'
+    return mapping.project_name
+
+
+# 自动补全数据源：名称 -> (查询集, 匹配字段, 显示文本)，匹配字段均有唯一约束或索引
+AUTOCOMPLETE_SOURCES = {
+    'mapping': (lambda: ProjectMapping.objects.select_related('region'), 'project_name', _mapping_text),
+    'supplier': (lambda: Supplier.objects.all(), 'supplier_name', str),
+    'category': (lambda: MaterialCategory.objects.all(), 'category_name', str),
+    'brand': (lambda: Brand.objects.all(), 'brand_name', str),
+}
+
+# 项目表单字段 -> 自动补全数据源
+PROJECT_FORM_SOURCES = {
+    'project_mapping': 'mapping',
+    'supplier': 'supplier',
+    'category': 'category',
+    'brand': 'brand',
+}
+
+
+def search_choices(source, query, limit):
+    """
+    返回与关键字匹配的前 limit 个选项 [{'id': ..., 'text': ...}]
+
+    先按前缀匹配（LIKE '关键字%' 可以使用名称字段的索引，按名称顺序读取），
+    不足 limit 条时再用包含匹配补足，包含匹配同样带 LIMIT，不会读出整张表。
+    """
+    get_queryset, field, text = AUTOCOMPLETE_SOURCES[source]
+    query = query.strip()
+    queryset = get_queryset().order_by(field)
+    matches = list(queryset.filter(**{f'{field}__istartswith': query})[:limit])
+    if query and len(matches) < limit:
+        matches += list(
+            queryset.filter(**{f'{field}__icontains': query})
+            .exclude(**{f'{field}__istartswith': query})[:limit - len(matches)]
+        )
+    return [{'id': obj.pk, 'text': text(obj)} for obj in matches]
+
+
+def selected_choice(source, pk):
+    """按ID读取一个已选中的选项，ID无效时返回 None"""
+    if pk in (None, ''):
+        return None
+    get_queryset, _, text = AUTOCOMPLETE_SOURCES[source]
+    try:
+        obj = get_queryset().get(pk=pk)
+    except (ValueError, TypeError, ObjectDoesNotExist):
+        return None
+    return {'id': obj.pk, 'text': text(obj)}
@@ -0,0 +1,150 @@
+# apps/projects/benchmark.py
+import datetime
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .jobs import enqueue_project_import, process_upload
+from .models import DataUpload
+
+# 与真实导入文件一致的列顺序
+BENCHMARK_COLUMNS = ['项目名称', '到货日期', '供应商', '物资类别', '规格', '数量', '单价（不含税）', '品牌', '下浮率%']
+
+# 各维度名称的默认基数
+DEFAULT_CARDINALITY = {
+    'projects': 200,
+    'suppliers': 50,
+    'categories': 10,
+    'specifications': 100,
+    'brands': 20,
+}
+
+
+def generate_workbook(path, rows, cardinality=None, invalid_ratio=0.0, seed=0):
+    """
+    生成使用真实列标题的合成项目数据工作簿
+
+    cardinality 控制各维度名称的取值个数（见 DEFAULT_CARDINALITY），
+    invalid_ratio 为数量列写入非法值的行比例，用于覆盖错误报告路径。
+    使用 write_only 模式逐行写入，生成10万行时内存占用也保持稳定。
+    """
+    from openpyxl import Workbook
+
+    cardinality = {**DEFAULT_CARDINALITY, **(cardinality or {})}
+    rng = random.Random(seed)
+    start_date = datetime.date(2024, 1, 1)
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet('项目数据')
+    worksheet.append(BENCHMARK_COLUMNS)
+    for _ in range(rows):
+        category = rng.randrange(cardinality['categories'])
+        brand = rng.randrange(cardinality['brands'] + 1)
+        quantity = 'abc' if rng.random() < invalid_ratio else round(rng.uniform(1, 500), 2)
+        worksheet.append([
+            f'基准项目{rng.randrange(cardinality["projects"])}',
+            datetime.datetime.combine(start_date + datetime.timedelta(days=rng.randrange(730)), datetime.time()),
+            f'基准供应商{rng.randrange(cardinality["suppliers"])}',
+            f'基准类别{category}',
+            # 规格名称在类别内唯一
+            f'规格{category}-{rng.randrange(cardinality["specifications"])}',
+            quantity,
+            round(rng.uniform(100, 800), 2),
+            # 约 1/(brands+1) 的行使用"/"表示无品牌
+            f'基准品牌{brand}' if brand else '/',
+            rng.choice([None, 0, 5, 10, 17.4]),
+        ])
+    workbook.save(path)
+    return path
+
+
+class _QueryCounter:
+    """通过 execute_wrapper 统计SQL条数，不保存SQL文本"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _import_once(path, user, keep=False, trace_memory=False):
+    """按后台worker的流程导入一次，返回 (上传记录, 耗时, SQL条数, 峰值内存字节数)"""
+    # 导入任务完成后会删除上传文件，复制一份保留生成的工作簿
+    tmp_fd, tmp_path = tempfile.mkstemp(suffix=os.path.splitext(path)[1])
+    os.close(tmp_fd)
+    shutil.copyfile(path, tmp_path)
+
+    counter = _QueryCounter()
+    peak_memory = None
+    with transaction.atomic():
+        upload = enqueue_project_import(user, tmp_path, os.path.basename(path))
+        upload.transition(DataUpload.STATUS_PROCESSING, started_at=timezone.now())
+
+        if trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(counter):
+                upload = process_upload(upload)
+            seconds = time.perf_counter() - started
+            if trace_memory:
+                peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            if trace_memory:
+                tracemalloc.stop()
+
+        if not keep:
+            transaction.set_rollback(True)
+    return upload, seconds, counter.count, peak_memory
+
+
+def run_import_benchmark(path, user, keep=False, measure_memory=True):
+    """
+    按后台worker的流程导入一个工作簿，返回耗时、行/秒、SQL条数和峰值内存
+
+    每次导入都在外层事务中执行并在结束后回滚，不在数据库中留下基准数据。
+    tracemalloc 会明显拖慢导入，因此耗时和SQL条数来自不跟踪内存的一次导入，
+    峰值内存（tracemalloc 统计的Python分配峰值，包括pandas/numpy缓冲区）来自单独的第二次导入。
+    """
+    upload, seconds, queries, _ = _import_once(path, user, keep=keep and not measure_memory)
+    result = {
+        'status': upload.status,
+        'error_message': upload.error_message if upload.status == DataUpload.STATUS_FAILED else '',
+        'rows_processed': upload.rows_processed,
+        'rows_failed': upload.rows_failed,
+        'seconds': round(seconds, 3),
+        'rows_per_second': round(upload.rows_processed / seconds, 1) if seconds else 0.0,
+        'queries': queries,
+        'peak_memory_mb': None,
+    }
+    if measure_memory and upload.status == DataUpload.STATUS_COMPLETED:
+        _, _, _, peak_memory = _import_once(path, user, keep=keep, trace_memory=True)
+        result['peak_memory_mb'] = round(peak_memory / 1024 / 1024, 2)
+    return result
+
+
+def compare_results(baseline, current):
+    """
+    按行数对比两次基准结果，返回 [(行数, 指标, 基准值, 当前值, 变化百分比)]
+    """
+    baseline_by_rows = {result['rows']: result for result in baseline.get('results', [])}
+    comparison = []
+    for result in current.get('results', []):
+        previous = baseline_by_rows.get(result['rows'])
+        if previous is None:
+            continue
+        for metric in ('rows_per_second', 'queries', 'peak_memory_mb'):
+            before, after = previous.get(metric), result.get(metric)
+            if before is None or after is None:
+                continue
+            change = (after - before) / before * 100 if before else 0.0
+            comparison.append((result['rows'], metric, before, after, change))
+    return comparison
@@ -0,0 +1,68 @@
+# apps/projects/bulk.py
+from django.db import transaction
+
+from .facets import invalidate_project_facets
+from .models import Project
+from .pagination import iter_keyset_values
+from .search import rebuild_search_documents
+
+# 允许批量修改的字段：都不参与数据指纹，修改后不需要重新计算指纹
+BULK_EDIT_FIELDS = {
+    'brand': '品牌',
+    'discount_rate': '下浮率',
+}
+
+
+def _iter_batches(queryset, batch_size):
+    """按 (-arrival_date, -id) 顺序分批读取 (项目ID, 填报用户ID) 列表"""
+    batch = []
+    for row in iter_keyset_values(queryset, ['id', 'user_id'], batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def bulk_update_projects(queryset, changes, batch_size=1000):
+    """
+    批量修改项目字段，每批一条 UPDATE ... WHERE id IN (...) 并在各自的事务中提交
+
+    修改下浮率时 ProjectQuerySet.update 在同一条语句中重新计算合计金额并登记月度汇总刷新；修改品牌时重建检索文档。
+    queryset.update 不触发 post_save 信号，这里负责作废受影响用户的筛选选项缓存。
+    返回修改的项目数。
+    """
+    unknown = set(changes) - set(BULK_EDIT_FIELDS)
+    if unknown:
+        raise ValueError(f'不支持批量修改的字段: {", ".join(sorted(unknown))}')
+
+    count = 0
+    user_ids = set()
+    for batch in _iter_batches(queryset, batch_size):
+        ids = [row[0] for row in batch]
+        with transaction.atomic():
+            count += Project.objects.filter(id__in=ids).update(**changes)
+            if 'brand' in changes:
+                rebuild_search_documents(Project.objects.filter(id__in=ids))
+        user_ids.update(row[1] for row in batch)
+
+    for user_id in user_ids:
+        invalidate_project_facets(user_id)
+    return count
+
+
+def bulk_delete_projects(queryset, batch_size=1000):
+    """
+    批量删除项目，每批在各自的事务中用 QuerySet.delete 删除，返回删除的项目数
+
+    QuerySet.delete 级联删除检索文档并逐行发送 post_delete 信号，
+    由信号登记月度汇总刷新、作废图表缓存和填报用户的筛选选项缓存。
+    """
+    count = 0
+    for batch in _iter_batches(queryset, batch_size):
+        ids = [row[0] for row in batch]
+        with transaction.atomic():
+            _, deleted = Project.objects.filter(id__in=ids).delete()
+            count += deleted.get(Project._meta.label, 0)
+    return count
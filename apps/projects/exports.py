@@ -0,0 +1,132 @@
+# apps/projects/exports.py
+import csv
+import datetime
+import os
+import tempfile
+from decimal import Decimal
+
+from .pagination import iter_keyset_values, keyset_values_page
+
+# 导出列：(列标题, 查询字段)，前九列与导入模板一致，导出文件可以直接重新导入
+EXPORT_COLUMNS = [
+    ('项目名称', 'project_mapping__project_name'),
+    ('到货日期', 'arrival_date'),
+    ('供应商', 'supplier__supplier_name'),
+    ('物资类别', 'category__category_name'),
+    ('规格', 'specification__specification_name'),
+    ('数量', 'quantity'),
+    ('下浮率%', 'discount_rate'),
+    ('单价（不含税）', 'unit_price'),
+    ('品牌', 'brand__brand_name'),
+    ('合计金额', 'total_amount'),
+    ('地区（市）', 'project_mapping__region__city'),
+    ('地区（区/县）', 'project_mapping__region__district'),
+    ('填报用户', 'user__username'),
+]
+
+# xlsx 单个工作表最多 1048576 行（含标题行），超出后写入新的工作表
+XLSX_MAX_ROWS = 1048575
+
+
+def iter_export_rows(queryset, chunk_size=2000):
+    """按 (-arrival_date, -id) 顺序分块读取导出列的值元组，不创建模型实例"""
+    return iter_keyset_values(queryset, [field for _, field in EXPORT_COLUMNS], chunk_size)
+
+
+class _Echo:
+    """csv.writer 的伪文件对象，write 直接返回写入的内容"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(queryset, chunk_size=2000):
+    """
+    逐行生成CSV内容，开头带BOM以便Excel正确识别UTF-8中文
+    """
+    writer = csv.writer(_Echo())
+    yield '\ufeff' + writer.writerow([header for header, _ in EXPORT_COLUMNS])
+    for row in iter_export_rows(queryset, chunk_size):
+        yield writer.writerow(row)
+
+
+def stream_xlsx(queryset, chunk_size=2000, block_size=64 * 1024):
+    """
+    使用 openpyxl write_only 模式生成xlsx并分块读出
+
+    write_only 模式逐行写入临时文件，内存占用与行数无关；xlsx是zip格式，
+    需要全部行写完后才能输出，因此首字节在生成结束后发送。
+    """
+    from openpyxl import Workbook
+
+    headers = [header for header, _ in EXPORT_COLUMNS]
+    tmp_fd, tmp_path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(tmp_fd)
+    try:
+        workbook = Workbook(write_only=True)
+        sheet_number = 1
+        worksheet = workbook.create_sheet('项目数据')
+        worksheet.append(headers)
+        rows_in_sheet = 0
+        for row in iter_export_rows(queryset, chunk_size):
+            if rows_in_sheet >= XLSX_MAX_ROWS:
+                sheet_number += 1
+                worksheet = workbook.create_sheet(f'项目数据{sheet_number}')
+                worksheet.append(headers)
+                rows_in_sheet = 0
+            worksheet.append(row)
+            rows_in_sheet += 1
+        workbook.save(tmp_path)
+
+        with open(tmp_path, 'rb') as f:
+            while True:
+                block = f.read(block_size)
+                if not block:
+                    break
+                yield block
+    finally:
+        os.unlink(tmp_path)
+
+
+# JSON数据接口可选的字段：接口字段名 -> 查询字段
+API_FIELDS = {
+    'id': 'id',
+    'project': 'project_mapping__project_name',
+    'date': 'arrival_date',
+    'supplier': 'supplier__supplier_name',
+    'category': 'category__category_name',
+    'specification': 'specification__specification_name',
+    'quantity': 'quantity',
+    'price': 'unit_price',
+    'discount': 'discount_rate',
+    'total': 'total_amount',
+    'brand': 'brand__brand_name',
+    'city': 'project_mapping__region__city',
+    'district': 'project_mapping__region__district',
+    'user': 'user__username',
+}
+DEFAULT_API_FIELDS = ['id', 'project', 'date', 'supplier', 'category', 'specification', 'quantity', 'price', 'total']
+
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
+
+
+def project_columns(queryset, fields, limit, cursor=None):
+    """
+    按列组织的项目数据：{'fields': [...], 'columns': [[第1列的值...], ...], 'rows': 行数, 'next_cursor': ...}
+
+    只查询请求的字段，数据来自 values_list，不创建模型实例。
+    """
+    rows, next_cursor = keyset_values_page(queryset, [API_FIELDS[name] for name in fields], limit, cursor)
+    columns = [[_json_value(value) for value in column] for column in zip(*rows)] if rows else [[] for _ in fields]
+    return {
+        'fields': fields,
+        'columns': columns,
+        'rows': len(rows),
+        'next_cursor': next_cursor,
+    }
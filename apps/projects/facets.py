@@ -0,0 +1,128 @@
+# apps/projects/facets.py
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import CharField, Count, Value
+from django.db.models.functions import Cast
+
+from .filters import filter_projects
+from .models import Project, ProjectMapping, Specification, MaterialCategory, Brand
+from ..region.models import Region
+from ..supplier.models import Supplier
+from ..users.models import User
+
+FACET_VERSION_KEY = 'project_facets:version'
+USER_FACET_VERSION_KEY = 'project_facets:version:user:{}'
+
+
+def _is_admin(user):
+    return user.is_superuser or user.permission == 'admin'
+
+
+def _get_version(key):
+    """读取版本号，不存在时生成一个新版本"""
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def _bump_version(key):
+    cache.set(key, uuid.uuid4().hex, None)
+
+
+def invalidate_project_facets(user_id=None):
+    """
+    使筛选选项缓存失效：不指定用户时作废全部缓存（维度表变化），
+    指定用户时只作废该用户的缓存（该用户的项目变化）。在事务提交后执行。
+    """
+    key = FACET_VERSION_KEY if user_id is None else USER_FACET_VERSION_KEY.format(user_id)
+    transaction.on_commit(lambda: _bump_version(key))
+
+
+def _facet_cache_key(user):
+    """管理员共用一份缓存，普通用户按用户ID缓存，并带上维度表和用户项目的版本号"""
+    version = _get_version(FACET_VERSION_KEY)
+    if _is_admin(user):
+        return f'project_facets:all:{version}'
+    user_version = _get_version(USER_FACET_VERSION_KEY.format(user.id))
+    return f'project_facets:user:{user.id}:{version}:{user_version}'
+
+
+def _compute_project_facets(user):
+    if _is_admin(user):
+        # 管理员可以看到所有选项
+        facets = {
+            'project_names': list(ProjectMapping.objects.values_list('project_name', flat=True).distinct()),
+            'suppliers': list(Supplier.objects.values_list('supplier_name', flat=True).distinct()),
+            'categories': list(MaterialCategory.objects.values_list('category_name', flat=True).distinct()),
+            'brands': list(Brand.objects.values_list('brand_name', flat=True).distinct()),
+            'regions': list(Region.objects.all()),
+            'users': list(User.objects.values_list('username', flat=True).distinct()),
+        }
+    else:
+        # 普通用户只能看到与自己相关的选项
+        # 清除默认排序，否则到货日期会进入 SELECT DISTINCT 导致选项重复
+        user_projects = Project.objects.filter(user=user).order_by()
+        facets = {
+            'project_names': list(user_projects.values_list('project_mapping__project_name', flat=True).distinct()),
+            'suppliers': list(user_projects.values_list('supplier__supplier_name', flat=True).distinct()),
+            'categories': list(user_projects.values_list('category__category_name', flat=True).distinct()),
+            'brands': list(user_projects.values_list('brand__brand_name', flat=True).distinct()),
+            'regions': list(Region.objects.filter(projectmapping__project__user=user).distinct()),
+            'users': [user.username],  # 普通用户只能看到自己
+        }
+    facets['specifications'] = list(Specification.objects.select_related('category'))
+    return facets
+
+
+def get_project_facets(user):
+    """
+    返回项目列表筛选下拉框的选项，按用户范围缓存
+
+    维度表变化时全局版本号更新，用户的项目变化时该用户的版本号更新，旧缓存自然失效。
+    """
+    key = _facet_cache_key(user)
+    facets = cache.get(key)
+    if facets is None:
+        facets = _compute_project_facets(user)
+        cache.set(key, facets, settings.PROJECT_FACET_CACHE_TIMEOUT)
+    return facets
+
+
+# 显示数量的分面：分面名称 -> (筛选参数名, 分组字段)
+FACET_COUNT_FIELDS = {
+    'supplier': ('supplier', 'supplier__supplier_name'),
+    'brand': ('brand', 'brand__brand_name'),
+    'category': ('category', 'category__category_name'),
+    'region': ('region', 'project_mapping__region_id'),
+}
+
+
+def count_project_facets(request, queryset):
+    """
+    统计当前筛选条件下每个供应商、品牌、物资类别和地区的项目数
+
+    每个分面使用除自身以外的全部筛选条件分组计数，各分面的分组子查询用 UNION ALL
+    合并为一条SQL。返回 {分面名称: {选项值(字符串): 数量}}。
+    """
+    subqueries = []
+    for facet, (param, field) in FACET_COUNT_FIELDS.items():
+        projects, _ = filter_projects(request, queryset, exclude=(param,))
+        subqueries.append(
+            projects.order_by()
+            .annotate(facet=Value(facet, output_field=CharField()),
+                      option=Cast(field, output_field=CharField()))
+            .values('facet', 'option')
+            .annotate(count=Count('id'))
+            .values_list('facet', 'option', 'count')
+        )
+
+    counts = defaultdict(dict)
+    for facet, option, count in subqueries[0].union(*subqueries[1:], all=True):
+        counts[facet][option] = count
+    return dict(counts)
@@ -0,0 +1,101 @@
+# apps/projects/filters.py
+from .models import Project
+from .search import search_projects
+
+
+def visible_projects(user):
+    """
+    权限控制：管理员可以看到所有项目，普通用户只能看到自己填报的项目
+    """
+    if user.is_superuser or user.permission == 'admin':
+        return Project.objects.all()
+    return Project.objects.filter(user=user)
+
+
+def filter_projects(request, projects_list, exclude=()):
+    """
+    按请求中的全局搜索和筛选参数过滤项目查询集，返回 (查询集, 筛选参数字典)
+
+    exclude 中的参数名会被忽略，用于统计分面数量时去掉该分面自身的筛选条件
+    """
+    def param(name):
+        return '' if name in exclude else request.GET.get(name, '')
+
+    # 获取搜索和筛选参数
+    search_query = param('search')
+    project_name_filter = param('project_name')
+    supplier_filter = param('supplier')
+    category_filter = param('category')
+    specification_filter = param('specification')
+    brand_filter = param('brand')
+    region_filter = param('region')
+    user_filter = param('user')
+    start_date = param('start_date')
+    end_date = param('end_date')
+
+    # 应用搜索条件（全局搜索）
+    if search_query:
+        # 使用项目检索文档，MySQL上走FULLTEXT索引
+        projects_list = search_projects(projects_list, search_query)
+
+    # 应用筛选条件
+    if project_name_filter:
+        projects_list = projects_list.filter(
+            project_mapping__project_name=project_name_filter
+        )
+
+    if supplier_filter:
+        projects_list = projects_list.filter(
+            supplier__supplier_name=supplier_filter
+        )
+
+    if category_filter:
+        projects_list = projects_list.filter(
+            category__category_name=category_filter
+        )
+
+    if specification_filter:
+        projects_list = projects_list.filter(
+            specification__id=specification_filter
+        )
+
+    if brand_filter:
+        projects_list = projects_list.filter(
+            brand__brand_name=brand_filter
+        )
+
+    if region_filter:
+        projects_list = projects_list.filter(
+            project_mapping__region__id=region_filter
+        )
+
+    if user_filter:
+        # 管理员可以按用户筛选，普通用户只能看到自己的数据，不需要按用户筛选
+        if request.user.is_superuser or request.user.permission == 'admin':
+            projects_list = projects_list.filter(
+                user__username=user_filter
+            )
+
+    if start_date:
+        projects_list = projects_list.filter(
+            arrival_date__gte=start_date
+        )
+
+    if end_date:
+        projects_list = projects_list.filter(
+            arrival_date__lte=end_date
+        )
+
+    filters = {
+        'search_query': search_query,
+        'project_name_filter': project_name_filter,
+        'supplier_filter': supplier_filter,
+        'category_filter': category_filter,
+        'specification_filter': specification_filter,
+        'brand_filter': brand_filter,
+        'region_filter': region_filter,
+        'user_filter': user_filter,
+        'start_date': start_date,
+        'end_date': end_date,
+    }
+    return projects_list, filters
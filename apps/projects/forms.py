@@ -1,8 +1,8 @@
 # apps/projects/forms.py
 from django import forms
+from .autocomplete import PROJECT_FORM_SOURCES, selected_choice
 from .models import Project, ProjectMapping, MaterialCategory, Specification, Brand
 from ..region.models import Region
-from ..supplier.models import Supplier
 
 
 class ProjectForm(forms.ModelForm):
@@ -19,19 +19,19 @@ class ProjectForm(forms.ModelForm):
             'discount_rate',
             'brand'
         ]
+        # 项目名称、供应商、物资类别和品牌通过自动补全接口按需加载选项，
+        # 表单只保存选中的ID，校验时按提交的ID查询单条记录
         widgets = {
             'arrival_date': forms.DateInput(attrs={'type': 'date'}),
-            'project_mapping': forms.Select(attrs={'class': 'form-control'}),
-            'supplier': forms.Select(attrs={'class': 'form-control'}),
-            'category': forms.Select(attrs={'class': 'form-control'}),
+            'project_mapping': forms.HiddenInput(),
+            'supplier': forms.HiddenInput(),
+            'category': forms.HiddenInput(),
             'specification': forms.Select(attrs={'class': 'form-control'}),
-            'brand': forms.Select(attrs={'class': 'form-control'}),
+            'brand': forms.HiddenInput(),
         }
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # 初始化供应商选项
-        self.fields['supplier'].queryset = Supplier.objects.all()
         # 初始化规格选项为空，通过前端联动加载
         self.fields['specification'].queryset = Specification.objects.none()
 
@@ -50,12 +50,57 @@ class ProjectForm(forms.ModelForm):
                 category_id=self.instance.category_id
             )
 
+    def selected_choices(self):
+        """
+        自动补全字段当前选中的选项 {字段名: {'id': ..., 'text': ...}}，用于回显输入框
+
+        编辑时取项目原有的值，提交失败时取提交的值，只查询选中的记录。
+        """
+        choices = {}
+        for field, source in PROJECT_FORM_SOURCES.items():
+            choices[field] = selected_choice(source, self[field].value())
+        return choices
+
+
+class ProjectBulkForm(forms.Form):
+    """
+    项目列表批量操作表单：批量修改品牌、下浮率，或批量删除
+    """
+    ACTION_CHOICES = [
+        ('brand', '修改品牌'),
+        ('discount_rate', '修改下浮率'),
+        ('delete', '删除'),
+    ]
+    SCOPE_CHOICES = [
+        ('selected', '选中的项目'),
+        ('all', '当前筛选结果的全部项目'),
+    ]
+
+    action = forms.ChoiceField(label='操作', choices=ACTION_CHOICES)
+    scope = forms.ChoiceField(label='范围', choices=SCOPE_CHOICES, initial='selected')
+    brand = forms.ModelChoiceField(label='品牌', queryset=Brand.objects.all(), required=False,
+                                   widget=forms.HiddenInput())
+    discount_rate = forms.DecimalField(label='下浮率', max_digits=15, decimal_places=2, required=False,
+                                       min_value=0, max_value=100)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        action = cleaned_data.get('action')
+        if action == 'brand' and not cleaned_data.get('brand'):
+            self.add_error('brand', '请选择品牌')
+        return cleaned_data
+
+    def changes(self):
+        """要修改的字段和值，下浮率留空表示清除下浮率"""
+        action = self.cleaned_data['action']
+        return {action: self.cleaned_data[action]}
+
 
 class ExcelUploadForm(forms.Form):
     excel_file = forms.FileField(
-        label='选择Excel文件',
-        help_text='请选择包含项目数据的Excel文件',
-        widget=forms.FileInput(attrs={'class': 'form-control'})
+        label='选择数据文件',
+        help_text='请选择包含项目数据的Excel、CSV或Parquet文件',
+        widget=forms.FileInput(attrs={'class': 'form-control', 'accept': '.xlsx,.xls,.csv,.parquet'})
     )
     sheet_name = forms.ChoiceField(
         label='选择工作表',
@@ -64,6 +109,12 @@ class ExcelUploadForm(forms.Form):
         help_text='请选择要导入的工作表（留空则使用第一个工作表）',
         widget=forms.Select(attrs={'class': 'form-control'})
     )
+    reimport = forms.BooleanField(
+        label='重新导入',
+        required=False,
+        help_text='相同文件已导入过时仍然导入，已有项目按数据指纹更新，不会重复',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
 
     def __init__(self, *args, **kwargs):
         sheet_choices = kwargs.pop('sheet_choices', [('', '使用第一个工作表（默认）')])
@@ -0,0 +1,453 @@
+# apps/projects/importers.py
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+import pandas as pd
+from django.db import transaction
+from django.db.models import Max
+
+from .facets import invalidate_project_facets
+from .models import Project, ProjectMapping, Specification, MaterialCategory, Brand
+from .search import rebuild_search_documents
+from ..region.models import Region
+from ..supplier.models import Supplier
+from ..visual.rollups import sync_rollup_regions
+
+# 项目数据Excel必须包含的列
+PROJECT_REQUIRED_COLUMNS = ['项目名称', '到货日期', '供应商', '物资类别', '规格', '数量', '单价（不含税）']
+# 可选列，缺失时使用默认值
+PROJECT_OPTIONAL_COLUMNS = ['下浮率%', '品牌']
+
+# 校验后交给持久化层的列：(目标列, Excel列)
+TEXT_COLUMNS = [
+    ('project_name', '项目名称'),
+    ('supplier_name', '供应商'),
+    ('category_name', '物资类别'),
+    ('specification_name', '规格'),
+]
+
+
+def _strip(series):
+    """统一转换为去除首尾空白的字符串，空字符串视为缺失值"""
+    text = series.astype('string').str.strip()
+    return text.mask(text == '')
+
+
+def _strip_numeric(series):
+    """
+    数值列中的字符串去除空白，空字符串视为缺失值，其他类型保持不变
+
+    xlsx 读出的列为 object（数字和字符串混合）；Parquet 批次和 dtype=str 的CSV分块为 pandas 的字符串类型，
+    pandas 3 中字符串类型不是 object，两种都要处理。
+    """
+    if pd.api.types.is_object_dtype(series):
+        return series.map(lambda value: (value.strip() or None) if isinstance(value, str) else value)
+    if pd.api.types.is_string_dtype(series):
+        text = series.str.strip()
+        return text.mask(text == '')
+    return series
+
+
+def _to_decimal(value):
+    return Decimal(repr(float(value)))
+
+
+def validate_project_frame(frame):
+    """
+    按列校验并转换一个项目数据批次
+
+    使用向量化的空值掩码、to_datetime / to_numeric(errors='coerce') 完成校验，
+    返回 (clean, errors)：clean 为通过校验的行（索引为Excel行号），
+    errors 为 [row, reason] 两列的错误表，每行只记录第一个错误原因。
+    """
+    reasons = pd.Series(pd.NA, index=frame.index, dtype='object')
+
+    def reject(mask, reason):
+        reasons[mask & reasons.isna()] = reason
+
+    text = {target: _strip(frame[column]) for target, column in TEXT_COLUMNS}
+    quantity_raw = _strip_numeric(frame['数量'])
+    unit_price_raw = _strip_numeric(frame['单价（不含税）'])
+    date_raw = frame['到货日期']
+
+    # 验证必要字段不为空
+    missing = date_raw.isna() | quantity_raw.isna() | unit_price_raw.isna()
+    for series in text.values():
+        missing |= series.isna()
+    reject(missing, '必要字段不能为空')
+
+    # 处理日期格式，统一格式解析失败的再按混合格式解析一次
+    arrival_date = pd.to_datetime(date_raw, errors='coerce')
+    retry = arrival_date.isna() & date_raw.notna()
+    if retry.any():
+        arrival_date[retry] = pd.to_datetime(date_raw[retry].astype(str), errors='coerce', format='mixed')
+    reject(arrival_date.isna(), '到货日期格式不正确')
+
+    # 处理数值字段，下浮率为空时默认为0
+    quantity = pd.to_numeric(quantity_raw, errors='coerce')
+    unit_price = pd.to_numeric(unit_price_raw, errors='coerce')
+    if '下浮率%' in frame.columns:
+        discount_raw = _strip_numeric(frame['下浮率%'])
+        discount_rate = pd.to_numeric(discount_raw, errors='coerce')
+        invalid_discount = discount_rate.isna() & discount_raw.notna()
+        discount_rate = discount_rate.fillna(0)
+    else:
+        invalid_discount = pd.Series(False, index=frame.index)
+        discount_rate = pd.Series(0.0, index=frame.index)
+    reject(quantity.isna() | unit_price.isna() | invalid_discount, '数量、单价或下浮率格式不正确')
+
+    # 品牌为空或为"/"时使用默认品牌
+    if '品牌' in frame.columns:
+        brand_name = _strip(frame['品牌'])
+        brand_name = brand_name.mask(brand_name == '/')
+    else:
+        brand_name = pd.Series(pd.NA, index=frame.index, dtype='string')
+
+    valid = reasons.isna()
+    clean = pd.DataFrame({
+        **text,
+        'brand_name': brand_name.astype('object').where(brand_name.notna(), None),
+        'arrival_date': arrival_date,
+        'quantity': quantity.astype(float),
+        'unit_price': unit_price.astype(float),
+        'discount_rate': discount_rate.astype(float),
+    }, index=frame.index)[valid]
+
+    errors = pd.DataFrame({'row': frame.index[~valid], 'reason': reasons[~valid].to_numpy()})
+    return clean, errors
+
+
+class ImportResult:
+    """
+    导入结果：成功条数、错误/提示计数以及导入速度
+
+    逐行的错误和提示写入错误报告（如果提供），内存中只保留前 MAX_MESSAGES 条用于页面提示。
+    """
+    MAX_MESSAGES = 20
+
+    def __init__(self, report=None):
+        self.success_count = 0
+        self.updated_count = 0
+        self.error_count = 0
+        self.warning_count = 0
+        self.error_messages = []
+        self.warning_messages = []
+        self.report = report
+        self.elapsed = 0.0
+
+    def add_errors(self, errors):
+        """记录 (行号, 原因) 形式的导入失败行"""
+        errors = list(errors)
+        self.error_count += len(errors)
+        for row_number, reason in errors[:self.MAX_MESSAGES - len(self.error_messages)]:
+            self.error_messages.append(f"第{row_number}行数据导入失败: {reason}")
+        if self.report is not None:
+            self.report.write((row_number, '错误', reason) for row_number, reason in errors)
+
+    def add_warning(self, row_number, message):
+        """记录已导入但需要提示的行"""
+        self.warning_count += 1
+        if len(self.warning_messages) < self.MAX_MESSAGES:
+            self.warning_messages.append(f'第{row_number}行：{message}')
+        if self.report is not None:
+            self.report.write([(row_number, '提示', message)])
+
+    @property
+    def rows_per_second(self):
+        total = self.success_count + self.error_count
+        if not self.elapsed:
+            return float(total)
+        return total / self.elapsed
+
+    def summary(self):
+        updated = f'（其中 {self.updated_count} 条为已存在记录的更新）' if self.updated_count else ''
+        return (f'成功导入 {self.success_count} 条数据{updated}，'
+                f'耗时 {self.elapsed:.2f} 秒（{self.rows_per_second:.0f} 行/秒）')
+
+
+class ProjectImporter:
+    """
+    项目数据批量导入引擎
+
+    维度表（项目映射、供应商、物资类别、规格、品牌）只在开始时整表加载一次，
+    缺失的名称按批次用 bulk_create 补齐，外键从内存字典解析，
+    项目记录按 batch_size 分块 bulk_create，避免逐行 get_or_create 的大量往返。
+    """
+
+    def __init__(self, user, default_region, default_brand, batch_size=1000, report=None):
+        self.user = user
+        self.default_region = default_region
+        self.default_brand = default_brand
+        self.batch_size = batch_size
+        self.result = ImportResult(report)
+        self._started = None
+        # 本次导入中已匹配过的项目ID，避免同一条记录被多行重复匹配
+        self._matched_ids = set()
+        # 只匹配导入开始前已存在的记录，本次新建的记录不参与匹配
+        self._existing_max_id = Project.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+        self._load_dimensions()
+
+    def _load_dimensions(self):
+        """一次性加载维度表到内存"""
+        self.mappings = {}
+        # 项目名称可能重复，与 get_or_create 不同这里取最早创建的一条
+        for pk, name in ProjectMapping.objects.order_by('-id').values_list('id', 'project_name'):
+            self.mappings[name] = pk
+        self.suppliers = dict(Supplier.objects.values_list('supplier_name', 'id'))
+        self.categories = dict(MaterialCategory.objects.values_list('category_name', 'id'))
+        self.brands = dict(Brand.objects.values_list('brand_name', 'id'))
+        self.specifications = {
+            (category_id, name): pk
+            for pk, category_id, name in Specification.objects.values_list('id', 'category_id', 'specification_name')
+        }
+
+    def run(self, frames):
+        """
+        导入一个或多个DataFrame批次，DataFrame的索引为Excel中的行号
+        """
+        with transaction.atomic():
+            for frame in frames:
+                self.feed(frame)
+        return self.finish()
+
+    def feed(self, frame):
+        """处理一个DataFrame批次"""
+        if self._started is None:
+            self._started = time.perf_counter()
+
+        clean, errors = validate_project_frame(frame)
+        self.result.add_errors(errors.itertuples(index=False))
+
+        rows = clean.to_dict('records')
+        for start in range(0, len(rows), self.batch_size):
+            self._persist(rows[start:start + self.batch_size])
+
+    def finish(self):
+        if self._started is not None:
+            self.result.elapsed = time.perf_counter() - self._started
+        return self.result
+
+    def _ensure(self, model, field_name, cache, names, **defaults):
+        """批量创建缓存中不存在的名称，并把新记录的ID写回缓存"""
+        missing = {name for name in names if name not in cache}
+        if not missing:
+            return
+        model.objects.bulk_create(
+            [model(**{field_name: name}, **defaults) for name in missing],
+            ignore_conflicts=True
+        )
+        # MySQL 的 bulk_create 不回填主键，重新查询新建记录的ID
+        for pk, name in model.objects.filter(**{f'{field_name}__in': missing}).values_list('id', field_name):
+            cache.setdefault(name, pk)
+
+    def _ensure_specifications(self, rows):
+        missing = {
+            (self.categories[row['category_name']], row['specification_name'])
+            for row in rows
+        } - self.specifications.keys()
+        if not missing:
+            return
+        Specification.objects.bulk_create(
+            [Specification(category_id=category_id, specification_name=name) for category_id, name in missing],
+            ignore_conflicts=True
+        )
+        created = Specification.objects.filter(
+            category_id__in={category_id for category_id, _ in missing},
+            specification_name__in={name for _, name in missing}
+        ).values_list('id', 'category_id', 'specification_name')
+        for pk, category_id, name in created:
+            self.specifications.setdefault((category_id, name), pk)
+
+    def _persist(self, rows):
+        """解析外键并批量写入一块项目数据"""
+        if not rows:
+            return
+
+        self._ensure(ProjectMapping, 'project_name', self.mappings,
+                     {row['project_name'] for row in rows}, region=self.default_region)
+        self._ensure(Supplier, 'supplier_name', self.suppliers, {row['supplier_name'] for row in rows})
+        self._ensure(MaterialCategory, 'category_name', self.categories, {row['category_name'] for row in rows})
+        self._ensure(Brand, 'brand_name', self.brands,
+                     {row['brand_name'] for row in rows if row['brand_name']})
+        self._ensure_specifications(rows)
+
+        projects = []
+        for row in rows:
+            quantity = _to_decimal(row['quantity'])
+            unit_price = _to_decimal(row['unit_price'])
+            discount_rate = _to_decimal(row['discount_rate'])
+            category_id = self.categories[row['category_name']]
+            brand_id = self.brands[row['brand_name']] if row['brand_name'] else self.default_brand.id
+            project = Project(
+                project_mapping_id=self.mappings[row['project_name']],
+                arrival_date=row['arrival_date'].date(),
+                supplier_id=self.suppliers[row['supplier_name']],
+                category_id=category_id,
+                specification_id=self.specifications[(category_id, row['specification_name'])],
+                quantity=quantity,
+                unit_price=unit_price,
+                discount_rate=discount_rate,
+                brand_id=brand_id,
+                user=self.user
+            )
+            project.fingerprint = Project.make_fingerprint(
+                project.project_mapping_id, project.arrival_date, project.supplier_id,
+                project.specification_id, quantity, unit_price
+            )
+            projects.append(project)
+
+        to_create, to_update = self._match_existing(projects)
+        if to_update:
+            # 合计金额由 ProjectQuerySet.bulk_update 随下浮率一起重新计算
+            Project.objects.bulk_update(
+                to_update, ['category', 'discount_rate', 'brand'], batch_size=self.batch_size
+            )
+        Project.objects.bulk_create(to_create, batch_size=self.batch_size)
+        # 月度汇总由 ProjectQuerySet 的 bulk_create / bulk_update 登记刷新
+        self._index(to_create, to_update)
+        # bulk 写入不触发信号，可能新建了维度记录，作废全部筛选选项缓存
+        invalidate_project_facets()
+        invalidate_project_facets(self.user.id)
+        self.result.success_count += len(projects)
+        self.result.updated_count += len(to_update)
+
+    def _index(self, created, updated):
+        """bulk_create / bulk_update 不触发信号，在这里重建本块项目的检索文档"""
+        project_ids = {project.id for project in updated}
+        if all(project.pk for project in created):
+            project_ids.update(project.pk for project in created)
+        else:
+            # MySQL 的 bulk_create 不回填主键，按指纹查询本次新建的记录
+            project_ids.update(Project.objects.filter(
+                fingerprint__in={project.fingerprint for project in created},
+                id__gt=self._existing_max_id
+            ).values_list('id', flat=True))
+        if project_ids:
+            rebuild_search_documents(Project.objects.filter(id__in=project_ids), batch_size=self.batch_size)
+
+    def _match_existing(self, projects):
+        """
+        按数据指纹匹配已存在的项目记录，匹配到的更新，其余新建
+
+        同一指纹在库中有几条就最多匹配几行，重复导入同一文件不会产生重复记录，
+        文件内确实重复的行也能保持条数不变。
+        """
+        existing = defaultdict(list)
+        for pk, fingerprint in Project.objects.filter(
+                fingerprint__in={project.fingerprint for project in projects},
+                id__lte=self._existing_max_id
+        ).order_by('id').values_list('id', 'fingerprint'):
+            if pk not in self._matched_ids:
+                existing[fingerprint].append(pk)
+
+        to_create, to_update = [], []
+        for project in projects:
+            candidates = existing.get(project.fingerprint)
+            if candidates:
+                project.id = candidates.pop(0)
+                self._matched_ids.add(project.id)
+                to_update.append(project)
+            else:
+                to_create.append(project)
+        return to_create, to_update
+
+
+# 项目映射Excel必须包含的列
+MAPPING_REQUIRED_COLUMNS = ['项目名称', '地区（区/县）', '地区（市）']
+
+
+class ProjectMappingImporter:
+    """
+    项目映射批量导入
+
+    地区表整表加载为 (市, 区/县) 索引，区县找不到时在内存中回退到市级地区；
+    新项目映射用 bulk_create 创建，地区有变化的已有映射用 bulk_update 更新，
+    查询次数与行数无关。
+    """
+
+    def __init__(self, batch_size=1000, report=None):
+        self.batch_size = batch_size
+        self.result = ImportResult(report)
+        self._started = None
+        self.regions = {
+            (city, district or ''): pk
+            for pk, city, district in Region.objects.values_list('id', 'city', 'district')
+        }
+        self.mappings = {}
+        # 项目名称可能重复，get_or_create 遇到重名会抛出 MultipleObjectsReturned，这里取最早创建的一条
+        for pk, name, region_id in ProjectMapping.objects.order_by('-id').values_list('id', 'project_name', 'region_id'):
+            self.mappings[name] = (pk, region_id)
+        # 本次导入的结果：项目名称 -> 地区ID，同名多行以最后一行为准
+        self.pending = {}
+
+    def run(self, frames):
+        with transaction.atomic():
+            for frame in frames:
+                self.feed(frame)
+            return self.finish()
+
+    def feed(self, frame):
+        """解析一个DataFrame批次中的项目映射，只在内存中记录结果"""
+        if self._started is None:
+            self._started = time.perf_counter()
+
+        project_names = _strip(frame['项目名称'])
+        districts = _strip(frame['地区（区/县）'])
+        cities = _strip(frame['地区（市）'])
+        # 处理非正常地区数据
+        districts = districts.mask(districts == '/')
+        cities = cities.mask(cities == '/')
+
+        errors = []
+        for row_number, project_name, district, city in zip(frame.index, project_names, districts, cities):
+            if pd.isna(project_name):
+                errors.append((row_number, '项目名称不能为空'))
+                continue
+            if pd.isna(city):
+                errors.append((row_number, '地区（市）不能为空'))
+                continue
+            district = '' if pd.isna(district) else district
+
+            # 查找地区，不允许新增地区；区县找不到时尝试市级地区
+            region_id = self.regions.get((city, district))
+            if region_id is None and district:
+                region_id = self.regions.get((city, ''))
+                if region_id is not None:
+                    self.result.add_warning(row_number, f'区县"{district}"未找到，使用市级地区"{city}"')
+            if region_id is None:
+                errors.append((row_number, f'地区"{city}"不存在'))
+                continue
+
+            self.pending[project_name] = region_id
+            self.result.success_count += 1
+
+        self.result.add_errors(errors)
+
+    def finish(self):
+        """批量写入新建和地区有变化的项目映射"""
+        to_create = []
+        to_update = []
+        for project_name, region_id in self.pending.items():
+            existing = self.mappings.get(project_name)
+            if existing is None:
+                to_create.append(ProjectMapping(project_name=project_name, region_id=region_id))
+            elif existing[1] != region_id:
+                to_update.append(ProjectMapping(id=existing[0], project_name=project_name, region_id=region_id))
+
+        ProjectMapping.objects.bulk_create(to_create, batch_size=self.batch_size)
+        ProjectMapping.objects.bulk_update(to_update, ['region'], batch_size=self.batch_size)
+        if to_create or to_update:
+            invalidate_project_facets()
+        if to_update:
+            # 地区变化会影响已有项目的检索文档和月度汇总的地区
+            rebuild_search_documents(
+                Project.objects.filter(project_mapping_id__in=[mapping.id for mapping in to_update]),
+                batch_size=self.batch_size
+            )
+            sync_rollup_regions([mapping.id for mapping in to_update])
+        self.result.updated_count = len(to_update)
+
+        if self._started is not None:
+            self.result.elapsed = time.perf_counter() - self._started
+        return self.result
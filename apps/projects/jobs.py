@@ -0,0 +1,209 @@
+# apps/projects/jobs.py
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .importers import ProjectImporter, PROJECT_REQUIRED_COLUMNS, PROJECT_OPTIONAL_COLUMNS
+from .models import DataUpload, Brand
+from .readers import iter_row_batches, MissingColumnsError
+from .reports import ErrorReport
+from ..region.models import Region
+
+logger = logging.getLogger(__name__)
+
+def save_uploaded_file(uploaded_file, suffix='.xlsx'):
+    """
+    将上传文件逐块写入临时文件，同时计算SHA256，返回 (临时文件路径, 十六进制摘要)
+    """
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        for chunk in uploaded_file.chunks():
+            digest.update(chunk)
+            tmp.write(chunk)
+    return tmp.name, digest.hexdigest()
+
+
+def find_duplicate_upload(file_hash, include_completed=True):
+    """
+    查找内容完全相同、排队中或处理中的上传记录；include_completed 时也查找已完成的记录
+
+    重新导入已完成的文件时传入 include_completed=False：导入按数据指纹更新已有项目，不会产生重复，
+    只需要避免同一文件同时排队多次。
+    """
+    if not file_hash:
+        return None
+    statuses = [DataUpload.STATUS_QUEUED, DataUpload.STATUS_PROCESSING]
+    if include_completed:
+        statuses.append(DataUpload.STATUS_COMPLETED)
+    return DataUpload.objects.filter(file_hash=file_hash, status__in=statuses).order_by('upload_time').first()
+
+
+def enqueue_project_import(user, tmp_path, file_name, sheet_name='', file_hash=''):
+    """
+    将临时文件移动到上传目录并创建排队中的导入任务
+    """
+    upload_dir = settings.IMPORT_UPLOAD_DIR
+    os.makedirs(upload_dir, exist_ok=True)
+    extension = os.path.splitext(file_name)[1].lower() or '.xlsx'
+    file_path = os.path.join(upload_dir, f'{uuid.uuid4().hex}{extension}')
+    shutil.move(tmp_path, file_path)
+
+    return DataUpload.objects.create(
+        user=user,
+        file_path=file_path,
+        file_name=file_name,
+        sheet_name=sheet_name,
+        file_hash=file_hash,
+        status=DataUpload.STATUS_QUEUED
+    )
+
+
+def fail_stale_uploads(timeout=None):
+    """
+    将超过 timeout 秒没有心跳（没有心跳时按开始时间）、仍处于处理中的任务标记为失败，返回处理的任务数
+
+    worker 在导入过程中退出时任务会一直停留在处理中，既不会被再次领取，也会让相同文件无法重新上传。
+    标记失败后可以重新上传同一文件，已导入的批次按数据指纹更新，不会产生重复项目。
+    正在运行的 worker 每处理完一批都会更新心跳，不会被误判为中断。
+    """
+    timeout = settings.IMPORT_STALE_TIMEOUT if timeout is None else timeout
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    count = 0
+    for upload in DataUpload.objects.filter(
+            Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff),
+            status=DataUpload.STATUS_PROCESSING
+    ):
+        # 任务可能恰好在这时完成，状态已变化时不处理
+        if not _fail(upload, '导入任务超时未完成（后台导入进程可能已中断），请重新上传文件'):
+            continue
+        logger.warning('导入任务 %s 超过 %s 秒未完成，标记为失败', upload.id, timeout)
+        if os.path.exists(upload.file_path):
+            os.unlink(upload.file_path)
+        count += 1
+    return count
+
+
+def claim_next_upload():
+    """
+    领取最早排队的导入任务，条件更新保证多个worker不会重复领取
+
+    领取前先把超时未完成的任务标记为失败。
+    """
+    fail_stale_uploads()
+    for upload_id in DataUpload.objects.filter(
+            status=DataUpload.STATUS_QUEUED
+    ).order_by('upload_time').values_list('id', flat=True)[:10]:
+        now = timezone.now()
+        claimed = DataUpload.objects.filter(id=upload_id, status=DataUpload.STATUS_QUEUED).update(
+            status=DataUpload.STATUS_PROCESSING,
+            started_at=now,
+            heartbeat_at=now
+        )
+        if claimed:
+            return DataUpload.objects.get(id=upload_id)
+    return None
+
+
+def _fail(upload, message, **fields):
+    return upload.transition(DataUpload.STATUS_FAILED, error_message=message, finished_at=timezone.now(), **fields)
+
+
+class _UploadAbandoned(Exception):
+    """任务在处理过程中已被标记为失败（超时回收），worker 放弃后续处理"""
+
+
+def _discard_report(report):
+    path = report.close() if report is not None else ''
+    if path:
+        os.unlink(path)
+
+
+def process_upload(upload):
+    """
+    执行一个已领取（processing）的导入任务
+
+    每个批次单独提交事务并更新进度和心跳，进度接口可以在导入过程中读到最新行数。
+    任务已被超时回收（不再是处理中）时停止导入，不覆盖失败状态，已提交的批次在重新导入时按数据指纹更新。
+    """
+    report = None
+    try:
+        # 获取ID为1的默认地区和品牌
+        try:
+            default_region = Region.objects.get(id=1)
+        except Region.DoesNotExist:
+            _fail(upload, '系统中不存在ID为1的地区，请先创建默认地区')
+            return upload
+        try:
+            default_brand = Brand.objects.get(id=1)
+        except Brand.DoesNotExist:
+            _fail(upload, '系统中不存在ID为1的品牌，请先创建默认品牌')
+            return upload
+
+        try:
+            batches = iter_row_batches(
+                upload.file_path,
+                sheet_name=upload.sheet_name or None,
+                filename=upload.file_name or upload.file_path,
+                batch_size=settings.IMPORT_BATCH_SIZE,
+                required_columns=PROJECT_REQUIRED_COLUMNS,
+                optional_columns=PROJECT_OPTIONAL_COLUMNS
+            )
+        except MissingColumnsError as e:
+            _fail(upload, str(e))
+            return upload
+
+        report = ErrorReport()
+        importer = ProjectImporter(upload.user, default_region, default_brand,
+                                   batch_size=settings.IMPORT_BATCH_SIZE, report=report)
+        for frame in batches:
+            with transaction.atomic():
+                importer.feed(frame)
+            alive = DataUpload.objects.filter(id=upload.id, status=DataUpload.STATUS_PROCESSING).update(
+                rows_processed=importer.result.success_count + importer.result.error_count,
+                rows_failed=importer.result.error_count,
+                heartbeat_at=timezone.now()
+            )
+            if not alive:
+                raise _UploadAbandoned()
+        result = importer.finish()
+
+        # 失败行写入错误报告，上传记录中只保留汇总信息
+        error_message = ''
+        if result.error_count:
+            error_message = f'{result.error_count} 行数据导入失败，详情请下载错误报告'
+        error_report = report.close()
+        if not upload.transition(
+            DataUpload.STATUS_COMPLETED,
+            rows_processed=result.success_count + result.error_count,
+            rows_failed=result.error_count,
+            error_message=error_message,
+            error_report=error_report,
+            finished_at=timezone.now()
+        ):
+            raise _UploadAbandoned()
+        logger.info('导入任务 %s 完成：%s', upload.id, result.summary())
+    except _UploadAbandoned:
+        logger.warning('导入任务 %s 已被标记为失败，停止导入', upload.id)
+        _discard_report(report)
+        upload.refresh_from_db()
+    except Exception as e:
+        logger.exception('导入任务 %s 失败', upload.id)
+        if not upload.is_finished:
+            # 已写入的失败行仍然保留在错误报告中；任务已被超时回收时不覆盖原来的失败信息
+            error_report = report.close() if report is not None else ''
+            if not _fail(upload, f'导入过程中发生错误: {str(e)}', error_report=error_report):
+                _discard_report(report)
+        upload.refresh_from_db()
+    finally:
+        if os.path.exists(upload.file_path):
+            os.unlink(upload.file_path)
+    return upload
@@ -0,0 +1,99 @@
+# apps/projects/management/commands/benchmark_import.py
+import json
+import os
+import platform
+import tempfile
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from ...benchmark import DEFAULT_CARDINALITY, generate_workbook, run_import_benchmark, compare_results
+from ....users.models import User
+
+
+class Command(BaseCommand):
+    help = '生成合成工作簿并测量项目数据导入的吞吐量、SQL条数和峰值内存'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help='每个工作簿的数据行数，默认 1000 10000 100000')
+        for name, default in DEFAULT_CARDINALITY.items():
+            parser.add_argument(f'--{name}', type=int, default=default,
+                                help=f'{name} 维度的名称个数，默认{default}')
+        parser.add_argument('--invalid-ratio', type=float, default=0.0,
+                            help='数量列写入非法值的行比例，默认0')
+        parser.add_argument('--seed', type=int, default=0, help='随机数种子，默认0')
+        parser.add_argument('--username', help='导入使用的用户，默认第一个超级用户')
+        parser.add_argument('--output', help='将结果写入JSON文件作为基准')
+        parser.add_argument('--compare', help='与已有的JSON基准对比')
+        parser.add_argument('--skip-memory', action='store_true',
+                            help='不测量峰值内存（测量内存需要额外导入一次）')
+        parser.add_argument('--keep', action='store_true',
+                            help='保留导入的数据（默认回滚）')
+
+    def _get_user(self, username):
+        users = User.objects.all()
+        user = users.filter(username=username).first() if username else \
+            users.filter(is_superuser=True).order_by('id').first()
+        if user is None:
+            raise CommandError('找不到导入使用的用户，请通过 --username 指定')
+        return user
+
+    def handle(self, *args, **options):
+        user = self._get_user(options['username'])
+        cardinality = {name: options[name] for name in DEFAULT_CARDINALITY}
+
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'读取基准文件失败: {e}')
+
+        results = []
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for rows in options['rows']:
+                path = os.path.join(tmp_dir, f'benchmark_{rows}.xlsx')
+                self.stdout.write(f'生成 {rows} 行合成工作簿...')
+                generate_workbook(path, rows, cardinality, options['invalid_ratio'], options['seed'])
+
+                result = {'rows': rows, **run_import_benchmark(
+                    path, user, keep=options['keep'], measure_memory=not options['skip_memory']
+                )}
+                results.append(result)
+                if result['status'] != 'completed':
+                    raise CommandError(f'导入失败: {result["error_message"]}')
+                self.stdout.write(self.style.SUCCESS(
+                    f'{rows} 行：{result["seconds"]} 秒，{result["rows_per_second"]} 行/秒，'
+                    f'{result["queries"]} 条SQL，峰值内存 {result["peak_memory_mb"] or "-"} MB'
+                ))
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'cardinality': cardinality,
+            'invalid_ratio': options['invalid_ratio'],
+            'seed': options['seed'],
+            'results': results,
+        }
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(f'基准结果已写入 {options["output"]}')
+
+        if baseline is not None:
+            if baseline.get('database') != report['database']:
+                self.stdout.write(self.style.WARNING(
+                    f'基准使用的数据库为 {baseline.get("database")}，当前为 {report["database"]}，结果不可直接比较'
+                ))
+            for rows, metric, before, after, change in compare_results(baseline, report):
+                # 吞吐量越高越好，SQL条数和内存越低越好
+                better = change > 0 if metric == 'rows_per_second' else change < 0
+                style = self.style.SUCCESS if better or change == 0 else self.style.WARNING
+                self.stdout.write(style(f'{rows} 行 {metric}: {before} → {after}（{change:+.1f}%）'))
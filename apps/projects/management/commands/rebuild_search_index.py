@@ -0,0 +1,15 @@
+# apps/projects/management/commands/rebuild_search_index.py
+from django.core.management.base import BaseCommand
+
+from ...search import rebuild_search_documents
+
+
+class Command(BaseCommand):
+    help = '重建全部项目的全文检索文档'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='每批处理的项目数，默认1000')
+
+    def handle(self, *args, **options):
+        count = rebuild_search_documents(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'已重建 {count} 个项目的检索文档'))
@@ -0,0 +1,33 @@
+# apps/projects/management/commands/recompute_total_amount.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min
+
+from ...models import Project, total_amount_expression
+
+
+class Command(BaseCommand):
+    help = '按数量、单价和下浮率分批重新计算全部项目的合计金额'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='每条 UPDATE 处理的ID范围，默认5000')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        bounds = Project.objects.aggregate(min_id=Min('id'), max_id=Max('id'))
+        if bounds['min_id'] is None:
+            self.stdout.write('没有项目数据')
+            return
+
+        # 按主键范围分批更新，每批一个短事务，不会长时间锁住整张表；
+        # ProjectQuerySet.update 在每批提交后刷新涉及的月度汇总
+        count = 0
+        start = bounds['min_id']
+        while start <= bounds['max_id']:
+            with transaction.atomic():
+                count += Project.objects.filter(id__gte=start, id__lt=start + batch_size).update(
+                    total_amount=total_amount_expression()
+                )
+            start += batch_size
+        self.stdout.write(self.style.SUCCESS(f'已重新计算 {count} 个项目的合计金额'))
@@ -0,0 +1,42 @@
+# apps/projects/management/commands/run_import_worker.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from ...jobs import claim_next_upload, process_upload
+
+
+class Command(BaseCommand):
+    help = '轮询数据库并执行排队中的项目数据导入任务'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='队列为空时的轮询间隔（秒），默认5秒')
+        parser.add_argument('--once', action='store_true',
+                            help='处理完当前队列后退出')
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        self.stdout.write(f'导入worker已启动，轮询间隔 {interval} 秒')
+        try:
+            while True:
+                close_old_connections()
+                upload = claim_next_upload()
+                if upload is None:
+                    if options['once']:
+                        break
+                    time.sleep(interval)
+                    continue
+
+                self.stdout.write(f'开始处理导入任务 {upload.id}（{upload.file_name}）')
+                upload = process_upload(upload)
+                message = (f'导入任务 {upload.id} {upload.get_status_display()}：'
+                           f'处理 {upload.rows_processed} 行，失败 {upload.rows_failed} 行，'
+                           f'{upload.rows_per_second:.0f} 行/秒')
+                if upload.status == upload.STATUS_COMPLETED:
+                    self.stdout.write(self.style.SUCCESS(message))
+                else:
+                    self.stdout.write(self.style.ERROR(f'{message}，{upload.error_message}'))
+        except KeyboardInterrupt:
+            self.stdout.write('导入worker已停止')
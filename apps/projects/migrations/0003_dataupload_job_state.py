@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0002_project_is_anomaly'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataupload',
+            name='error_message',
+            field=models.TextField(blank=True, verbose_name='错误信息'),
+        ),
+        migrations.AddField(
+            model_name='dataupload',
+            name='file_name',
+            field=models.CharField(blank=True, max_length=255, verbose_name='原始文件名'),
+        ),
+        migrations.AddField(
+            model_name='dataupload',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='结束时间'),
+        ),
+        migrations.AddField(
+            model_name='dataupload',
+            name='rows_failed',
+            field=models.PositiveIntegerField(default=0, verbose_name='失败行数'),
+        ),
+        migrations.AddField(
+            model_name='dataupload',
+            name='rows_processed',
+            field=models.PositiveIntegerField(default=0, verbose_name='已处理行数'),
+        ),
+        migrations.AddField(
+            model_name='dataupload',
+            name='sheet_name',
+            field=models.CharField(blank=True, max_length=100, verbose_name='工作表'),
+        ),
+        migrations.AddField(
+            model_name='dataupload',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='开始时间'),
+        ),
+        migrations.AlterField(
+            model_name='dataupload',
+            name='status',
+            field=models.CharField(choices=[('queued', '排队中'), ('processing', '处理中'), ('completed', '已完成'), ('failed', '失败')], db_index=True, default='queued', max_length=20, verbose_name='状态'),
+        ),
+    ]
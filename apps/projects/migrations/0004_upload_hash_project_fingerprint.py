@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:51
+
+import hashlib
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def fill_fingerprints(apps, schema_editor):
+    """为已有项目数据分批计算数据指纹（与 Project.make_fingerprint 规则一致）"""
+    Project = apps.get_model('projects', 'Project')
+
+    def amount(value):
+        return str(Decimal(str(value)).quantize(Decimal('0.01')))
+
+    last_id = 0
+    while True:
+        rows = list(Project.objects.filter(id__gt=last_id).order_by('id').values_list(
+            'id', 'project_mapping_id', 'arrival_date', 'supplier_id', 'specification_id', 'quantity', 'unit_price'
+        )[:2000])
+        if not rows:
+            break
+        projects = []
+        for pk, mapping_id, arrival_date, supplier_id, specification_id, quantity, unit_price in rows:
+            key = '|'.join([
+                str(mapping_id), str(arrival_date), str(supplier_id), str(specification_id),
+                amount(quantity), amount(unit_price),
+            ])
+            projects.append(Project(id=pk, fingerprint=hashlib.sha1(key.encode('utf-8')).hexdigest()))
+        Project.objects.bulk_update(projects, ['fingerprint'])
+        last_id = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0003_dataupload_job_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataupload',
+            name='file_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64, verbose_name='文件SHA256'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='fingerprint',
+            field=models.CharField(blank=True, db_index=True, max_length=40, verbose_name='数据指纹'),
+        ),
+        migrations.RunPython(fill_fingerprints, migrations.RunPython.noop),
+    ]
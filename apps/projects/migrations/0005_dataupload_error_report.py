@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0004_upload_hash_project_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataupload',
+            name='error_report',
+            field=models.CharField(blank=True, max_length=500, verbose_name='错误报告'),
+        ),
+    ]
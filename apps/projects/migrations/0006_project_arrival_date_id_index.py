@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('brand', '0001_initial'),
+        ('category', '0003_delete_surcharge'),
+        ('projects', '0005_dataupload_error_report'),
+        ('specification', '0001_initial'),
+        ('supplier', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['arrival_date', 'id'], name='project_arrival_date_id_idx'),
+        ),
+    ]
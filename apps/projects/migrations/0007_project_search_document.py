@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+SEARCH_FIELDS = [
+    'project_mapping__project_name',
+    'supplier__supplier_name',
+    'category__category_name',
+    'specification__specification_name',
+    'brand__brand_name',
+    'project_mapping__region__city',
+    'project_mapping__region__district',
+    'user__username',
+]
+
+
+def add_fulltext_index(apps, schema_editor):
+    """MySQL 上为检索内容创建 ngram 全文索引，其他数据库使用 icontains 回退"""
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute(
+        'ALTER TABLE PROJECT_SEARCH ADD FULLTEXT INDEX project_search_content_ft (content) WITH PARSER ngram'
+    )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute('ALTER TABLE PROJECT_SEARCH DROP INDEX project_search_content_ft')
+
+
+def fill_search_documents(apps, schema_editor):
+    """为已有项目分批生成检索文档（与 search.build_search_content 规则一致）"""
+    Project = apps.get_model('projects', 'Project')
+    ProjectSearchDocument = apps.get_model('projects', 'ProjectSearchDocument')
+
+    last_id = 0
+    while True:
+        rows = list(Project.objects.filter(id__gt=last_id).order_by('id').values_list('id', *SEARCH_FIELDS)[:2000])
+        if not rows:
+            break
+        ProjectSearchDocument.objects.bulk_create([
+            ProjectSearchDocument(
+                project_id=row[0],
+                content=' '.join(str(value).strip() for value in row[1:] if value not in (None, ''))
+            )
+            for row in rows
+        ])
+        last_id = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0006_project_arrival_date_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectSearchDocument',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='projects.project', verbose_name='项目')),
+                ('content', models.TextField(blank=True, verbose_name='检索内容')),
+            ],
+            options={
+                'verbose_name': '项目检索文档',
+                'verbose_name_plural': '项目检索文档',
+                'db_table': 'PROJECT_SEARCH',
+            },
+        ),
+        migrations.RunPython(add_fulltext_index, drop_fulltext_index),
+        migrations.RunPython(fill_search_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('brand', '0001_initial'),
+        ('category', '0003_delete_surcharge'),
+        ('projects', '0007_project_search_document'),
+        ('region', '0002_lookup_indexes'),
+        ('specification', '0001_initial'),
+        ('supplier', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['specification', 'arrival_date', 'project_mapping'], name='project_spec_date_mapping_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projectmapping',
+            index=models.Index(fields=['project_name'], name='project_mapping_name_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0008_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataupload',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='最近心跳'),
+        ),
+    ]
@@ -1,7 +1,15 @@
 # apps/projects/models.py
+import hashlib
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import TruncMonth
+from django.db.models.lookups import Exact, IsNull
+from django.utils import timezone
 
 from ..brand.models import Brand
+from ..common.chart_cache import invalidate_chart_cache
 from ..category.models import MaterialCategory
 from ..region.models import Region
 from ..specification.models import Specification
@@ -20,10 +28,141 @@ class ProjectMapping(models.Model):
         db_table = 'PROJECT_MAPPING'
         verbose_name = '项目映射'
         verbose_name_plural = '项目映射'
+        indexes = [
+            # 导入时按名称匹配映射、项目列表按名称筛选
+            models.Index(fields=['project_name'], name='project_mapping_name_idx'),
+        ]
 
     def __str__(self):
         return f"{self.project_name} ({self.region})"
 
+# 合计金额由这些字段计算
+TOTAL_AMOUNT_FIELDS = ('quantity', 'unit_price', 'discount_rate')
+
+
+def total_amount_expression(**values):
+    """
+    合计金额的SQL表达式，规则与 Project.calculate_total_amount 相同：
+    数量或单价为0时为空，下浮率为空或0时为 数量 × 单价，否则为 数量 × 单价 ×（1 - 下浮率%）
+
+    values 是同一条 UPDATE 中这些字段的新值（常量或表达式），未给出的字段取列的当前值。
+    不能用 F() 引用同一语句中被修改的列：MySQL 按顺序赋值，后面的表达式会读到修改后的值，
+    其他数据库读到的是修改前的值。
+    """
+    output_field = models.DecimalField(max_digits=15, decimal_places=2)
+
+    def operand(name):
+        if name not in values:
+            return F(name)
+        value = values[name]
+        if hasattr(value, 'resolve_expression'):
+            return value
+        return Value(value, output_field=output_field)
+
+    quantity, unit_price, discount_rate = (operand(name) for name in TOTAL_AMOUNT_FIELDS)
+    amount = quantity * unit_price
+    return Case(
+        When(Exact(quantity, 0), then=Value(None)),
+        When(Exact(unit_price, 0), then=Value(None)),
+        When(IsNull(discount_rate, True), then=amount),
+        When(Exact(discount_rate, 0), then=amount),
+        # 乘以0.01而不是除以100：SQLite 把整数值的下浮率按整数存储，除法会变成整数除法
+        default=amount * (Value(Decimal(1)) - discount_rate * Value(Decimal('0.01'))),
+        output_field=output_field,
+    )
+
+
+# 月度汇总由这些字段计算，批量写入修改其中任一字段时刷新涉及的汇总行
+ROLLUP_FIELDS = ('project_mapping', 'arrival_date', 'category', 'specification', 'total_amount') + TOTAL_AMOUNT_FIELDS
+# 决定项目所在汇总行 (项目映射, 月份) 的字段
+ROLLUP_KEY_FIELDS = ('project_mapping', 'arrival_date')
+
+
+def _field_names(names):
+    """字段名去掉外键的 _id 后缀"""
+    return {name[:-3] if name.endswith('_id') else name for name in names}
+
+
+def _rollup_keys(queryset):
+    """查询集中的项目所在的 (项目映射ID, 月份)"""
+    return set(queryset.order_by().annotate(
+        rollup_month=TruncMonth('arrival_date')
+    ).values_list('project_mapping_id', 'rollup_month').distinct())
+
+
+def _rollup_keys_by_id(model, ids, batch_size=1000):
+    keys = set()
+    for i in range(0, len(ids), batch_size):
+        keys |= _rollup_keys(model.objects.filter(id__in=ids[i:i + batch_size]))
+    return keys
+
+
+def _schedule_rollup_refresh(keys):
+    # 月度汇总模块引用项目模型，在这里延迟导入
+    from ..visual.rollups import schedule_rollup_refresh
+    if keys:
+        schedule_rollup_refresh(keys)
+
+
+class ProjectQuerySet(models.QuerySet):
+    """
+    项目查询集：bulk_create、bulk_update 和 update 不调用 Project.save，
+    在这里按相同规则维护合计金额，批量写入路径与逐条保存的结果一致；
+    这些写入也不发送 post_save 信号，由这里刷新涉及的月度汇总并使图表接口的缓存失效
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.update_total_amount()
+        invalidate_chart_cache()
+        created = super().bulk_create(objs, *args, **kwargs)
+        _schedule_rollup_refresh({(obj.project_mapping_id, obj.arrival_date) for obj in objs})
+        return created
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        fields = list(fields)
+        objs = list(objs)
+        if set(fields) & set(TOTAL_AMOUNT_FIELDS):
+            for obj in objs:
+                obj.update_total_amount()
+            if 'total_amount' not in fields:
+                fields.append('total_amount')
+        keys = set()
+        changed = _field_names(fields)
+        if changed & set(ROLLUP_FIELDS):
+            keys = {(obj.project_mapping_id, obj.arrival_date) for obj in objs}
+            if changed & set(ROLLUP_KEY_FIELDS):
+                # 项目移到别的汇总行时，原来所在的汇总行也要刷新
+                keys |= _rollup_keys_by_id(self.model, [obj.pk for obj in objs])
+        invalidate_chart_cache()
+        count = super().bulk_update(objs, fields, *args, **kwargs)
+        _schedule_rollup_refresh(keys)
+        return count
+
+    def update(self, **kwargs):
+        changed = {name: kwargs[name] for name in TOTAL_AMOUNT_FIELDS if name in kwargs}
+        if changed and 'total_amount' not in kwargs:
+            kwargs['total_amount'] = total_amount_expression(**changed)
+
+        keys = set()
+        ids = None
+        changed_fields = _field_names(kwargs)
+        if changed_fields & set(ROLLUP_FIELDS):
+            if changed_fields & set(ROLLUP_KEY_FIELDS):
+                # 修改后查询条件可能不再匹配这些项目，按ID读取修改前后所在的汇总行
+                ids = list(self.values_list('id', flat=True))
+                keys = _rollup_keys_by_id(self.model, ids)
+            else:
+                keys = _rollup_keys(self)
+        invalidate_chart_cache()
+        count = super().update(**kwargs)
+        if ids:
+            keys |= _rollup_keys_by_id(self.model, ids)
+        _schedule_rollup_refresh(keys)
+        return count
+
+
 class Project(models.Model):
     """
     项目表
@@ -41,12 +180,22 @@ class Project(models.Model):
     brand = models.ForeignKey(Brand, on_delete=models.CASCADE, verbose_name='品牌')
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='填报用户')
     is_anomaly = models.BooleanField('是否异常', default=False)
+    fingerprint = models.CharField('数据指纹', max_length=40, blank=True, db_index=True)
+
+    objects = ProjectQuerySet.as_manager()
 
     class Meta:
         db_table = 'PROJECT'
         verbose_name = '项目'
         verbose_name_plural = '项目'
         ordering = ['-arrival_date']
+        indexes = [
+            # 项目列表按 (-arrival_date, -id) 键集分页
+            models.Index(fields=['arrival_date', 'id'], name='project_arrival_date_id_idx'),
+            # 可视化图表按规格等值过滤、到货日期范围过滤，再按项目映射（地区）筛选
+            models.Index(fields=['specification', 'arrival_date', 'project_mapping'],
+                         name='project_spec_date_mapping_idx'),
+        ]
 
     def __str__(self):
         if self.project_mapping:
@@ -60,24 +209,108 @@ class Project(models.Model):
             return self.project_mapping.region
         return None
 
+    @staticmethod
+    def make_fingerprint(project_mapping_id, arrival_date, supplier_id, specification_id, quantity, unit_price):
+        """
+        生成数据指纹：项目、到货日期、供应商、规格、数量、单价相同的记录指纹相同，用于重复导入时的匹配
+        """
+        def amount(value):
+            return str(Decimal(str(value)).quantize(Decimal('0.01')))
+
+        key = '|'.join([
+            str(project_mapping_id),
+            str(arrival_date),
+            str(supplier_id),
+            str(specification_id),
+            amount(quantity),
+            amount(unit_price),
+        ])
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def calculate_total_amount(quantity, unit_price, discount_rate=None):
+        """
+        计算合计金额：数量 × 单价 ×（1 - 下浮率%），数量或单价缺失时返回None
+        """
+        if not (quantity and unit_price):
+            return None
+        total_amount = quantity * unit_price
+        # 如果有下浮率，需要调整合计金额
+        if discount_rate:
+            total_amount = total_amount * (1 - discount_rate / 100)
+        return total_amount
+
+    def update_total_amount(self):
+        """按当前的数量、单价和下浮率重新计算合计金额"""
+        self.total_amount = self.calculate_total_amount(self.quantity, self.unit_price, self.discount_rate)
+
     def save(self, *args, **kwargs):
         # 自动计算合计金额
-        if self.quantity and self.unit_price:
-            self.total_amount = self.quantity * self.unit_price
-            # 如果有下浮率，需要调整合计金额
-            if self.discount_rate:
-                self.total_amount = self.total_amount * (1 - self.discount_rate / 100)
+        self.update_total_amount()
+        if self.quantity is not None and self.unit_price is not None and self.arrival_date:
+            self.fingerprint = self.make_fingerprint(
+                self.project_mapping_id, self.arrival_date, self.supplier_id,
+                self.specification_id, self.quantity, self.unit_price
+            )
         super().save(*args, **kwargs)
 
+class ProjectSearchDocument(models.Model):
+    """
+    项目全文检索文档：项目名称、供应商、物资类别、规格、品牌、地区和填报用户拼接成的单列文本
+
+    MySQL 上 content 列有 ngram 解析器的 FULLTEXT 索引，由 search.rebuild_search_documents 维护
+    """
+    project = models.OneToOneField(Project, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='search_document', verbose_name='项目')
+    content = models.TextField('检索内容', blank=True)
+
+    class Meta:
+        db_table = 'PROJECT_SEARCH'
+        verbose_name = '项目检索文档'
+        verbose_name_plural = '项目检索文档'
+
+    def __str__(self):
+        return self.content
+
+
 class DataUpload(models.Model):
     """
-    数据上传记录表
+    数据上传记录表，同时作为后台导入任务的状态机：queued → processing → completed / failed
     """
+    STATUS_QUEUED = 'queued'
+    STATUS_PROCESSING = 'processing'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, '排队中'),
+        (STATUS_PROCESSING, '处理中'),
+        (STATUS_COMPLETED, '已完成'),
+        (STATUS_FAILED, '失败'),
+    ]
+    # 允许的状态流转
+    STATUS_TRANSITIONS = {
+        STATUS_QUEUED: {STATUS_PROCESSING, STATUS_FAILED},
+        STATUS_PROCESSING: {STATUS_COMPLETED, STATUS_FAILED},
+        STATUS_COMPLETED: set(),
+        STATUS_FAILED: set(),
+    }
+
     id = models.AutoField(primary_key=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='用户')
     file_path = models.CharField('文件路径', max_length=500)
+    file_name = models.CharField('原始文件名', max_length=255, blank=True)
+    file_hash = models.CharField('文件SHA256', max_length=64, blank=True, db_index=True)
+    sheet_name = models.CharField('工作表', max_length=100, blank=True)
     upload_time = models.DateTimeField('上传时间', auto_now_add=True)
-    status = models.CharField('状态', max_length=20, default='pending')
+    status = models.CharField('状态', max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED, db_index=True)
+    rows_processed = models.PositiveIntegerField('已处理行数', default=0)
+    rows_failed = models.PositiveIntegerField('失败行数', default=0)
+    started_at = models.DateTimeField('开始时间', null=True, blank=True)
+    # worker 每处理完一批更新一次，超时回收按它判断任务是否仍在运行
+    heartbeat_at = models.DateTimeField('最近心跳', null=True, blank=True)
+    finished_at = models.DateTimeField('结束时间', null=True, blank=True)
+    error_message = models.TextField('错误信息', blank=True)
+    error_report = models.CharField('错误报告', max_length=500, blank=True)
 
     class Meta:
         db_table = 'DATA_UPLOAD'
@@ -87,3 +320,38 @@ class DataUpload(models.Model):
 
     def __str__(self):
         return f"{self.user.username} - {self.upload_time}"
+
+    def transition(self, status, **fields):
+        """
+        按状态机流转并保存，非法流转抛出 ValueError
+
+        保存使用带原状态条件的 UPDATE：数据库中的状态已被其他进程修改（例如超时任务已被标记为失败）时
+        不写入任何字段并返回 False，成功时返回 True
+        """
+        if status not in self.STATUS_TRANSITIONS.get(self.status, set()):
+            raise ValueError(f'上传记录状态不能从 {self.status} 变为 {status}')
+        updated = type(self).objects.filter(pk=self.pk, status=self.status).update(status=status, **fields)
+        if not updated:
+            return False
+        self.status = status
+        for name, value in fields.items():
+            setattr(self, name, value)
+        return True
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_COMPLETED, self.STATUS_FAILED)
+
+    @property
+    def elapsed_seconds(self):
+        if not self.started_at:
+            return 0.0
+        end = self.finished_at or timezone.now()
+        return (end - self.started_at).total_seconds()
+
+    @property
+    def rows_per_second(self):
+        elapsed = self.elapsed_seconds
+        if not elapsed:
+            return 0.0
+        return self.rows_processed / elapsed
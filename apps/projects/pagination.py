@@ -0,0 +1,164 @@
+# apps/projects/pagination.py
+import base64
+import datetime
+import json
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    """游标无法解析"""
+
+
+def encode_cursor(arrival_date, pk, direction):
+    """把 (到货日期, ID, 方向) 编码为URL安全的游标字符串"""
+    payload = json.dumps([arrival_date.isoformat(), pk, direction], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解析游标，返回 (到货日期, ID, 方向)，格式不正确时抛出 InvalidCursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        arrival_date, pk, direction = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if direction not in ('next', 'prev'):
+            raise ValueError(direction)
+        return datetime.date.fromisoformat(arrival_date), int(pk), direction
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise InvalidCursor(str(e))
+
+
+def _seek(queryset, arrival_date, pk):
+    """(-arrival_date, -id) 排序下位于 (arrival_date, pk) 之后的记录"""
+    return queryset.filter(Q(arrival_date__lt=arrival_date) | Q(arrival_date=arrival_date, id__lt=pk))
+
+
+def iter_keyset_values(queryset, fields, chunk_size=2000):
+    """
+    按 (-arrival_date, -id) 顺序分块读取 values_list 元组
+
+    每块是一条带 LIMIT 的独立查询，按上一块最后一行的排序键定位下一块。
+    MySQL 驱动会把整个结果集读入客户端内存，QuerySet.iterator() 不能保证内存恒定，
+    分块定位在各数据库上的内存占用都只与 chunk_size 有关。
+    """
+    rows = queryset.order_by('-arrival_date', '-id').values_list('arrival_date', 'id', *fields)
+    chunk = list(rows[:chunk_size])
+    while chunk:
+        for row in chunk:
+            yield row[2:]
+        if len(chunk) < chunk_size:
+            break
+        arrival_date, pk = chunk[-1][:2]
+        chunk = list(_seek(rows, arrival_date, pk)[:chunk_size])
+
+
+def keyset_values_page(queryset, fields, limit, cursor=None):
+    """
+    读取 cursor 之后的 limit 行 values_list 元组，返回 (行列表, 下一页游标)
+
+    cursor 无效时从第一行开始；没有更多数据时下一页游标为空字符串。
+    """
+    rows = queryset.order_by('-arrival_date', '-id').values_list('arrival_date', 'id', *fields)
+    if cursor:
+        try:
+            arrival_date, pk, _ = decode_cursor(cursor)
+            rows = _seek(rows, arrival_date, pk)
+        except InvalidCursor:
+            pass
+    chunk = list(rows[:limit + 1])
+    next_cursor = ''
+    if len(chunk) > limit:
+        chunk = chunk[:limit]
+        next_cursor = encode_cursor(chunk[-1][0], chunk[-1][1], 'next')
+    return [row[2:] for row in chunk], next_cursor
+
+
+class KeysetPage:
+    """
+    一页键集分页结果，可以像列表一样在模板中遍历
+    """
+
+    def __init__(self, object_list, has_next, has_previous, count=None):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.count = count
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    @property
+    def next_cursor(self):
+        if not (self.has_next and self.object_list):
+            return ''
+        last = self.object_list[-1]
+        return encode_cursor(last.arrival_date, last.pk, 'next')
+
+    @property
+    def previous_cursor(self):
+        if not (self.has_previous and self.object_list):
+            return ''
+        first = self.object_list[0]
+        return encode_cursor(first.arrival_date, first.pk, 'prev')
+
+
+class KeysetPaginator:
+    """
+    按 (-arrival_date, -id) 排序的键集（seek）分页
+
+    每页通过 WHERE (arrival_date, id) < (游标) 定位并只取 per_page + 1 行，
+    不使用 OFFSET，也不执行 COUNT(*)，第N页与第1页的开销相同。
+    游标为上一页首/尾记录的排序键；last=True 时反向排序取最后一页。
+    """
+
+    def __init__(self, queryset, per_page=20):
+        self.queryset = queryset
+        self.per_page = per_page
+
+    def get_page(self, cursor=None, last=False, with_count=False):
+        """
+        返回 KeysetPage；游标无效时返回第一页。with_count=True 时额外统计总条数
+        """
+        key = None
+        if cursor:
+            try:
+                key = decode_cursor(cursor)
+            except InvalidCursor:
+                key = None
+
+        if key is not None:
+            arrival_date, pk, direction = key
+            backwards = direction == 'prev'
+        else:
+            backwards = last
+
+        if backwards:
+            queryset = self.queryset.order_by('arrival_date', 'id')
+            if key is not None:
+                queryset = queryset.filter(
+                    Q(arrival_date__gt=arrival_date) | Q(arrival_date=arrival_date, id__gt=pk)
+                )
+        else:
+            queryset = self.queryset.order_by('-arrival_date', '-id')
+            if key is not None:
+                queryset = _seek(queryset, arrival_date, pk)
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if backwards:
+            rows.reverse()
+            # 反向翻页时，游标之后一定还有数据（游标本身所在的页）
+            has_next, has_previous = key is not None, has_more
+        else:
+            has_next, has_previous = has_more, key is not None
+
+        count = self.queryset.count() if with_count else None
+        return KeysetPage(rows, has_next, has_previous, count)
@@ -0,0 +1,404 @@
+# apps/projects/readers.py
+import codecs
+import csv
+import os
+import posixpath
+import re
+import zipfile
+from itertools import islice
+from xml.etree import ElementTree
+
+import pandas as pd
+
+SPREADSHEET_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+RELATIONSHIP_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PACKAGE_RELATIONSHIP_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+# 支持导入的文件格式（CSV 和 Parquet 没有工作表，sheet_name 参数会被忽略）
+SUPPORTED_EXTENSIONS = ('.xlsx', '.xls', '.csv', '.parquet')
+
+
+class MissingColumnsError(ValueError):
+    """工作表缺少必要的列"""
+
+    def __init__(self, missing_columns):
+        self.missing_columns = missing_columns
+        super().__init__(f'Excel文件缺少必要的列: {", ".join(missing_columns)}')
+
+
+def _is_blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _iter_xlsx_rows(path, sheet_name=None, max_row=None):
+    """使用 openpyxl 只读模式逐行读取 .xlsx 文件，max_row 限制读取的行数"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+        for values in worksheet.iter_rows(max_row=max_row, values_only=True):
+            yield values
+    finally:
+        workbook.close()
+
+
+def _iter_xls_rows(path, sheet_name=None):
+    """使用 xlrd 按需加载模式逐行读取 .xls 文件"""
+    import xlrd
+
+    workbook = xlrd.open_workbook(path, on_demand=True)
+    try:
+        sheet = workbook.sheet_by_name(sheet_name) if sheet_name else workbook.sheet_by_index(0)
+        for index in range(sheet.nrows):
+            values = []
+            for cell in sheet.row(index):
+                if cell.ctype == xlrd.XL_CELL_DATE:
+                    values.append(xlrd.xldate_as_datetime(cell.value, workbook.datemode))
+                elif cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK):
+                    values.append(None)
+                else:
+                    values.append(cell.value)
+            yield tuple(values)
+    finally:
+        workbook.release_resources()
+
+
+def _detect_csv_encoding(path):
+    """ERP导出的CSV可能是UTF-8（含BOM）或GBK，读取文件开头判断编码"""
+    with open(path, 'rb') as f:
+        head = f.read(64 * 1024)
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(head, final=False)
+    except UnicodeDecodeError:
+        return 'gb18030'
+    return 'utf-8-sig'
+
+
+def _iter_csv_rows(path):
+    """使用 csv 模块逐行读取，空单元格转换为None"""
+    with open(path, newline='', encoding=_detect_csv_encoding(path)) as f:
+        for values in csv.reader(f):
+            yield tuple(value if value.strip() else None for value in values)
+
+
+def _open_parquet(path):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError('读取Parquet文件需要安装 pyarrow')
+    return pq.ParquetFile(path)
+
+
+def _iter_parquet_rows(path):
+    """按记录批次读取Parquet文件，第一行为列名"""
+    parquet_file = _open_parquet(path)
+    yield tuple(parquet_file.schema_arrow.names)
+    for record_batch in parquet_file.iter_batches(batch_size=1000):
+        yield from zip(*(column.to_pylist() for column in record_batch.columns))
+
+
+def file_format(filename):
+    """根据文件扩展名返回文件格式：xlsx / xls / csv / parquet，无法识别时按xlsx处理"""
+    extension = os.path.splitext(str(filename))[1].lower()
+    if extension in SUPPORTED_EXTENSIONS:
+        return extension.lstrip('.')
+    return 'xlsx'
+
+
+def iter_sheet_rows(path, sheet_name=None, filename=None):
+    """
+    逐行读取工作表，返回每行的值元组（第一行为标题行）
+    filename 用于判断文件格式，为空时使用 path
+    """
+    fmt = file_format(filename or path)
+    if fmt == 'csv':
+        return _iter_csv_rows(path)
+    if fmt == 'parquet':
+        return _iter_parquet_rows(path)
+    if fmt == 'xls':
+        return _iter_xls_rows(path, sheet_name)
+    return _iter_xlsx_rows(path, sheet_name)
+
+
+def _check_columns(columns, required_columns):
+    missing_columns = [column for column in (required_columns or []) if column not in columns]
+    if missing_columns:
+        raise MissingColumnsError(missing_columns)
+
+
+def _projection(columns, required_columns, optional_columns):
+    """只读取导入需要的列；未指定 required_columns 时读取全部列"""
+    if not required_columns:
+        return None
+    wanted = list(required_columns) + list(optional_columns or [])
+    return [column for column in wanted if column in columns]
+
+
+def _iter_csv_batches(path, batch_size, required_columns, optional_columns):
+    """
+    使用 pandas 分块读取CSV，所有列按字符串读取，由校验层统一转换类型
+    """
+    encoding = _detect_csv_encoding(path)
+    header = pd.read_csv(path, nrows=0, encoding=encoding).columns
+    columns = [str(column).strip() for column in header]
+    _check_columns(columns, required_columns)
+    usecols = _projection(columns, required_columns, optional_columns)
+
+    chunks = pd.read_csv(
+        path,
+        encoding=encoding,
+        dtype=str,
+        chunksize=batch_size,
+        skip_blank_lines=False,
+        usecols=(lambda column: str(column).strip() in usecols) if usecols else None,
+    )
+    return _iter_csv_chunks(chunks)
+
+
+def _iter_csv_chunks(chunks):
+    for chunk in chunks:
+        chunk.columns = [str(column).strip() for column in chunk.columns]
+        # 保留空行计数，使索引与文件中的行号一致（标题行为第1行）
+        chunk.index = chunk.index + 2
+        chunk = chunk.dropna(how='all')
+        if not chunk.empty:
+            yield chunk
+
+
+def _iter_parquet_batches(path, batch_size, required_columns, optional_columns):
+    """
+    按列投影读取Parquet文件，只解码导入需要的列
+    """
+    parquet_file = _open_parquet(path)
+    columns = list(parquet_file.schema_arrow.names)
+    _check_columns(columns, required_columns)
+    projection = _projection(columns, required_columns, optional_columns)
+    return _iter_parquet_frames(parquet_file, projection, batch_size)
+
+
+def _iter_parquet_frames(parquet_file, projection, batch_size):
+    row_number = 2
+    for record_batch in parquet_file.iter_batches(batch_size=batch_size, columns=projection):
+        frame = record_batch.to_pandas()
+        frame.index = pd.RangeIndex(row_number, row_number + len(frame))
+        row_number += len(frame)
+        frame = frame.dropna(how='all')
+        if not frame.empty:
+            yield frame
+
+
+def iter_row_batches(path, sheet_name=None, filename=None, batch_size=1000, required_columns=None,
+                     optional_columns=None):
+    """
+    流式读取工作表，按 batch_size 行生成DataFrame批次
+
+    标题行在调用时立即读取并校验，缺少 required_columns 中的列时抛出 MissingColumnsError。
+    DataFrame 的索引为Excel中的行号（标题行为第1行），空行会被跳过。
+    内存占用只与批次大小有关，与文件大小无关。
+    CSV 使用 pandas 分块读取，Parquet 按列投影读取，
+    两者都只读取 required_columns 和 optional_columns 中存在的列。
+    """
+    fmt = file_format(filename or path)
+    if fmt == 'csv':
+        return _iter_csv_batches(path, batch_size, required_columns, optional_columns)
+    if fmt == 'parquet':
+        return _iter_parquet_batches(path, batch_size, required_columns, optional_columns)
+
+    rows = iter_sheet_rows(path, sheet_name, filename)
+    header = next(rows, None)
+    if header is None:
+        raise ValueError('工作表为空')
+
+    columns = [
+        str(value).strip() if value is not None else f'Unnamed: {position}'
+        for position, value in enumerate(header)
+    ]
+    try:
+        _check_columns(columns, required_columns)
+    except MissingColumnsError:
+        rows.close()
+        raise
+
+    return _iter_batches(rows, columns, batch_size)
+
+
+def _iter_batches(rows, columns, batch_size):
+    width = len(columns)
+    batch = []
+    row_numbers = []
+    for row_number, values in enumerate(rows, start=2):
+        if all(_is_blank(value) for value in values):
+            continue
+        # 行长度与标题对齐
+        values = tuple(values[:width]) + (None,) * (width - len(values))
+        batch.append(values)
+        row_numbers.append(row_number)
+        if len(batch) >= batch_size:
+            yield pd.DataFrame(batch, columns=columns, index=row_numbers)
+            batch = []
+            row_numbers = []
+
+    if batch:
+        yield pd.DataFrame(batch, columns=columns, index=row_numbers)
+
+
+def _column_index(letters):
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index
+
+
+def _parse_dimension(ref):
+    """把 A1:I20001 形式的范围转换为 (行数, 列数)"""
+    cells = re.findall(r'([A-Z]+)(\d+)', (ref or '').upper())
+    if not cells:
+        return None, None
+    (first_col, first_row), (last_col, last_row) = cells[0], cells[-1]
+    rows = int(last_row) - int(first_row) + 1
+    columns = _column_index(last_col) - _column_index(first_col) + 1
+    return rows, columns
+
+
+def _read_relationships(archive, rels_path):
+    """读取 .rels 文件，返回 {关系ID: 目标路径}"""
+    if rels_path not in archive.namelist():
+        return {}
+    root = ElementTree.fromstring(archive.read(rels_path))
+    return {
+        rel.get('Id'): rel.get('Target')
+        for rel in root.iter(f'{{{PACKAGE_RELATIONSHIP_NS}}}Relationship')
+    }
+
+
+def _resolve_target(base_dir, target):
+    if target.startswith('/'):
+        return target.lstrip('/')
+    return posixpath.normpath(posixpath.join(base_dir, target))
+
+
+def _read_sheet_dimension(archive, sheet_path):
+    """只解析工作表XML开头的 <dimension> 元素，遇到 <sheetData> 即停止"""
+    if sheet_path not in archive.namelist():
+        return None
+    with archive.open(sheet_path) as stream:
+        for _, element in ElementTree.iterparse(stream, events=('start',)):
+            if element.tag == f'{{{SPREADSHEET_NS}}}dimension':
+                return element.get('ref')
+            if element.tag == f'{{{SPREADSHEET_NS}}}sheetData':
+                return None
+    return None
+
+
+def _inspect_xlsx(path):
+    with zipfile.ZipFile(path) as archive:
+        # 从包关系中定位 workbook.xml，通常为 xl/workbook.xml
+        workbook_path = 'xl/workbook.xml'
+        for target in _read_relationships(archive, '_rels/.rels').values():
+            if target.lstrip('/').endswith('workbook.xml'):
+                workbook_path = target.lstrip('/')
+                break
+        base_dir = posixpath.dirname(workbook_path)
+        rels_path = posixpath.join(base_dir, '_rels', posixpath.basename(workbook_path) + '.rels')
+        relationships = _read_relationships(archive, rels_path)
+
+        workbook = ElementTree.fromstring(archive.read(workbook_path))
+        sheets = []
+        for sheet in workbook.iter(f'{{{SPREADSHEET_NS}}}sheet'):
+            target = relationships.get(sheet.get(f'{{{RELATIONSHIP_NS}}}id'))
+            ref = _read_sheet_dimension(archive, _resolve_target(base_dir, target)) if target else None
+            rows, columns = _parse_dimension(ref)
+            sheets.append({
+                'name': sheet.get('name'),
+                'dimension': ref,
+                'rows': rows,
+                'columns': columns,
+            })
+        return sheets
+
+
+def _inspect_xls(path):
+    import xlrd
+
+    workbook = xlrd.open_workbook(path, on_demand=True)
+    try:
+        sheets = []
+        for index, name in enumerate(workbook.sheet_names()):
+            sheet = workbook.sheet_by_index(index)
+            sheets.append({
+                'name': name,
+                'dimension': None,
+                'rows': sheet.nrows,
+                'columns': sheet.ncols,
+            })
+            workbook.unload_sheet(index)
+        return sheets
+    finally:
+        workbook.release_resources()
+
+
+def _inspect_csv(path, filename):
+    with open(path, newline='', encoding=_detect_csv_encoding(path)) as f:
+        header = next(csv.reader(f), [])
+    return [{
+        'name': os.path.basename(str(filename or path)),
+        'dimension': None,
+        'rows': None,
+        'columns': len(header),
+    }]
+
+
+def _inspect_parquet(path, filename):
+    metadata = _open_parquet(path).metadata
+    return [{
+        'name': os.path.basename(str(filename or path)),
+        'dimension': None,
+        # 与Excel的尺寸一致，行数包含标题行
+        'rows': metadata.num_rows + 1,
+        'columns': metadata.num_columns,
+    }]
+
+
+def inspect_workbook(path, filename=None):
+    """
+    读取工作表列表及其尺寸，不解析单元格数据
+
+    .xlsx 直接读取压缩包中的 workbook.xml 和各工作表的 <dimension> 元素；
+    CSV 和 Parquet 视为只有一个以文件名命名的工作表，Parquet 的行数来自文件元数据。
+    返回 [{'name', 'dimension', 'rows', 'columns'}]，尺寸未知时为 None。
+    """
+    fmt = file_format(filename or path)
+    if fmt == 'csv':
+        return _inspect_csv(path, filename)
+    if fmt == 'parquet':
+        return _inspect_parquet(path, filename)
+    if fmt == 'xls':
+        return _inspect_xls(path)
+    return _inspect_xlsx(path)
+
+
+def preview_sheet(path, sheet_name=None, filename=None, limit=10):
+    """
+    读取工作表的标题行和前 limit 行数据，返回 (标题列表, 行列表)
+
+    .xlsx 使用 openpyxl 只读模式并只读取前 limit + 1 行；打开工作簿时 openpyxl 仍会解析整个共享字符串表，
+    文本很多的大文件预览耗时主要在这里。
+    """
+    if file_format(filename or path) == 'xlsx':
+        rows = _iter_xlsx_rows(path, sheet_name, max_row=limit + 1)
+    else:
+        rows = iter_sheet_rows(path, sheet_name, filename)
+    try:
+        header = next(rows, None)
+        if header is None:
+            return [], []
+        width = len(header)
+        header = ['' if value is None else str(value).strip() for value in header]
+        data = []
+        for values in islice(rows, limit):
+            values = tuple(values[:width]) + (None,) * (width - len(values))
+            data.append(['' if value is None else str(value) for value in values])
+        return header, data
+    finally:
+        rows.close()
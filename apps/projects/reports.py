@@ -0,0 +1,39 @@
+# apps/projects/reports.py
+import csv
+import os
+import uuid
+
+from django.conf import settings
+
+
+class ErrorReport:
+    """
+    导入错误报告，逐批追加写入CSV文件（UTF-8 BOM，Excel可直接打开）
+    """
+    HEADER = ['行号', '类型', '说明']
+
+    def __init__(self, path=None):
+        if path is None:
+            os.makedirs(settings.IMPORT_REPORT_DIR, exist_ok=True)
+            path = os.path.join(settings.IMPORT_REPORT_DIR, f'{uuid.uuid4().hex}.csv')
+        self.path = str(path)
+        self.row_count = 0
+        self._file = open(self.path, 'w', newline='', encoding='utf-8-sig')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(self.HEADER)
+
+    def write(self, rows):
+        """写入 (行号, 类型, 说明) 形式的多行记录"""
+        rows = list(rows)
+        self._writer.writerows(rows)
+        self.row_count += len(rows)
+
+    def close(self):
+        """关闭文件，没有任何记录时删除文件并返回空字符串，否则返回文件路径"""
+        if not self._file.closed:
+            self._file.close()
+        if not self.row_count:
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            return ''
+        return self.path
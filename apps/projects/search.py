@@ -0,0 +1,86 @@
+# apps/projects/search.py
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Project, ProjectSearchDocument
+
+# 检索文档包含的字段，与原先全局搜索的八个 icontains 条件一致
+SEARCH_FIELDS = [
+    'project_mapping__project_name',
+    'supplier__supplier_name',
+    'category__category_name',
+    'specification__specification_name',
+    'brand__brand_name',
+    'project_mapping__region__city',
+    'project_mapping__region__district',
+    'user__username',
+]
+
+# MySQL ngram 解析器的默认分词长度，短于该长度的关键词无法使用全文索引
+NGRAM_TOKEN_SIZE = 2
+
+
+def build_search_content(values):
+    """把各字段的值用空格拼接为检索文本，ngram 分词不会跨越空格"""
+    return ' '.join(str(value).strip() for value in values if value not in (None, ''))
+
+
+def rebuild_search_documents(projects=None, batch_size=1000):
+    """
+    重建指定项目（默认全部）的检索文档，返回处理的项目数
+
+    按ID分批读取拼接字段后用 bulk_create 的冲突更新写入，已有文档会被覆盖。
+    """
+    if projects is None:
+        projects = Project.objects.all()
+    # MySQL 的 ON DUPLICATE KEY UPDATE 不能指定冲突字段
+    unique_fields = ['project'] if connection.features.supports_update_conflicts_with_target else None
+
+    rows = projects.order_by('id').values_list('id', *SEARCH_FIELDS)
+    count = 0
+    last_id = 0
+    while True:
+        batch = list(rows.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            break
+        ProjectSearchDocument.objects.bulk_create(
+            [ProjectSearchDocument(project_id=row[0], content=build_search_content(row[1:])) for row in batch],
+            update_conflicts=True,
+            unique_fields=unique_fields,
+            update_fields=['content'],
+        )
+        count += len(batch)
+        last_id = batch[-1][0]
+    return count
+
+
+def _fulltext_expression(terms):
+    """BOOLEAN MODE 表达式：每个关键词作为必须出现的短语"""
+    return ' '.join('+"{}"'.format(term.replace('"', '')) for term in terms)
+
+
+def search_projects(queryset, query):
+    """
+    按全局搜索关键词过滤项目查询集
+
+    关键词按空白拆分，每个关键词都必须出现在检索文档中。MySQL 上使用 FULLTEXT ngram 索引，
+    短于 NGRAM_TOKEN_SIZE 的关键词和其他数据库使用检索文档单表的 icontains 过滤，不再联表扫描。
+    """
+    terms = [term for term in query.split() if term.replace('"', '')]
+    if not terms:
+        return queryset
+
+    if connection.vendor == 'mysql':
+        fulltext_terms = [term for term in terms if len(term.replace('"', '')) >= NGRAM_TOKEN_SIZE]
+        terms = [term for term in terms if term not in fulltext_terms]
+        if fulltext_terms:
+            meta = ProjectSearchDocument._meta
+            queryset = queryset.filter(id__in=RawSQL(
+                f'SELECT {meta.pk.column} FROM {meta.db_table} '
+                f'WHERE MATCH (content) AGAINST (%s IN BOOLEAN MODE)',
+                [_fulltext_expression(fulltext_terms)]
+            ))
+
+    for term in terms:
+        queryset = queryset.filter(search_document__content__icontains=term)
+    return queryset
@@ -0,0 +1,73 @@
+# apps/projects/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .facets import invalidate_project_facets
+from .models import Project, ProjectMapping
+from .search import rebuild_search_documents
+from ..brand.models import Brand
+from ..category.models import MaterialCategory
+from ..region.models import Region
+from ..specification.models import Specification
+from ..supplier.models import Supplier
+from ..users.models import User
+
+# 维度表中参与检索的字段，以及从项目到该维度的查询路径
+SEARCH_DIMENSIONS = {
+    ProjectMapping: (('project_name', 'region', 'region_id'), 'project_mapping'),
+    Supplier: (('supplier_name',), 'supplier'),
+    MaterialCategory: (('category_name',), 'category'),
+    Specification: (('specification_name',), 'specification'),
+    Brand: (('brand_name',), 'brand'),
+    Region: (('city', 'district'), 'project_mapping__region'),
+    User: (('username',), 'user'),
+}
+
+
+@receiver(post_save, sender=Project)
+def update_project_search_document(sender, instance, raw=False, **kwargs):
+    """项目保存后重建其检索文档"""
+    if raw:
+        return
+    rebuild_search_documents(Project.objects.filter(id=instance.id))
+
+
+def update_dimension_search_documents(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    """维度名称修改后重建关联项目的检索文档"""
+    if raw or created:
+        return
+    fields, lookup = SEARCH_DIMENSIONS[sender]
+    # 例如用户登录只更新 last_login，不影响检索文档
+    if update_fields is not None and not set(update_fields) & set(fields):
+        return
+    rebuild_search_documents(Project.objects.filter(**{lookup: instance}))
+
+
+for dimension in SEARCH_DIMENSIONS:
+    post_save.connect(update_dimension_search_documents, sender=dimension,
+                      dispatch_uid=f'project_search_{dimension._meta.label_lower}')
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def invalidate_user_facets(sender, instance, raw=False, **kwargs):
+    """项目增删改后作废填报用户的筛选选项缓存"""
+    if raw:
+        return
+    invalidate_project_facets(instance.user_id)
+
+
+def invalidate_dimension_facets(sender, instance, raw=False, update_fields=None, **kwargs):
+    """维度表增删改后作废全部筛选选项缓存"""
+    if raw:
+        return
+    fields, _ = SEARCH_DIMENSIONS[sender]
+    if update_fields is not None and not set(update_fields) & set(fields):
+        return
+    invalidate_project_facets()
+
+
+for dimension in SEARCH_DIMENSIONS:
+    for signal in (post_save, post_delete):
+        signal.connect(invalidate_dimension_facets, sender=dimension,
+                       dispatch_uid=f'project_facets_{signal is post_save}_{dimension._meta.label_lower}')
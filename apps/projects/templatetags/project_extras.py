@@ -0,0 +1,10 @@
+from django import template
+
+register = template.Library()
+
+@register.filter
+def facet_count(counts, option):
+    """获取分面选项的数量，选项值统一按字符串查找"""
+    if counts is None:
+        return None
+    return counts.get(str(option), 0)
@@ -1,3 +1,1377 @@
-from django.test import TestCase
+import codecs
+import csv
+import datetime
+import hashlib
+import io
+import os
+import re
+import tempfile
+import warnings
+import zipfile
+from decimal import Decimal
+from itertools import islice
+from unittest import mock
 
-# Create your tests here.
+import pandas as pd
+from django.db import connection
+from django.db.models import Max, Min
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import urlencode
+
+from apps.brand.models import Brand
+from apps.category.models import MaterialCategory
+from apps.price.models import ConcretePrice
+from apps.region.models import Region
+from apps.specification.models import Specification
+from apps.supplier.models import Supplier
+from apps.users.models import User
+from apps.visual.rollups import rebuild_project_rollups
+from apps.visual.views import _c30_rollups, _price_sums
+from .exports import API_FIELDS, DEFAULT_API_FIELDS, EXPORT_COLUMNS
+from .facets import count_project_facets, get_project_facets
+from .filters import visible_projects
+from .forms import ProjectForm
+from .importers import ProjectImporter, ProjectMappingImporter, PROJECT_OPTIONAL_COLUMNS, PROJECT_REQUIRED_COLUMNS, validate_project_frame
+from .jobs import claim_next_upload, enqueue_project_import, fail_stale_uploads, find_duplicate_upload, process_upload
+from .models import DataUpload, Project, ProjectMapping, ProjectSearchDocument, total_amount_expression
+from .pagination import InvalidCursor, KeysetPaginator, decode_cursor, encode_cursor, keyset_values_page
+from .readers import MissingColumnsError, inspect_workbook, iter_row_batches, preview_sheet
+from .readers import _iter_xlsx_rows
+from .reports import ErrorReport
+from .search import _fulltext_expression, rebuild_search_documents, search_projects
+
+
+def full_scans(queryset):
+    """
+    返回查询计划中被整表扫描的表名
+
+    SQLite 使用 EXPLAIN QUERY PLAN 中的 "SCAN 表名"，MySQL 使用 EXPLAIN 中 type 为 ALL 的行。
+    """
+    if connection.vendor == 'sqlite':
+        return re.findall(r'\bSCAN (\w+)', queryset.explain())
+    if connection.vendor == 'mysql':
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN {sql}', params)
+            columns = [column[0] for column in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return [row['table'] for row in rows if row['type'] == 'ALL']
+    return None
+
+
+def used_indexes(queryset):
+    """
+    返回查询计划中用到的索引名
+
+    SQLite 取 EXPLAIN QUERY PLAN 中的 "USING [COVERING] INDEX 索引名"，MySQL 取 EXPLAIN 的 key 列。
+    """
+    if connection.vendor == 'sqlite':
+        return re.findall(r'\bUSING (?:COVERING )?INDEX (\w+)', queryset.explain())
+    if connection.vendor == 'mysql':
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN {sql}', params)
+            columns = [column[0] for column in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return [row['key'] for row in rows if row['key']]
+    return None
+
+
+class LookupIndexExplainTests(TestCase):
+    """
+    项目列表、导入和可视化接口中的热点查询必须走索引，退化为整表扫描时测试失败
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username='explain', permission='admin')
+        category = MaterialCategory.objects.create(category_name='商品混凝土')
+        specifications = [
+            Specification.objects.create(category=category, specification_name=f'C{grade}')
+            for grade in (20, 25, 30, 35, 40)
+        ]
+        regions = [Region.objects.create(city=city, citypy=citypy) for city, citypy in
+                   (('武汉市', 'wuhan'), ('黄冈市', 'huanggang'), ('襄阳市', 'xiangyang'))]
+        suppliers = [Supplier.objects.create(supplier_name=f'供应商{i}') for i in range(10)]
+        brand = Brand.objects.create(brand_name='/')
+        mappings = [
+            ProjectMapping.objects.create(project_name=f'项目{i}', region=regions[i % len(regions)])
+            for i in range(30)
+        ]
+        Project.objects.bulk_create([
+            Project(
+                project_mapping=mappings[i % len(mappings)],
+                arrival_date=datetime.date(2024, 1, 1) + datetime.timedelta(days=i % 700),
+                supplier=suppliers[i % len(suppliers)],
+                category=category,
+                specification=specifications[i % len(specifications)],
+                quantity=Decimal('10'),
+                unit_price=Decimal('450'),
+                brand=brand,
+                user=user,
+            )
+            for i in range(500)
+        ])
+        rebuild_project_rollups()
+        ConcretePrice.objects.bulk_create([
+            ConcretePrice(date=datetime.date(2024, month, 1), wuhan=Decimal('450')) for month in range(1, 13)
+        ])
+
+    def setUp(self):
+        if connection.vendor not in ('sqlite', 'mysql'):
+            self.skipTest(f'不支持解析 {connection.vendor} 的查询计划')
+        if connection.vendor == 'mysql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE TABLE PROJECT, PROJECT_MAPPING, REGION, CONCRETE_PRICE, PROJECT_MONTHLY_ROLLUP')
+                cursor.fetchall()
+
+    def assertNoFullScan(self, queryset):
+        scans = full_scans(queryset)
+        self.assertEqual(scans, [], f'查询退化为整表扫描: {scans}\n{queryset.explain()}')
+
+    def assertUsesIndex(self, queryset, index_name):
+        self.assertNoFullScan(queryset)
+        indexes = used_indexes(queryset)
+        self.assertIn(index_name, indexes, f'查询未使用索引 {index_name}: {indexes}\n{queryset.explain()}')
+
+    def test_project_mapping_by_name(self):
+        # 导入按名称匹配项目映射，项目列表按项目名称筛选
+        self.assertNoFullScan(ProjectMapping.objects.filter(project_name='项目1'))
+        self.assertNoFullScan(
+            Project.objects.filter(project_mapping__project_name='项目1').order_by('-arrival_date', '-id')[:21]
+        )
+
+    def test_project_list_by_supplier_and_brand(self):
+        self.assertNoFullScan(
+            Project.objects.filter(supplier__supplier_name='供应商1').order_by('-arrival_date', '-id')[:21]
+        )
+        self.assertNoFullScan(Brand.objects.filter(brand_name='/'))
+
+    def test_project_list_keyset_page(self):
+        self.assertNoFullScan(
+            Project.objects.filter(arrival_date__lt=datetime.date(2025, 1, 1)).order_by('-arrival_date', '-id')[:21]
+        )
+
+    def test_region_by_citypy(self):
+        # 可视化接口按城市拼音查找市级地区
+        self.assertNoFullScan(Region.objects.filter(citypy='wuhan', district=''))
+        self.assertNoFullScan(ProjectMapping.objects.filter(region__citypy='wuhan'))
+
+    def test_chart_bar_rollups_by_specification_and_month(self):
+        # chart_hnt_bar_data 按规格和月份范围读取月度汇总，按项目分组
+        rollups = _c30_rollups().filter(month__gte=datetime.date(2024, 1, 1), month__lte=datetime.date(2024, 12, 31))
+        self.assertUsesIndex(
+            rollups.values('project_mapping__project_name', 'region__city', 'citypy').annotate(
+                project_start=Min('month'), project_end=Max('month'), **_price_sums()
+            ).order_by('citypy', 'project_mapping__project_name'),
+            'rollup_spec_month_idx'
+        )
+
+    def test_chart_line_rollups_by_city_specification_and_month(self):
+        # chart_hnt_line_data 的项目价格和地区平均价格
+        rollups = _c30_rollups().filter(
+            citypy='wuhan', month__gte=datetime.date(2024, 1, 1), month__lte=datetime.date(2024, 12, 31)
+        )
+        self.assertUsesIndex(
+            rollups.values('project_mapping__project_name', 'month').annotate(**_price_sums())
+            .order_by('project_mapping__project_name', 'month'),
+            'rollup_city_spec_month_idx'
+        )
+        self.assertUsesIndex(
+            rollups.values('month').annotate(**_price_sums()).order_by('month'), 'rollup_city_spec_month_idx'
+        )
+        # chart_hntdata 按多个城市读取
+        self.assertUsesIndex(
+            _c30_rollups().filter(citypy__in=['wuhan', 'huanggang'], month__gte=datetime.date(2024, 1, 1))
+            .values('project_mapping__project_name', 'month').annotate(**_price_sums())
+            .order_by('project_mapping__project_name', 'month'),
+            'rollup_city_spec_month_idx'
+        )
+
+    def test_concrete_price_by_date(self):
+        self.assertNoFullScan(ConcretePrice.objects.filter(date__gte=datetime.date(2024, 6, 1)).order_by('date'))
+
+
+def project_frame(rows, start=2):
+    """按导入模板的列创建项目数据批次，索引为Excel行号"""
+    columns = PROJECT_REQUIRED_COLUMNS + PROJECT_OPTIONAL_COLUMNS
+    frame = pd.DataFrame([dict(zip(columns, row)) for row in rows], columns=columns, dtype=object)
+    frame.index = range(start, start + len(frame))
+    return frame
+
+
+class ProjectImporterTests(TestCase):
+    """
+    批量导入引擎：维度记录按名称批量补齐，查询次数与行数无关
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='importer')
+        cls.region = Region.objects.create(city='武汉市', citypy='wuhan')
+        cls.brand = Brand.objects.create(brand_name='/')
+        category = MaterialCategory.objects.create(category_name='商品混凝土')
+        Specification.objects.create(category=category, specification_name='C30')
+        Supplier.objects.create(supplier_name='供应商1')
+
+    def run_import(self, rows):
+        importer = ProjectImporter(self.user, self.region, self.brand, batch_size=50)
+        return importer.run([project_frame(rows)])
+
+    def test_import_creates_missing_dimensions(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            result = self.run_import([
+                ['项目1', '2024-01-05', '供应商1', '商品混凝土', 'C30', 10, 450, '', '/'],
+                ['项目1', '2024-01-06', '供应商2', '商品混凝土', 'C35', 5, '460', 10, '品牌1'],
+                ['项目2', '2024-13-01', '供应商1', '商品混凝土', 'C30', 1, 450, None, None],
+            ])
+        self.assertEqual((result.success_count, result.error_count), (2, 1))
+        self.assertEqual(result.error_messages, ['第4行数据导入失败: 到货日期格式不正确'])
+
+        first, second = Project.objects.order_by('arrival_date')
+        self.assertEqual(first.project_mapping.region, self.region)
+        self.assertEqual(first.brand, self.brand)
+        self.assertEqual(first.total_amount, Decimal('4500'))
+        self.assertEqual((second.supplier.supplier_name, second.specification.specification_name,
+                          second.brand.brand_name), ('供应商2', 'C35', '品牌1'))
+        self.assertEqual(second.total_amount, Decimal('2070'))
+        self.assertEqual(second.fingerprint, Project.make_fingerprint(
+            second.project_mapping_id, second.arrival_date, second.supplier_id,
+            second.specification_id, second.quantity, second.unit_price
+        ))
+        self.assertEqual(ProjectMapping.objects.filter(project_name='项目1').count(), 1)
+        self.assertIn('供应商2', second.search_document.content)
+
+    def test_query_count_independent_of_rows(self):
+        def count_queries(prefix, rows):
+            with CaptureQueriesContext(connection) as queries:
+                self.run_import([
+                    [f'{prefix}{i % 3}', f'2024-01-{i % 28 + 1:02d}', f'{prefix}供应商{i % 2}', '商品混凝土', 'C30',
+                     i + 1, 450, '', '/']
+                    for i in range(rows)
+                ])
+            return len(queries)
+
+        self.assertEqual(count_queries('少量', 10), count_queries('大量', 40))
+        self.assertEqual(Project.objects.count(), 50)
+
+
+class IterRowBatchesTests(SimpleTestCase):
+    """
+    工作表按固定行数分批读取：索引为Excel行号，空行跳过，缺少必要列时立即报错
+    """
+
+    def setUp(self):
+        from openpyxl import Workbook
+
+        workbook = Workbook()
+        workbook.active.title = '说明'
+        worksheet = workbook.create_sheet('数据')
+        worksheet.append(['项目名称', '数量', None, '单价（不含税）'])
+        worksheet.append(['项目1', 1, '多余', 450])
+        worksheet.append([])
+        worksheet.append(['项目2', 2])
+        worksheet.append(['项目3', 3, None, 470])
+        worksheet.append([None, '  '])
+        worksheet.append(['项目4', 4, None, 480])
+
+        fd, self.path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+        workbook.save(self.path)
+
+    def test_batches(self):
+        batches = list(iter_row_batches(self.path, sheet_name='数据', batch_size=2,
+                                        required_columns=['项目名称', '数量']))
+        self.assertEqual([list(frame.index) for frame in batches], [[2, 4], [5, 7]])
+        self.assertEqual(list(batches[0].columns), ['项目名称', '数量', 'Unnamed: 2', '单价（不含税）'])
+        # 较短的行补齐到标题的列数
+        self.assertEqual(batches[0].loc[4, '数量'], 2)
+        self.assertTrue(batches[0].loc[4, ['Unnamed: 2', '单价（不含税）']].isna().all())
+        self.assertEqual(batches[1]['项目名称'].tolist(), ['项目3', '项目4'])
+
+    def test_missing_columns_raised_before_reading_rows(self):
+        with self.assertRaises(MissingColumnsError) as context:
+            iter_row_batches(self.path, sheet_name='数据', required_columns=['项目名称', '到货日期', '规格'])
+        self.assertEqual(context.exception.missing_columns, ['到货日期', '规格'])
+
+    def test_empty_sheet(self):
+        with self.assertRaisesMessage(ValueError, '工作表为空'):
+            iter_row_batches(self.path, sheet_name='说明')
+
+
+class CsvParquetBatchesTests(SimpleTestCase):
+    """
+    CSV 和 Parquet 按列投影分批读取，行号与Excel一致（标题行为第1行）
+    """
+
+    def temp_path(self, suffix):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_gbk_csv(self):
+        path = self.temp_path('.csv')
+        with open(path, 'w', encoding='gbk', newline='') as f:
+            f.write('项目名称, 数量 ,备注,品牌\n项目1,005,不需要,品牌1\n\n项目2,6,,\n项目3,7,,\n')
+        batches = list(iter_row_batches(path, filename='数据.csv', batch_size=2,
+                                        required_columns=['项目名称', '数量'], optional_columns=['品牌', '规格']))
+        self.assertEqual([list(frame.index) for frame in batches], [[2], [4, 5]])
+        self.assertEqual(list(batches[0].columns), ['项目名称', '数量', '品牌'])
+        # 所有列按字符串读取，由校验层统一转换
+        self.assertEqual(batches[0].loc[2].tolist(), ['项目1', '005', '品牌1'])
+        self.assertTrue(pd.isna(batches[1].loc[4, '品牌']))
+
+    def test_parquet(self):
+        import pyarrow
+        import pyarrow.parquet
+
+        path = self.temp_path('.parquet')
+        pyarrow.parquet.write_table(pyarrow.table({
+            '项目名称': ['项目1', None, '项目3'],
+            '数量': [5.0, None, 7.5],
+            '备注': ['a', 'b', 'c'],
+        }), path)
+        batches = list(iter_row_batches(path, batch_size=2, required_columns=['项目名称', '数量']))
+        self.assertEqual([list(frame.index) for frame in batches], [[2], [4]])
+        self.assertEqual(list(batches[0].columns), ['项目名称', '数量'])
+        self.assertEqual(batches[1].loc[4].tolist(), ['项目3', 7.5])
+
+        with self.assertRaises(MissingColumnsError):
+            iter_row_batches(path, required_columns=['项目名称', '单价（不含税）'])
+
+
+class ValidateProjectFrameTests(TestCase):
+    """
+    项目数据批次的校验：xlsx 读出的 object 列与 Parquet/CSV 的字符串列结果相同
+    """
+
+    ROWS = {
+        '项目名称': [' 项目1 ', '项目2', '项目3', '项目4'],
+        '到货日期': ['2024-01-05', '2024-02-01', '2024-03-01', '2024-13-01'],
+        '供应商': ['供应商1', '供应商1', '供应商1', '供应商1'],
+        '物资类别': ['商品混凝土'] * 4,
+        '规格': ['C30'] * 4,
+        '数量': [' 5 ', '10', 'abc', '1'],
+        '单价（不含税）': ['450', ' 460.5', '470', '480'],
+        '下浮率%': ['', ' 3 ', None, '2'],
+        '品牌': ['/', '品牌1', '', None],
+    }
+
+    def validate(self, frame):
+        frame.index = range(2, 2 + len(frame))
+        return validate_project_frame(frame)
+
+    def assertValidated(self, clean, errors):
+        self.assertEqual(list(clean.index), [2, 3])
+        self.assertEqual(list(clean['project_name']), ['项目1', '项目2'])
+        self.assertEqual(list(clean['quantity']), [5.0, 10.0])
+        self.assertEqual(list(clean['unit_price']), [450.0, 460.5])
+        self.assertEqual(list(clean['discount_rate']), [0.0, 3.0])
+        self.assertEqual(list(clean['brand_name']), [None, '品牌1'])
+        self.assertEqual(errors.values.tolist(), [
+            [4, '数量、单价或下浮率格式不正确'],
+            [5, '到货日期格式不正确'],
+        ])
+
+    def test_object_columns(self):
+        self.assertValidated(*self.validate(pd.DataFrame(self.ROWS, dtype=object)))
+
+    def test_string_dtype_columns(self):
+        frame = pd.DataFrame(self.ROWS).astype('string')
+        self.assertTrue(pd.api.types.is_string_dtype(frame['下浮率%']))
+        self.assertValidated(*self.validate(frame))
+
+
+def write_xlsx(path, sheets, shared_strings, styles=''):
+    """
+    按 Excel 的方式写出最小的 .xlsx：sheets 为 [(工作表名, sheetData 之前的XML, sheetData 的XML)]，
+    字符串放在共享字符串表中（openpyxl 保存时使用内联字符串）
+    """
+    main = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+    rel = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+    package = 'http://schemas.openxmlformats.org/package/2006/relationships'
+    content = 'application/vnd.openxmlformats-officedocument.spreadsheetml'
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('[Content_Types].xml', (
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            f'<Override PartName="/xl/workbook.xml" ContentType="{content}.sheet.main+xml"/>'
+            f'<Override PartName="/xl/sharedStrings.xml" ContentType="{content}.sharedStrings+xml"/>'
+            f'<Override PartName="/xl/styles.xml" ContentType="{content}.styles+xml"/>'
+            + ''.join(f'<Override PartName="/xl/worksheets/sheet{index}.xml" ContentType="{content}.worksheet+xml"/>'
+                      for index in range(1, len(sheets) + 1))
+            + '</Types>'
+        ))
+        archive.writestr('_rels/.rels', (
+            f'<Relationships xmlns="{package}"><Relationship Id="rId1" Target="xl/workbook.xml" '
+            f'Type="{rel}/officeDocument"/></Relationships>'
+        ))
+        archive.writestr('xl/workbook.xml', (
+            f'<workbook xmlns="{main}" xmlns:r="{rel}"><sheets>'
+            + ''.join(f'<sheet name="{name}" sheetId="{index}" r:id="rId{index}"/>'
+                      for index, (name, _, _) in enumerate(sheets, start=1))
+            + '</sheets></workbook>'
+        ))
+        archive.writestr('xl/_rels/workbook.xml.rels', (
+            f'<Relationships xmlns="{package}">'
+            + ''.join(f'<Relationship Id="rId{index}" Target="worksheets/sheet{index}.xml" Type="{rel}/worksheet"/>'
+                      for index in range(1, len(sheets) + 1))
+            + f'<Relationship Id="rIdS" Target="sharedStrings.xml" Type="{rel}/sharedStrings"/>'
+            f'<Relationship Id="rIdT" Target="styles.xml" Type="{rel}/styles"/></Relationships>'
+        ))
+        for index, (_, head, rows) in enumerate(sheets, start=1):
+            archive.writestr(f'xl/worksheets/sheet{index}.xml',
+                             f'<worksheet xmlns="{main}">{head}<sheetData>{rows}</sheetData></worksheet>')
+        archive.writestr('xl/sharedStrings.xml', f'<sst xmlns="{main}">{"".join(shared_strings)}</sst>')
+        archive.writestr('xl/styles.xml', f'<styleSheet xmlns="{main}">{styles}</styleSheet>')
+
+
+class PreviewSheetTests(SimpleTestCase):
+    """
+    .xlsx 的工作表列表只读取元数据；预览只读取前几行，结果与 openpyxl 只读模式逐行读出的相同
+    """
+
+    HEADER = ['项目名称', '到货日期', '数量', '单价（不含税）', '是否含税', '备注']
+
+    def setUp(self):
+        shared_strings = [f'<si><t>{value}</t></si>' for value in self.HEADER + ['这是说明页']]
+        # 富文本和注音
+        shared_strings.append('<si><r><t>项目</t></r><r><rPr><b/></rPr><t>1</t></r><rPh sb="0" eb="2"><t>xiang</t></rPh></si>')
+        shared_strings += [f'<si><t>备注{number}</t></si>' for number in range(1000)]
+
+        def cell(ref, value, kind=None, style=None):
+            attrs = f' r="{ref}"' + (f' t="{kind}"' if kind else '') + (f' s="{style}"' if style else '')
+            return f'<c{attrs}><v>{value}</v></c>'
+
+        rows = [
+            '<row r="1">' + ''.join(cell(f'{letter}1', index, 's') for index, letter in enumerate('ABCDEF')) + '</row>',
+            '<row r="2">' + cell('A2', 7, 's') + cell('B2', 45296, style=1) + cell('C2', 10) + cell('D2', 450.5)
+            + cell('E2', 1, 'b') + '</row>',
+            '<row r="4"><c r="A4" t="inlineStr"><is><t>内联</t></is></c>' + cell('B4', '45323.354166666664', style=2)
+            + cell('C4', '1.5E-7') + cell('E4', 0, 'b') + cell('F4', '#N/A', 'e') + cell('H4', '公式', 'str') + '</row>',
+        ]
+        rows += [
+            f'<row r="{number}">' + cell(f'A{number}', 8, 's') + cell(f'F{number}', 8 + number, 's') + '</row>'
+            for number in range(5, 300)
+        ]
+        styles = (
+            '<numFmts count="1"><numFmt numFmtId="164" formatCode="yyyy/m/d h:mm"/></numFmts>'
+            '<cellXfs count="3"><xf numFmtId="0"/><xf numFmtId="14" applyNumberFormat="1"/>'
+            '<xf numFmtId="164" applyNumberFormat="1"/></cellXfs>'
+        )
+        fd, self.path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+        write_xlsx(self.path, [
+            ('说明', '<dimension ref="A1"/>', f'<row r="1">{cell("A1", 6, "s")}</row>'),
+            ('项目', '<dimension ref="A1:H299"/>', ''.join(rows)),
+        ], shared_strings, styles)
+        # 最小的样式表没有默认样式，openpyxl 会给出提示
+        catcher = warnings.catch_warnings()
+        catcher.__enter__()
+        self.addCleanup(catcher.__exit__, None, None, None)
+        warnings.simplefilter('ignore', UserWarning)
+
+    def openpyxl_preview(self, sheet_name, limit):
+        rows = list(islice(_iter_xlsx_rows(self.path, sheet_name), limit + 1))
+        width = len(rows[0])
+        return (
+            ['' if value is None else str(value).strip() for value in rows[0]],
+            [['' if value is None else str(value) for value in values[:width]] for values in rows[1:]],
+        )
+
+    def test_matches_openpyxl(self):
+        header, rows = preview_sheet(self.path, '项目', limit=5)
+        self.assertEqual((header, rows), self.openpyxl_preview('项目', 5))
+        self.assertEqual(header, self.HEADER + ['', ''])
+        self.assertEqual(rows[0], ['项目1', '2024-01-05 00:00:00', '10', '450.5', 'True', '', '', ''])
+        self.assertEqual(rows[1], [''] * 8)
+        self.assertEqual(rows[2], ['内联', '2024-02-01 08:30:00', '1.5e-07', '', 'False', '#N/A', '', '公式'])
+        self.assertEqual(len(rows), 5)
+
+    def test_first_sheet_by_default(self):
+        self.assertEqual(preview_sheet(self.path, filename='数据.xlsx'), (['这是说明页'], []))
+
+    def test_inspect_workbook(self):
+        self.assertEqual(inspect_workbook(self.path), [
+            {'name': '说明', 'dimension': 'A1', 'rows': 1, 'columns': 1},
+            {'name': '项目', 'dimension': 'A1:H299', 'rows': 299, 'columns': 8},
+        ])
+
+    def test_inspect_csv(self):
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w', encoding='gb18030') as f:
+            f.write('项目名称,到货日期,数量\n项目1,2024-01-05,5\n')
+        self.addCleanup(os.remove, path)
+        self.assertEqual(inspect_workbook(path, filename='二月数据.csv'), [
+            {'name': '二月数据.csv', 'dimension': None, 'rows': None, 'columns': 3},
+        ])
+
+
+class ProjectDataTestCase(TestCase):
+    """
+    项目列表相关测试的公共数据：管理员和两个普通用户，两个地区下的项目映射和基础维度数据
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', permission='admin')
+        cls.user1 = User.objects.create(username='user1')
+        cls.user2 = User.objects.create(username='user2')
+        cls.wuhan = Region.objects.create(city='武汉市', district='江岸区', citypy='wuhan')
+        cls.huanggang = Region.objects.create(city='黄冈市', citypy='huanggang')
+        cls.category = MaterialCategory.objects.create(category_name='商品混凝土')
+        cls.c30 = Specification.objects.create(category=cls.category, specification_name='C30')
+        cls.c35 = Specification.objects.create(category=cls.category, specification_name='C35')
+        cls.supplier_a = Supplier.objects.create(supplier_name='华新供应商')
+        cls.supplier_b = Supplier.objects.create(supplier_name='亚东供应商')
+        cls.brand_a = Brand.objects.create(brand_name='华新')
+        cls.brand_b = Brand.objects.create(brand_name='亚东')
+        cls.mapping_a = ProjectMapping.objects.create(project_name='光谷项目', region=cls.wuhan)
+        cls.mapping_b = ProjectMapping.objects.create(project_name='黄州项目', region=cls.huanggang)
+
+    @classmethod
+    def create_project(cls, **fields):
+        values = {
+            'project_mapping': cls.mapping_a,
+            'arrival_date': datetime.date(2024, 1, 1),
+            'supplier': cls.supplier_a,
+            'category': cls.category,
+            'specification': cls.c30,
+            'quantity': Decimal('10'),
+            'unit_price': Decimal('450'),
+            'brand': cls.brand_a,
+            'user': cls.user1,
+        }
+        values.update(fields)
+        return Project.objects.create(**values)
+
+
+class KeysetPaginationTests(ProjectDataTestCase):
+    """
+    键集分页：按 (-到货日期, -ID) 排序，同一到货日期的记录跨页时不重复、不遗漏
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # 7条记录，其中4条同一天，每页3条时同一天的记录跨越两页
+        for day in (1, 5, 5, 5, 5, 9, 12):
+            cls.create_project(arrival_date=datetime.date(2024, 3, day))
+        cls.ordered = list(Project.objects.order_by('-arrival_date', '-id').values_list('id', flat=True))
+
+    def setUp(self):
+        self.paginator = KeysetPaginator(Project.objects.all(), per_page=3)
+
+    def ids(self, page):
+        return [project.id for project in page]
+
+    def test_forward_and_backward(self):
+        pages = [self.paginator.get_page(with_count=True)]
+        self.assertEqual(pages[0].count, 7)
+        while pages[-1].has_next:
+            pages.append(self.paginator.get_page(pages[-1].next_cursor))
+        self.assertEqual([self.ids(page) for page in pages],
+                         [self.ordered[0:3], self.ordered[3:6], self.ordered[6:]])
+        self.assertEqual([(page.has_previous, page.has_next) for page in pages],
+                         [(False, True), (True, True), (True, False)])
+        self.assertEqual(pages[-1].next_cursor, '')
+
+        previous = self.paginator.get_page(pages[2].previous_cursor)
+        self.assertEqual(self.ids(previous), self.ordered[3:6])
+        self.assertEqual((previous.has_previous, previous.has_next), (True, True))
+        first = self.paginator.get_page(previous.previous_cursor)
+        self.assertEqual(self.ids(first), self.ordered[0:3])
+        self.assertFalse(first.has_previous)
+
+    def test_last_page(self):
+        page = self.paginator.get_page(last=True)
+        self.assertEqual(self.ids(page), self.ordered[4:])
+        self.assertEqual((page.has_previous, page.has_next), (True, False))
+
+    def test_cursor_at_boundary(self):
+        # 游标恰好是最后一条记录：下一页为空，但仍有上一页
+        last = Project.objects.get(id=self.ordered[-1])
+        page = self.paginator.get_page(encode_cursor(last.arrival_date, last.id, 'next'))
+        self.assertEqual(list(page), [])
+        self.assertEqual((page.has_previous, page.has_next, page.next_cursor), (True, False, ''))
+
+        # 游标是同一天中间的记录：只返回同一天ID更小的和更早日期的记录
+        middle = Project.objects.get(id=self.ordered[3])
+        page = self.paginator.get_page(encode_cursor(middle.arrival_date, middle.id, 'next'))
+        self.assertEqual(self.ids(page), self.ordered[4:7])
+
+    def test_empty_and_invalid(self):
+        page = KeysetPaginator(Project.objects.none(), per_page=3).get_page(with_count=True)
+        self.assertEqual((list(page), page.count, page.has_other_pages()), ([], 0, False))
+        self.assertEqual((page.next_cursor, page.previous_cursor), ('', ''))
+
+        self.assertEqual(self.ids(self.paginator.get_page('不是游标')), self.ordered[0:3])
+        with self.assertRaises(InvalidCursor):
+            decode_cursor(encode_cursor(datetime.date(2024, 1, 1), 1, 'next')[:-2])
+
+    def test_keyset_values_page(self):
+        rows, cursor = keyset_values_page(Project.objects.all(), ['id'], 4)
+        self.assertEqual([row[0] for row in rows], self.ordered[:4])
+        rows, cursor = keyset_values_page(Project.objects.all(), ['id'], 3, cursor)
+        self.assertEqual(([row[0] for row in rows], cursor), (self.ordered[4:], ''))
+
+    def test_list_view(self):
+        for _ in range(20):
+            self.create_project(arrival_date=datetime.date(2023, 1, 1))
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('projects:project_list'), {'supplier': '华新供应商'})
+        page = response.context['projects']
+        self.assertEqual(len(page), 20)
+        self.assertTrue(page.has_next)
+        self.assertIn(f'cursor={page.next_cursor}', response.content.decode())
+        response = self.client.get(reverse('projects:project_list'),
+                                   {'supplier': '华新供应商', 'cursor': page.next_cursor})
+        self.assertEqual(len(response.context['projects']), 7)
+
+
+class ProjectSearchTests(ProjectDataTestCase):
+    """
+    全局搜索使用检索文档：每个关键词都要匹配，维度名称修改后检索文档随之更新
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.project_a = cls.create_project()
+        cls.project_b = cls.create_project(project_mapping=cls.mapping_b, supplier=cls.supplier_b,
+                                           specification=cls.c35, brand=cls.brand_b, user=cls.user2)
+        cls.project_c = cls.create_project(supplier=cls.supplier_b)
+
+    def search(self, query):
+        return set(search_projects(Project.objects.all(), query).values_list('id', flat=True))
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(self.search('光谷'), {self.project_a.id, self.project_c.id})
+        self.assertEqual(self.search('光谷  亚东'), {self.project_c.id})
+        self.assertEqual(self.search('黄冈市 C35 user2'), {self.project_b.id})
+        self.assertEqual(self.search('光谷 不存在'), set())
+        self.assertEqual(self.search(' "" '), {self.project_a.id, self.project_b.id, self.project_c.id})
+
+    def test_document_content(self):
+        self.assertEqual(self.project_a.search_document.content, '光谷项目 华新供应商 商品混凝土 C30 华新 武汉市 江岸区 user1')
+
+    def test_dimension_rename_updates_documents(self):
+        self.supplier_b.supplier_name = '葛洲坝供应商'
+        self.supplier_b.save()
+        self.assertEqual(self.search('葛洲坝'), {self.project_b.id, self.project_c.id})
+        self.assertEqual(self.search('亚东供应商'), set())
+
+        self.mapping_b.region = self.wuhan
+        self.mapping_b.save()
+        self.assertEqual(self.search('江岸区'), {self.project_a.id, self.project_b.id, self.project_c.id})
+
+    def test_rebuild_search_documents(self):
+        ProjectSearchDocument.objects.all().delete()
+        self.assertEqual(rebuild_search_documents(batch_size=2), 3)
+        self.assertEqual(self.search('C35'), {self.project_b.id})
+
+    def test_fulltext_expression(self):
+        # MySQL 的 BOOLEAN MODE：每个关键词作为必须出现的短语，去掉关键词中的引号
+        self.assertEqual(_fulltext_expression(['光谷', 'C"30']), '+"光谷" +"C30"')
+
+    def test_list_view_search(self):
+        self.client.force_login(self.user1)
+        response = self.client.get(reverse('projects:project_list'), {'search': '亚东'})
+        # 普通用户只能搜索到自己的项目
+        self.assertEqual([project.id for project in response.context['projects']], [self.project_c.id])
+
+
+class ProjectFacetCacheTests(ProjectDataTestCase):
+    """
+    筛选选项按用户范围缓存：命中缓存时不查询数据库，项目或维度表变化后立即失效
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.create_project()
+        cls.create_project(project_mapping=cls.mapping_b, supplier=cls.supplier_b, brand=cls.brand_b, user=cls.user2)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_scope_and_cache_hit(self):
+        facets = get_project_facets(self.user1)
+        self.assertEqual((facets['project_names'], facets['suppliers'], facets['brands'], facets['users']),
+                         (['光谷项目'], ['华新供应商'], ['华新'], ['user1']))
+        self.assertEqual(facets['regions'], [self.wuhan])
+        with self.assertNumQueries(0):
+            self.assertEqual(get_project_facets(self.user1)['suppliers'], ['华新供应商'])
+
+        admin_facets = get_project_facets(self.admin)
+        self.assertEqual(sorted(admin_facets['suppliers']), ['亚东供应商', '华新供应商'])
+        self.assertEqual(sorted(admin_facets['users']), ['admin', 'user1', 'user2'])
+
+    def test_user_project_change_invalidates_only_that_user(self):
+        get_project_facets(self.user1)
+        get_project_facets(self.user2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_project(supplier=self.supplier_b)
+        self.assertEqual(sorted(get_project_facets(self.user1)['suppliers']), ['亚东供应商', '华新供应商'])
+        with self.assertNumQueries(0):
+            get_project_facets(self.user2)
+
+    def test_dimension_change_invalidates_all(self):
+        get_project_facets(self.admin)
+        get_project_facets(self.user2)
+        with self.captureOnCommitCallbacks(execute=True):
+            Brand.objects.create(brand_name='海螺')
+        self.assertIn('海螺', get_project_facets(self.admin)['brands'])
+        # 普通用户的缓存同样重新计算
+        with CaptureQueriesContext(connection) as queries:
+            get_project_facets(self.user2)
+        self.assertTrue(queries)
+
+
+class ProjectFacetCountTests(ProjectDataTestCase):
+    """
+    分面数量：每个分面使用除自身以外的筛选条件，全部分面在一条SQL中统计
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.create_project()
+        cls.create_project(brand=cls.brand_b)
+        cls.create_project(supplier=cls.supplier_b, project_mapping=cls.mapping_b)
+        cls.create_project(supplier=cls.supplier_b, brand=cls.brand_b, user=cls.user2)
+
+    def count(self, user, **params):
+        request = RequestFactory().get(reverse('projects:project_list'), params)
+        request.user = user
+        with self.assertNumQueries(1):
+            return count_project_facets(request, visible_projects(user))
+
+    def test_counts_exclude_own_filter(self):
+        counts = self.count(self.admin, supplier='华新供应商', brand='亚东')
+        self.assertEqual(counts['supplier'], {'华新供应商': 1, '亚东供应商': 1})
+        self.assertEqual(counts['brand'], {'华新': 1, '亚东': 1})
+        self.assertEqual(counts['category'], {'商品混凝土': 1})
+        self.assertEqual(counts['region'], {str(self.wuhan.id): 1})
+
+    def test_counts_within_user_scope(self):
+        counts = self.count(self.user1, region=str(self.wuhan.id))
+        self.assertEqual(counts['supplier'], {'华新供应商': 2})
+        self.assertEqual(counts['region'], {str(self.wuhan.id): 2, str(self.huanggang.id): 1})
+
+    def test_list_view(self):
+        self.client.force_login(self.admin)
+        self.assertIsNone(self.client.get(reverse('projects:project_list')).context['facet_counts'])
+        response = self.client.get(reverse('projects:project_list'), {'brand': '华新'})
+        self.assertEqual(response.context['facet_counts']['supplier'], {'华新供应商': 1, '亚东供应商': 1})
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class ProjectExportTests(ProjectDataTestCase):
+    """
+    项目导出：按当前权限和筛选条件分块读取并流式输出，导出的文件可以重新导入
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for day in (3, 1, 2):
+            cls.create_project(arrival_date=datetime.date(2024, 5, day), discount_rate=Decimal('5'))
+        cls.create_project(project_mapping=cls.mapping_b, user=cls.user2)
+
+    def export(self, user, **params):
+        self.client.force_login(user)
+        response = self.client.get(reverse('projects:project_export'), params)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_csv(self):
+        response, content = self.export(self.user1, start_date='2024-05-02')
+        self.assertTrue(response['Content-Disposition'].startswith("attachment; filename*=UTF-8''"))
+        self.assertTrue(content.startswith(codecs.BOM_UTF8))
+        rows = list(csv.reader(content.decode('utf-8-sig').splitlines()))
+        self.assertEqual(rows[0], [header for header, _ in EXPORT_COLUMNS])
+        self.assertEqual([row[1] for row in rows[1:]], ['2024-05-03', '2024-05-02'])
+        self.assertEqual(rows[1], ['光谷项目', '2024-05-03', '华新供应商', '商品混凝土', 'C30', '10.00', '5.00',
+                                   '450.00', '华新', '4275.00', '武汉市', '江岸区', 'user1'])
+
+    def test_csv_can_be_reimported(self):
+        _, content = self.export(self.admin)
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        frame, = iter_row_batches(path, required_columns=PROJECT_REQUIRED_COLUMNS,
+                                  optional_columns=PROJECT_OPTIONAL_COLUMNS)
+        clean, errors = validate_project_frame(frame)
+        self.assertEqual((len(clean), len(errors)), (4, 0))
+
+    def test_xlsx_splits_sheets(self):
+        from openpyxl import load_workbook
+
+        with mock.patch('apps.projects.exports.XLSX_MAX_ROWS', 3):
+            _, content = self.export(self.admin, format='xlsx')
+        workbook = load_workbook(io.BytesIO(content), read_only=True)
+        self.assertEqual(workbook.sheetnames, ['项目数据', '项目数据2'])
+        rows = [list(worksheet.values) for worksheet in workbook.worksheets]
+        workbook.close()
+        self.assertEqual([len(sheet_rows) for sheet_rows in rows], [4, 2])
+        self.assertEqual(rows[1][0][0], '项目名称')
+        self.assertEqual(rows[0][1][:2], ('光谷项目', datetime.datetime(2024, 5, 3)))
+
+
+class ProjectDataApiTests(ProjectDataTestCase):
+    """
+    项目数据JSON接口：按请求的字段返回列数据，游标获取下一批，权限与项目列表相同
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for day in (1, 2, 3):
+            cls.create_project(arrival_date=datetime.date(2024, 6, day), discount_rate=Decimal('2.5'))
+        cls.create_project(user=cls.user2)
+
+    def get(self, login_user, **params):
+        self.client.force_login(login_user)
+        return self.client.get(reverse('projects:project_data'), params)
+
+    def test_sparse_fields_and_cursor(self):
+        data = self.get(self.user1, fields='date,discount,total,date', limit=2).json()
+        self.assertEqual(data['fields'], ['date', 'discount', 'total'])
+        self.assertEqual(data['columns'], [['2024-06-03', '2024-06-02'], [2.5, 2.5], [4387.5, 4387.5]])
+        self.assertEqual(data['rows'], 2)
+        data = self.get(self.user1, fields='date', limit=2, cursor=data['next_cursor']).json()
+        self.assertEqual((data['columns'], data['next_cursor']), ([['2024-06-01']], ''))
+
+    def test_default_fields_and_filters(self):
+        data = self.get(self.admin, user='user2').json()
+        self.assertEqual(data['fields'], DEFAULT_API_FIELDS)
+        self.assertEqual(data['rows'], 1)
+        self.assertEqual(dict(zip(data['fields'], data['columns']))['project'], ['光谷项目'])
+
+    def test_empty_result(self):
+        data = self.get(self.user1, fields='id,price', search='不存在').json()
+        self.assertEqual(data, {'fields': ['id', 'price'], 'columns': [[], []], 'rows': 0, 'next_cursor': ''})
+
+    def test_unknown_field(self):
+        response = self.get(self.admin, fields='id,password')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['available_fields'], list(API_FIELDS))
+
+    @override_settings(PROJECT_API_MAX_ROWS=2)
+    def test_limit_capped(self):
+        self.assertEqual(self.get(self.admin, limit='abc').json()['rows'], 2)
+        self.assertEqual(self.get(self.admin, limit=100).json()['rows'], 2)
+
+
+class AutocompleteTests(ProjectDataTestCase):
+    """
+    项目表单的自动补全：前缀匹配排在前面，包含匹配补足，结果数受 limit 限制
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.mapping_c = ProjectMapping.objects.create(project_name='项目光谷二期', region=cls.huanggang)
+        cls.mapping_d = ProjectMapping.objects.create(project_name='光谷三期', region=cls.wuhan)
+
+    def setUp(self):
+        self.client.force_login(self.user1)
+
+    def get(self, source, **params):
+        return self.client.get(reverse('projects:autocomplete', args=[source]), params)
+
+    def test_prefix_matches_first(self):
+        results = self.get('mapping', q=' 光谷 ').json()['results']
+        self.assertEqual([result['id'] for result in results],
+                         [self.mapping_d.id, self.mapping_a.id, self.mapping_c.id])
+        self.assertEqual(results[0]['text'], f'光谷三期 ({self.wuhan})')
+
+    def test_limit(self):
+        results = self.get('mapping', q='光谷', limit=2).json()['results']
+        self.assertEqual([result['id'] for result in results], [self.mapping_d.id, self.mapping_a.id])
+        with override_settings(AUTOCOMPLETE_LIMIT=1):
+            self.assertEqual(len(self.get('mapping', q='', limit=50).json()['results']), 1)
+        self.assertEqual(len(self.get('mapping', limit='x').json()['results']), 4)
+
+    def test_sources(self):
+        self.assertEqual(self.get('supplier', q='亚东').json()['results'],
+                         [{'id': self.supplier_b.id, 'text': '亚东供应商'}])
+        self.assertEqual(self.get('brand', q='华').json()['results'], [{'id': self.brand_a.id, 'text': '华新'}])
+        self.assertEqual(self.get('user').status_code, 404)
+
+    def test_selected_choices(self):
+        project = self.create_project()
+        form = ProjectForm(instance=project)
+        with self.assertNumQueries(4):
+            choices = form.selected_choices()
+        self.assertEqual(choices['project_mapping'], {'id': self.mapping_a.id, 'text': f'光谷项目 ({self.wuhan})'})
+        self.assertEqual(choices['brand'], {'id': self.brand_a.id, 'text': '华新'})
+        # 提交了无效的ID时不回显
+        form = ProjectForm(data={'supplier': 'abc', 'brand': '999999'})
+        self.assertEqual((form.selected_choices()['supplier'], form.selected_choices()['brand']), (None, None))
+
+
+@override_settings(BULK_EDIT_BATCH_SIZE=2)
+class ProjectBulkTests(ProjectDataTestCase):
+    """
+    项目列表的批量修改和删除：只处理当前用户可见的项目，合计金额、检索文档和筛选选项缓存随之更新
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.own = [cls.create_project(arrival_date=datetime.date(2024, 7, day)) for day in (1, 2, 3)]
+        cls.other = cls.create_project(user=cls.user2)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user1)
+
+    def post(self, query='', **data):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f"{reverse('projects:project_bulk')}?{query}", data)
+        return response, [str(message) for message in get_messages(response.wsgi_request)]
+
+    def test_bulk_brand_skips_invisible_projects(self):
+        response, messages = self.post(
+            query='supplier=华新供应商', action='brand', scope='selected', brand=self.brand_b.id,
+            ids=[self.own[0].id, self.own[2].id, self.other.id],
+        )
+        self.assertRedirects(response, f"{reverse('projects:project_list')}?{urlencode({'supplier': '华新供应商'})}",
+                             fetch_redirect_response=False)
+        self.assertEqual(messages, ['已修改 2 条项目数据的品牌。', '1 条项目不存在或没有操作权限，已跳过。'])
+        self.assertEqual(set(Project.objects.filter(brand=self.brand_b).values_list('id', flat=True)),
+                         {self.own[0].id, self.own[2].id})
+        self.assertEqual(set(search_projects(Project.objects.all(), '亚东').values_list('id', flat=True)),
+                         {self.own[0].id, self.own[2].id})
+
+    def test_bulk_discount_for_filtered_projects(self):
+        _, messages = self.post(query='start_date=2024-07-02', action='discount_rate', scope='all',
+                                discount_rate='12.5')
+        self.assertEqual(messages, ['已修改 2 条项目数据的下浮率。'])
+        totals = dict(Project.objects.values_list('arrival_date', 'total_amount'))
+        self.assertEqual(totals[datetime.date(2024, 7, 3)], Decimal('3937.5'))
+        self.assertEqual(totals[datetime.date(2024, 7, 1)], Decimal('4500'))
+
+        # 下浮率留空表示清除
+        self.post(query='start_date=2024-07-02', action='discount_rate', scope='all', discount_rate='')
+        self.assertEqual(Project.objects.get(id=self.own[2].id).total_amount, Decimal('4500'))
+
+    def test_bulk_delete(self):
+        get_project_facets(self.user1)
+        _, messages = self.post(action='delete', scope='all')
+        self.assertEqual(messages, ['已删除 3 条项目数据。'])
+        self.assertEqual(list(Project.objects.values_list('id', flat=True)), [self.other.id])
+        self.assertEqual(list(ProjectSearchDocument.objects.values_list('project_id', flat=True)), [self.other.id])
+        self.assertEqual(get_project_facets(self.user1)['suppliers'], [])
+
+    def test_invalid_requests(self):
+        _, messages = self.post(action='brand', scope='selected', ids=[self.own[0].id])
+        self.assertEqual(messages, ['请选择品牌'])
+        # 消息在跳转后的页面显示前一直保留
+        _, messages = self.post(action='delete', scope='selected')
+        self.assertEqual(messages[-1], '请先勾选要操作的项目。')
+        self.assertEqual(Project.objects.count(), 4)
+
+
+class TotalAmountExpressionTests(ProjectDataTestCase):
+    """
+    数据库计算的合计金额与 Project.calculate_total_amount 逐条保存的结果相同
+    """
+
+    CASES = [
+        # (数量, 单价, 下浮率)
+        (Decimal('10'), Decimal('450'), None),
+        (Decimal('10'), Decimal('450'), Decimal('0')),
+        (Decimal('10'), Decimal('450'), Decimal('5')),
+        (Decimal('3.33'), Decimal('451.27'), Decimal('2.5')),
+        (Decimal('7'), Decimal('0.01'), Decimal('12.34')),
+        (Decimal('10'), Decimal('450'), Decimal('100')),
+        (Decimal('0'), Decimal('450'), Decimal('5')),
+        (Decimal('10'), Decimal('0'), None),
+    ]
+
+    def assertSqlMatchesSave(self, case, **changes):
+        """先逐条保存得到 Python 计算的结果，再用 UPDATE 在数据库中重新计算并比较"""
+        quantity, unit_price, discount_rate = case
+        project = self.create_project(quantity=quantity, unit_price=unit_price, discount_rate=discount_rate)
+        for name, value in changes.items():
+            setattr(project, name, value)
+        project.save()
+        project.refresh_from_db()
+
+        # 恢复修改前的值并清空合计金额，再由 UPDATE 在数据库中计算
+        Project.objects.filter(pk=project.pk).update(
+            quantity=quantity, unit_price=unit_price, discount_rate=discount_rate, total_amount=None
+        )
+        Project.objects.filter(pk=project.pk).update(**(changes or {'total_amount': total_amount_expression()}))
+        self.assertEqual(Project.objects.get(pk=project.pk).total_amount, project.total_amount,
+                         (case, changes))
+        return project.total_amount
+
+    def test_expression_matches_python(self):
+        totals = [self.assertSqlMatchesSave(case) for case in self.CASES]
+        self.assertEqual(totals, [Decimal('4500'), Decimal('4500'), Decimal('4275'), Decimal('1465.16'),
+                                  Decimal('0.06'), Decimal('0'), None, None])
+
+    def test_update_uses_new_values(self):
+        # 同一条 UPDATE 中修改的字段按新值计算，未修改的字段取列的当前值
+        for case in self.CASES:
+            self.assertSqlMatchesSave(case, discount_rate=Decimal('7.5'))
+            self.assertSqlMatchesSave(case, discount_rate=None)
+            self.assertSqlMatchesSave(case, quantity=Decimal('4.5'), unit_price=Decimal('300'))
+
+    def test_bulk_paths(self):
+        projects = [
+            Project(project_mapping=self.mapping_a, arrival_date=datetime.date(2024, 1, 1), supplier=self.supplier_a,
+                    category=self.category, specification=self.c30, quantity=quantity, unit_price=unit_price,
+                    discount_rate=discount_rate, brand=self.brand_a, user=self.user1)
+            for quantity, unit_price, discount_rate in self.CASES
+        ]
+        Project.objects.bulk_create(projects)
+        for project in projects:
+            project.discount_rate = Decimal('3')
+        Project.objects.bulk_update(projects, ['discount_rate'])
+        for project in Project.objects.all():
+            expected = Project.calculate_total_amount(project.quantity, project.unit_price, Decimal('3'))
+            self.assertEqual(project.total_amount,
+                             None if expected is None else expected.quantize(Decimal('0.01')))
+
+
+class UploadJobTests(TestCase):
+    """
+    上传记录的状态机、worker 领取任务和超时任务的回收
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='uploader')
+
+    def create_upload(self, status=DataUpload.STATUS_QUEUED, **fields):
+        return DataUpload.objects.create(user=self.user, file_path='/nonexistent/upload.xlsx', status=status, **fields)
+
+    def test_transition(self):
+        upload = self.create_upload()
+        upload.transition(DataUpload.STATUS_PROCESSING, started_at=timezone.now())
+        upload.transition(DataUpload.STATUS_COMPLETED, rows_processed=10)
+        upload.refresh_from_db()
+        self.assertEqual((upload.status, upload.rows_processed), (DataUpload.STATUS_COMPLETED, 10))
+        with self.assertRaises(ValueError):
+            upload.transition(DataUpload.STATUS_PROCESSING)
+        with self.assertRaises(ValueError):
+            self.create_upload().transition(DataUpload.STATUS_COMPLETED)
+
+    def test_claim_oldest_queued_once(self):
+        first = self.create_upload()
+        second = self.create_upload()
+        self.create_upload(status=DataUpload.STATUS_FAILED)
+        self.assertEqual(claim_next_upload().id, first.id)
+        claimed = claim_next_upload()
+        self.assertEqual(claimed.id, second.id)
+        self.assertEqual(claimed.status, DataUpload.STATUS_PROCESSING)
+        self.assertIsNotNone(claimed.started_at)
+        self.assertIsNone(claim_next_upload())
+
+    def test_transition_keeps_concurrent_change(self):
+        upload = self.create_upload(status=DataUpload.STATUS_PROCESSING, started_at=timezone.now())
+        reaped = DataUpload.objects.get(id=upload.id)
+        self.assertTrue(reaped.transition(DataUpload.STATUS_FAILED, error_message='超时'))
+        # 另一个进程手中的副本仍是处理中，条件更新不覆盖失败状态
+        self.assertFalse(upload.transition(DataUpload.STATUS_COMPLETED, rows_processed=10))
+        self.assertEqual(upload.status, DataUpload.STATUS_PROCESSING)
+        upload.refresh_from_db()
+        self.assertEqual((upload.status, upload.error_message, upload.rows_processed),
+                         (DataUpload.STATUS_FAILED, '超时', 0))
+
+    @override_settings(IMPORT_STALE_TIMEOUT=3600)
+    def test_heartbeat_keeps_long_upload_alive(self):
+        long_running = self.create_upload(status=DataUpload.STATUS_PROCESSING,
+                                          started_at=timezone.now() - datetime.timedelta(hours=5),
+                                          heartbeat_at=timezone.now() - datetime.timedelta(minutes=1))
+        silent = self.create_upload(status=DataUpload.STATUS_PROCESSING,
+                                    started_at=timezone.now() - datetime.timedelta(hours=5),
+                                    heartbeat_at=timezone.now() - datetime.timedelta(hours=2))
+        self.assertEqual(fail_stale_uploads(), 1)
+        self.assertEqual(DataUpload.objects.get(id=long_running.id).status, DataUpload.STATUS_PROCESSING)
+        self.assertEqual(DataUpload.objects.get(id=silent.id).status, DataUpload.STATUS_FAILED)
+
+    @override_settings(IMPORT_STALE_TIMEOUT=3600)
+    def test_stale_processing_upload_fails(self):
+        stale = self.create_upload(status=DataUpload.STATUS_PROCESSING,
+                                   started_at=timezone.now() - datetime.timedelta(hours=2), file_hash='a' * 64)
+        running = self.create_upload(status=DataUpload.STATUS_PROCESSING,
+                                     started_at=timezone.now() - datetime.timedelta(minutes=5))
+        self.assertEqual(find_duplicate_upload('a' * 64), stale)
+        self.assertIsNone(claim_next_upload())
+        stale.refresh_from_db()
+        running.refresh_from_db()
+        self.assertEqual(stale.status, DataUpload.STATUS_FAILED)
+        self.assertIsNotNone(stale.finished_at)
+        self.assertEqual(running.status, DataUpload.STATUS_PROCESSING)
+        # 失败的上传不再阻止重新上传同一文件
+        self.assertIsNone(find_duplicate_upload('a' * 64))
+
+
+@override_settings(IMPORT_BATCH_SIZE=2)
+class ProcessUploadTests(TestCase):
+    """
+    后台导入任务：分批导入并更新进度，结束后删除上传文件；重复导入按数据指纹更新已有项目
+    """
+
+    HEADER = '项目名称,到货日期,供应商,物资类别,规格,数量,单价（不含税）,下浮率%,品牌\n'
+    ROWS = [
+        '项目1,2024-01-05,供应商1,商品混凝土,C30,5,450,,/\n',
+        '项目1,2024-01-06,供应商1,商品混凝土,C30,6,450,2,品牌1\n',
+        '项目2,2024-02-01,供应商2,商品混凝土,C35,7,460,,\n',
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='uploader', permission='admin')
+        Region.objects.create(id=1, city='武汉市', citypy='wuhan')
+        Brand.objects.create(id=1, brand_name='/')
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings_override = override_settings(IMPORT_UPLOAD_DIR=os.path.join(self.directory, 'uploads'),
+                                              IMPORT_REPORT_DIR=os.path.join(self.directory, 'reports'))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client.force_login(self.user)
+
+    def run_upload(self, text, file_name='projects.csv'):
+        """把文件放入上传队列，由 worker 领取并执行"""
+        tmp_path = os.path.join(self.directory, file_name)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        upload = enqueue_project_import(self.user, tmp_path, file_name)
+        self.assertEqual(claim_next_upload(), upload)
+        process_upload(DataUpload.objects.get(id=upload.id))
+        upload.refresh_from_db()
+        return upload
+
+    def test_process_upload(self):
+        upload = self.run_upload(self.HEADER + ''.join(self.ROWS))
+        self.assertEqual(upload.status, DataUpload.STATUS_COMPLETED)
+        self.assertEqual((upload.rows_processed, upload.rows_failed), (3, 0))
+        self.assertEqual((upload.error_message, upload.error_report), ('', ''))
+        self.assertIsNotNone(upload.finished_at)
+        self.assertFalse(os.path.exists(upload.file_path))
+        self.assertEqual(Project.objects.filter(user=self.user).count(), 3)
+
+        progress = self.client.get(reverse('projects:upload_progress', args=[upload.id])).json()
+        self.assertEqual((progress['status'], progress['finished'], progress['rows_processed']),
+                         (DataUpload.STATUS_COMPLETED, True, 3))
+
+    def test_heartbeat(self):
+        upload = self.run_upload(self.HEADER + ''.join(self.ROWS))
+        self.assertGreaterEqual(upload.heartbeat_at, upload.started_at)
+
+    def test_reaped_upload_stays_failed(self):
+        tmp_path = os.path.join(self.directory, 'projects.csv')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.HEADER + ''.join(self.ROWS + ['项目3,2024-02-01,供应商2,商品混凝土,C35,7,abc,,\n']))
+        enqueue_project_import(self.user, tmp_path, 'projects.csv')
+        upload = claim_next_upload()
+        # worker 运行期间任务被超时回收
+        DataUpload.objects.get(id=upload.id).transition(DataUpload.STATUS_FAILED, error_message='超时')
+
+        with self.assertLogs('apps.projects.jobs', 'WARNING'):
+            upload = process_upload(upload)
+        self.assertEqual((upload.status, upload.error_message, upload.error_report),
+                         (DataUpload.STATUS_FAILED, '超时', ''))
+        # 第一批提交后发现任务已失败，不再处理后续批次
+        self.assertEqual(Project.objects.count(), 2)
+        self.assertFalse(os.path.exists(upload.file_path))
+        self.assertEqual(os.listdir(os.path.join(self.directory, 'reports')), [])
+
+    def test_reimport_updates_instead_of_duplicating(self):
+        # 文件内确实重复的行保持各自的记录
+        rows = self.ROWS + [self.ROWS[0]]
+        self.run_upload(self.HEADER + ''.join(rows))
+        ids = set(Project.objects.values_list('id', flat=True))
+        self.assertEqual(len(ids), 4)
+
+        # 重新导入同一数据，下浮率和品牌修改后按数据指纹更新原记录
+        rows[0] = '项目1,2024-01-05,供应商1,商品混凝土,C30,5,450,10,品牌2\n'
+        upload = self.run_upload(self.HEADER + ''.join(rows), file_name='projects_v2.csv')
+        self.assertEqual(upload.status, DataUpload.STATUS_COMPLETED)
+        self.assertEqual(set(Project.objects.values_list('id', flat=True)), ids)
+        updated = Project.objects.filter(arrival_date=datetime.date(2024, 1, 5), brand__brand_name='品牌2')
+        self.assertEqual([(project.discount_rate, project.total_amount) for project in updated],
+                         [(Decimal('10'), Decimal('2025'))])
+
+    def test_fingerprint_ignores_number_format(self):
+        self.assertEqual(
+            Project.make_fingerprint(1, datetime.date(2024, 1, 5), 2, 3, Decimal('5.00'), Decimal('450')),
+            Project.make_fingerprint(1, '2024-01-05', 2, 3, 5, 450.0),
+        )
+        self.assertNotEqual(
+            Project.make_fingerprint(1, datetime.date(2024, 1, 5), 2, 3, 5, 450),
+            Project.make_fingerprint(1, datetime.date(2024, 1, 5), 2, 3, 5, 450.01),
+        )
+
+    def test_rejected_rows_in_error_report(self):
+        rows = self.ROWS + [
+            '项目3,2024-02-30,供应商1,商品混凝土,C30,5,450,,\n',
+            ',2024-02-01,供应商1,商品混凝土,C30,5,450,,\n',
+            '项目4,2024-02-01,供应商1,商品混凝土,C30,五,450,,\n',
+        ]
+        upload = self.run_upload(self.HEADER + ''.join(rows))
+        self.assertEqual(upload.status, DataUpload.STATUS_COMPLETED)
+        self.assertEqual((upload.rows_processed, upload.rows_failed), (6, 3))
+        self.assertEqual(upload.error_message, '3 行数据导入失败，详情请下载错误报告')
+        self.assertEqual(Project.objects.count(), 3)
+
+        response = self.client.get(reverse('projects:upload_error_report', args=[upload.id]))
+        self.assertIn('attachment', response['Content-Disposition'])
+        content = b''.join(response.streaming_content).decode('utf-8-sig')
+        response.close()
+        self.assertEqual(list(csv.reader(content.splitlines())), [
+            ErrorReport.HEADER,
+            ['5', '错误', '到货日期格式不正确'],
+            ['6', '错误', '必要字段不能为空'],
+            ['7', '错误', '数量、单价或下浮率格式不正确'],
+        ])
+
+        # 其他普通用户不能下载
+        other = User.objects.create(username='other')
+        self.client.force_login(other)
+        response = self.client.get(reverse('projects:upload_error_report', args=[upload.id]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_no_error_report_without_rejected_rows(self):
+        upload = self.run_upload(self.HEADER + ''.join(self.ROWS))
+        self.assertEqual(upload.error_report, '')
+        self.assertEqual(os.listdir(os.path.join(self.directory, 'reports')), [])
+        response = self.client.get(reverse('projects:upload_error_report', args=[upload.id]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_missing_columns(self):
+        upload = self.run_upload('项目名称,到货日期\n项目1,2024-01-05\n')
+        self.assertEqual(upload.status, DataUpload.STATUS_FAILED)
+        self.assertIn('供应商', upload.error_message)
+        self.assertFalse(os.path.exists(upload.file_path))
+        self.assertFalse(Project.objects.exists())
+
+    def test_missing_default_region(self):
+        Region.objects.filter(id=1).delete()
+        upload = self.run_upload(self.HEADER + ''.join(self.ROWS))
+        self.assertEqual(upload.status, DataUpload.STATUS_FAILED)
+        self.assertEqual(upload.error_message, '系统中不存在ID为1的地区，请先创建默认地区')
+
+
+class DuplicateUploadTests(TestCase):
+    """
+    相同文件已导入完成时默认跳转到原记录，勾选"重新导入"时可以再次导入
+    """
+
+    CSV = '项目名称,到货日期,供应商,物资类别,规格,数量,单价（不含税）\n项目1,2024-01-05,供应商1,商品混凝土,C30,5,450\n'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='uploader', permission='admin')
+        cls.file_hash = hashlib.sha256(cls.CSV.encode('utf-8')).hexdigest()
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def upload(self, **data):
+        csv_file = SimpleUploadedFile('projects.csv', self.CSV.encode('utf-8'), content_type='text/csv')
+        return self.client.post(reverse('projects:project_excel'), {'excel_file': csv_file, 'preview': '1', **data})
+
+    def create_upload(self, status):
+        return DataUpload.objects.create(user=self.user, file_path='/nonexistent/projects.csv',
+                                         file_hash=self.file_hash, status=status)
+
+    def test_completed_upload_redirects(self):
+        completed = self.create_upload(DataUpload.STATUS_COMPLETED)
+        response = self.upload()
+        self.assertRedirects(response, f"{reverse('projects:project_excel')}?upload={completed.id}",
+                             fetch_redirect_response=False)
+
+    def test_reimport_completed_upload(self):
+        self.create_upload(DataUpload.STATUS_COMPLETED)
+        response = self.upload(reimport='on')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['preview_mode'])
+        os.unlink(self.client.session['excel_tmp_path'])
+
+    def test_reimport_does_not_skip_running_upload(self):
+        running = self.create_upload(DataUpload.STATUS_PROCESSING)
+        response = self.upload(reimport='on')
+        self.assertRedirects(response, f"{reverse('projects:project_excel')}?upload={running.id}",
+                             fetch_redirect_response=False)
+
+
+@override_settings(IMPORT_REPORT_DIR=tempfile.gettempdir())
+class ProjectMappingImportViewTests(TestCase):
+    """
+    项目映射导入：上传记录经状态机流转为已完成，失败行写入错误报告
+    """
+
+    CSV = ('项目名称,地区（区/县）,地区（市）\n'
+           '项目1,江岸区,武汉市\n'
+           '项目2,,不存在市\n'
+           '项目3,不存在区,武汉市\n')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='mapping', permission='admin')
+        Region.objects.create(city='武汉市', citypy='wuhan')
+        Region.objects.create(city='武汉市', district='江岸区', citypy='wuhan')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_import_with_error_report(self):
+        url = reverse('projects:project_mapping_excel')
+        csv_file = SimpleUploadedFile('mappings.csv', self.CSV.encode('utf-8'), content_type='text/csv')
+        self.assertEqual(self.client.post(url, {'excel_file': csv_file, 'preview': '1'}).status_code, 200)
+        self.client.post(url, {'sheet_name': ''})
+
+        upload = DataUpload.objects.get()
+        self.assertEqual(upload.status, DataUpload.STATUS_COMPLETED)
+        self.assertEqual((upload.rows_processed, upload.rows_failed), (3, 1))
+        self.assertIsNotNone(upload.started_at)
+        self.assertIsNotNone(upload.finished_at)
+        self.assertEqual(ProjectMapping.objects.get(project_name='项目1').region.district, '江岸区')
+        self.assertEqual(ProjectMapping.objects.get(project_name='项目3').region.district, '')
+
+        with open(upload.error_report, encoding='utf-8-sig') as f:
+            rows = list(csv.reader(f))
+        os.unlink(upload.error_report)
+        self.assertEqual(rows[0], ErrorReport.HEADER)
+        reports = {row[0]: row[2] for row in rows[1:]}
+        self.assertEqual(sorted(reports), ['3', '4'])
+        self.assertIn('不存在市', reports['3'])
+        self.assertIn('不存在区', reports['4'])
+
+    def test_duplicate_project_name_updates_earliest(self):
+        wuhan, jiangan = Region.objects.order_by('id')
+        earliest = ProjectMapping.objects.create(project_name='重名项目', region=wuhan)
+        latest = ProjectMapping.objects.create(project_name='重名项目', region=wuhan)
+        frame = pd.DataFrame({'项目名称': ['重名项目'], '地区（区/县）': ['江岸区'], '地区（市）': ['武汉市']})
+
+        result = ProjectMappingImporter().run([frame])
+
+        self.assertEqual((result.success_count, result.updated_count), (1, 1))
+        earliest.refresh_from_db()
+        latest.refresh_from_db()
+        self.assertEqual(earliest.region, jiangan)
+        self.assertEqual(latest.region, wuhan)
+        self.assertEqual(ProjectMapping.objects.filter(project_name='重名项目').count(), 2)
@@ -9,6 +9,8 @@ urlpatterns = [
     path('add/', views.project_add, name='project_add'),
     path('excel/', views.project_excel, name='project_excel'),
     path('list/', views.project_list, name='project_list'),
+    path('bulk/', views.project_bulk, name='project_bulk'),
+    path('export/', views.project_export, name='project_export'),
     path('<int:project_id>/', views.project_detail, name='project_detail'),
     path('<int:project_id>/edit/', views.project_edit, name='project_edit'),
     path('<int:project_id>/delete/', views.project_delete, name='project_delete'),
@@ -21,4 +23,9 @@ urlpatterns = [
     path('api/districts/', views.get_districts, name='get_districts'),
     path('api/project-mapping-info/', views.get_project_mapping_info, name='get_project_mapping_info'),
     path('api/specifications/', views.get_specifications, name='get_specifications'),
+    path('api/autocomplete/<str:source>/', views.autocomplete, name='autocomplete'),
+    path('api/projects/', views.project_data, name='project_data'),
+    path('api/excel-preview/', views.excel_preview, name='excel_preview'),
+    path('api/uploads/<int:upload_id>/progress/', views.upload_progress, name='upload_progress'),
+    path('uploads/<int:upload_id>/error-report/', views.upload_error_report, name='upload_error_report'),
 ]
@@ -1,15 +1,16 @@
 # apps/projects/views.py
 import os
-import tempfile
 from functools import wraps
-import pandas as pd
+from urllib.parse import quote
 
+from django.conf import settings
 from django.contrib import messages
-from django.db import transaction
-from django.db.models import Q
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import format_html
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import JsonResponse, FileResponse, Http404, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.core.paginator import Paginator
 from .models import Project, ProjectMapping, Specification, MaterialCategory, Brand, DataUpload
@@ -17,7 +18,17 @@ from ..price.models import ConcretePrice
 from ..region.models import Region
 from ..supplier.models import Supplier
 from ..users.models import User
-from .forms import ProjectForm, ExcelUploadForm, ProjectMappingExcelUploadForm
+from .autocomplete import AUTOCOMPLETE_SOURCES, search_choices
+from .bulk import bulk_update_projects, bulk_delete_projects, BULK_EDIT_FIELDS
+from .exports import stream_csv, stream_xlsx, project_columns, API_FIELDS, DEFAULT_API_FIELDS
+from .facets import get_project_facets, count_project_facets
+from .filters import filter_projects, visible_projects
+from .forms import ProjectForm, ProjectBulkForm, ExcelUploadForm, ProjectMappingExcelUploadForm
+from .importers import ProjectMappingImporter, MAPPING_REQUIRED_COLUMNS
+from .jobs import enqueue_project_import, save_uploaded_file, find_duplicate_upload
+from .readers import iter_row_batches, inspect_workbook, preview_sheet, MissingColumnsError
+from .pagination import KeysetPaginator
+from .reports import ErrorReport
 
 
 def admin_required(view_func):
@@ -45,24 +56,28 @@ def project_excel(request):
         excel_file = request.FILES.get('excel_file')
         if excel_file:
             try:
-                # 创建临时文件来存储上传的Excel文件
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
-                    for chunk in excel_file.chunks():
-                        tmp.write(chunk)
-                    tmp_path = tmp.name
-
-                try:
-                    # 获取工作表列表
-                    if excel_file.name.endswith('.xlsx'):
-                        engine = 'openpyxl'
-                    elif excel_file.name.endswith('.xls'):
-                        engine = 'xlrd'
+                # 创建临时文件来存储上传的Excel文件，写入时计算文件哈希
+                suffix = os.path.splitext(excel_file.name)[1] or '.xlsx'
+                tmp_path, file_hash = save_uploaded_file(excel_file, suffix=suffix)
+
+                # 内容完全相同的文件已经导入过或正在导入，直接跳转到原导入记录；
+                # 勾选"重新导入"时只拦截排队中和处理中的相同文件
+                reimport = bool(request.POST.get('reimport'))
+                duplicate = find_duplicate_upload(file_hash, include_completed=not reimport)
+                if duplicate is not None:
+                    os.unlink(tmp_path)
+                    if duplicate.is_finished:
+                        messages.info(request, f'该文件已于 {timezone.localtime(duplicate.upload_time):%Y-%m-%d %H:%M} '
+                                               f'导入过，如需再次导入请勾选"重新导入"')
                     else:
-                        engine = None
+                        messages.info(request, '该文件正在导入中，无需重复上传')
+                    return redirect(f"{reverse('projects:project_excel')}?upload={duplicate.id}")
 
-                    # 读取Excel文件中的所有工作表名称
-                    excel_file_obj = pd.ExcelFile(tmp_path, engine=engine)
-                    sheet_names = excel_file_obj.sheet_names
+                try:
+                    # 直接从文件元数据读取工作表列表和尺寸，并预览第一个工作表的前几行
+                    sheets = inspect_workbook(tmp_path, excel_file.name)
+                    sheet_names = [sheet['name'] for sheet in sheets]
+                    preview_header, preview_rows = preview_sheet(tmp_path, filename=excel_file.name)
 
                     # 创建表单并传递工作表选项，默认选择第一个工作表
                     sheet_choices = [('', '使用第一个工作表（默认）')] + [(name, name) for name in sheet_names]
@@ -72,10 +87,15 @@ def project_excel(request):
                     # 保存临时文件路径到会话中
                     request.session['excel_tmp_path'] = tmp_path
                     request.session['excel_filename'] = excel_file.name
+                    request.session['excel_file_hash'] = file_hash
 
                     return render(request, 'project_excel.html', {
                         'form': form,
                         'sheet_names': sheet_names,
+                        'sheets': sheets,
+                        'preview_header': preview_header,
+                        'preview_rows': preview_rows,
+                        'preview_url': f"{reverse('projects:excel_preview')}?source=project",
                         'preview_mode': True
                     })
 
@@ -92,7 +112,7 @@ def project_excel(request):
         else:
             form = ExcelUploadForm()
 
-    # 导入模式 - 实际导入数据
+    # 导入模式 - 创建后台导入任务
     elif request.method == 'POST':
         form = ExcelUploadForm(request.POST, request.FILES)
         sheet_name = request.POST.get('sheet_name', '')
@@ -100,193 +120,131 @@ def project_excel(request):
         # 检查是否从会话中获取临时文件
         tmp_path = request.session.get('excel_tmp_path')
         excel_filename = request.session.get('excel_filename')
+        file_hash = request.session.get('excel_file_hash', '')
+
+        # 清理会话数据
+        for key in ('excel_tmp_path', 'excel_filename', 'excel_file_hash'):
+            if key in request.session:
+                del request.session[key]
 
         if tmp_path and os.path.exists(tmp_path):
             try:
-                # 保存上传记录
-                data_upload = DataUpload.objects.create(
-                    user=request.user,
-                    file_path=excel_filename or 'unknown.xlsx',
-                    status='processing'
+                data_upload = enqueue_project_import(
+                    request.user, tmp_path, excel_filename or 'unknown.xlsx', sheet_name, file_hash
                 )
-
-                try:
-                    # 使用 pandas 读取临时文件，支持指定工作表
-                    excel_file_name = excel_filename or 'unknown.xlsx'
-                    if excel_file_name.endswith('.xlsx'):
-                        engine = 'openpyxl'
-                    elif excel_file_name.endswith('.xls'):
-                        engine = 'xlrd'
-                    else:
-                        engine = None  # 让pandas自动选择
-
-                    # 如果指定了工作表名称，则使用指定的工作表
-                    if sheet_name:
-                        df = pd.read_excel(tmp_path, sheet_name=sheet_name, engine=engine)
-                    else:
-                        # 否则使用第一个工作表
-                        df = pd.read_excel(tmp_path, engine=engine)
-
-                    # 验证必要的列是否存在
-                    required_columns = ['项目名称', '到货日期', '供应商', '物资类别', '规格', '数量', '单价（不含税）']
-                    missing_columns = [col for col in required_columns if col not in df.columns]
-
-                    if missing_columns:
-                        messages.error(request, f'Excel文件缺少必要的列: {", ".join(missing_columns)}')
-                        data_upload.status = 'failed'
-                        data_upload.save()
-                        # 清理会话数据
-                        if 'excel_tmp_path' in request.session:
-                            del request.session['excel_tmp_path']
-                        if 'excel_filename' in request.session:
-                            del request.session['excel_filename']
-                        return redirect('projects:project_excel')
-
-                    # 获取ID为1的默认地区
-                    try:
-                        default_region = Region.objects.get(id=1)
-                    except Region.DoesNotExist:
-                        messages.error(request, '系统中不存在ID为1的地区，请先创建默认地区')
-                        data_upload.status = 'failed'
-                        data_upload.save()
-                        # 清理会话数据
-                        if 'excel_tmp_path' in request.session:
-                            del request.session['excel_tmp_path']
-                        if 'excel_filename' in request.session:
-                            del request.session['excel_filename']
-                        return redirect('projects:project_excel')
-
-                    # 获取ID为1的默认品牌
-                    try:
-                        default_brand = Brand.objects.get(id=1)
-                    except Brand.DoesNotExist:
-                        messages.error(request, '系统中不存在ID为1的品牌，请先创建默认品牌')
-                        data_upload.status = 'failed'
-                        data_upload.save()
-                        # 清理会话数据
-                        if 'excel_tmp_path' in request.session:
-                            del request.session['excel_tmp_path']
-                        if 'excel_filename' in request.session:
-                            del request.session['excel_filename']
-                        return redirect('projects:project_excel')
-
-                    # 处理数据并保存到数据库
-                    success_count = 0
-                    error_messages = []
-
-                    with transaction.atomic():
-                        for index, row in df.iterrows():
-                            try:
-                                # 验证必要字段不为空
-                                if pd.isna(row['项目名称']) or pd.isna(row['到货日期']) or \
-                                        pd.isna(row['供应商']) or pd.isna(row['物资类别']) or \
-                                        pd.isna(row['规格']) or pd.isna(row['数量']) or \
-                                        pd.isna(row['单价（不含税）']):
-                                    raise ValueError("必要字段不能为空")
-
-                                # 处理项目映射
-                                project_name = str(row['项目名称']).strip()
-
-                                # 获取或创建项目映射，使用ID为1的地区作为默认地区
-                                project_mapping, created = ProjectMapping.objects.get_or_create(
-                                    project_name=project_name,
-                                    defaults={'region': default_region}
-                                )
-
-                                # 获取供应商
-                                supplier, created = Supplier.objects.get_or_create(
-                                    supplier_name=str(row['供应商']).strip()
-                                )
-
-                                # 获取物资类别
-                                category, created = MaterialCategory.objects.get_or_create(
-                                    category_name=str(row['物资类别']).strip()
-                                )
-
-                                # 获取规格
-                                specification, created = Specification.objects.get_or_create(
-                                    specification_name=str(row['规格']).strip(),
-                                    category=category
-                                )
-
-                                # 处理品牌 - 使用ID为1的品牌作为默认品牌
-                                brand = default_brand
-                                if '品牌' in row and pd.notna(row['品牌']) and str(row['品牌']).strip() not in ['/','']:
-                                    brand_name = str(row['品牌']).strip()
-                                    # 尝试查找现有品牌，如果不存在则创建新品牌
-                                    brand, created = Brand.objects.get_or_create(
-                                        brand_name=brand_name
-                                    )
-
-                                # 处理日期格式
-                                arrival_date = pd.to_datetime(row['到货日期'])
-
-                                # 处理数值字段
-                                try:
-                                    quantity = float(row['数量'])
-                                    unit_price = float(row['单价（不含税）'])
-                                    discount_rate = float(row.get('下浮率%', 0)) if pd.notna(
-                                        row.get('下浮率%', 0)) else 0
-                                except ValueError:
-                                    raise ValueError("数量、单价或下浮率格式不正确")
-
-                                # 创建项目
-                                Project.objects.create(
-                                    project_mapping=project_mapping,
-                                    arrival_date=arrival_date,
-                                    supplier=supplier,
-                                    category=category,
-                                    specification=specification,
-                                    quantity=quantity,
-                                    unit_price=unit_price,
-                                    discount_rate=discount_rate,
-                                    brand=brand,
-                                    user=request.user
-                                )
-                                success_count += 1
-
-                            except Exception as e:
-                                error_messages.append(f"第{index + 2}行数据导入失败: {str(e)}")  # +2因为索引从0开始，且第一行是标题行
-
-                    if error_messages:
-                        for error in error_messages:
-                            messages.warning(request, error)
-
-                    messages.success(request, f'成功导入 {success_count} 条数据')
-                    data_upload.status = 'completed'
-                    data_upload.save()
-
-                finally:
-                    # 删除临时文件
-                    os.unlink(tmp_path)
-                    # 清理会话数据
-                    if 'excel_tmp_path' in request.session:
-                        del request.session['excel_tmp_path']
-                    if 'excel_filename' in request.session:
-                        del request.session['excel_filename']
-
             except Exception as e:
-                messages.error(request, f'导入过程中发生错误: {str(e)}')
-                data_upload.status = 'failed'
-                data_upload.save()
-                # 清理会话数据
-                if 'excel_tmp_path' in request.session:
-                    del request.session['excel_tmp_path']
-                if 'excel_filename' in request.session:
-                    del request.session['excel_filename']
-                # 删除临时文件
+                messages.error(request, f'创建导入任务时发生错误: {str(e)}')
                 if os.path.exists(tmp_path):
                     os.unlink(tmp_path)
+                return redirect('projects:project_excel')
 
-            return redirect('projects:project_list')
+            messages.info(request, '文件已上传，正在后台导入，可在本页查看进度')
+            return redirect(f"{reverse('projects:project_excel')}?upload={data_upload.id}")
         else:
             messages.error(request, '文件信息丢失，请重新上传文件')
             form = ExcelUploadForm()
     else:
         form = ExcelUploadForm()
 
-    return render(request, 'project_excel.html', {'form': form, 'preview_mode': False})
+    # 显示后台导入任务的进度
+    data_upload = None
+    upload_id = request.GET.get('upload')
+    if upload_id and upload_id.isdigit():
+        data_upload = _get_visible_upload(request, int(upload_id))
+
+    return render(request, 'project_excel.html', {
+        'form': form,
+        'preview_mode': False,
+        'data_upload': data_upload
+    })
+
 
+def _get_visible_upload(request, upload_id):
+    """获取当前用户可查看的上传记录：管理员可查看全部，普通用户只能查看自己的"""
+    uploads = DataUpload.objects.filter(id=upload_id)
+    if not (request.user.is_superuser or request.user.permission == 'admin'):
+        uploads = uploads.filter(user=request.user)
+    return uploads.first()
+
+
+@login_required
+@require_http_methods(["GET"])
+def upload_progress(request, upload_id):
+    """
+    查询后台导入任务的进度
+    """
+    data_upload = _get_visible_upload(request, upload_id)
+    if data_upload is None:
+        return JsonResponse({'error': '上传记录不存在'}, status=404)
+
+    return JsonResponse({
+        'id': data_upload.id,
+        'file_name': data_upload.file_name,
+        'status': data_upload.status,
+        'status_display': data_upload.get_status_display(),
+        'finished': data_upload.is_finished,
+        'rows_processed': data_upload.rows_processed,
+        'rows_failed': data_upload.rows_failed,
+        'elapsed_seconds': round(data_upload.elapsed_seconds, 2),
+        'rows_per_second': round(data_upload.rows_per_second, 1),
+        'error_message': data_upload.error_message,
+        'error_report_url': (reverse('projects:upload_error_report', args=[data_upload.id])
+                             if data_upload.error_report else ''),
+    }, json_dumps_params={'ensure_ascii': False})
+
+
+@login_required
+@require_http_methods(["GET"])
+def upload_error_report(request, upload_id):
+    """
+    下载导入任务的错误报告
+    """
+    data_upload = _get_visible_upload(request, upload_id)
+    if data_upload is None or not data_upload.error_report or not os.path.exists(data_upload.error_report):
+        raise Http404('错误报告不存在')
+
+    base_name = os.path.splitext(data_upload.file_name or 'upload')[0]
+    return FileResponse(
+        open(data_upload.error_report, 'rb'),
+        as_attachment=True,
+        filename=f'{base_name}_错误报告.csv',
+        content_type='text/csv'
+    )
+
+
+@login_required
+@require_http_methods(["GET"])
+def excel_preview(request):
+    """
+    预览已上传Excel文件中指定工作表的标题行和前几行数据
+    """
+    session_keys = {
+        'project': ('excel_tmp_path', 'excel_filename'),
+        'mapping': ('mapping_excel_tmp_path', 'mapping_excel_filename'),
+    }
+    path_key, filename_key = session_keys.get(request.GET.get('source'), session_keys['project'])
+    tmp_path = request.session.get(path_key)
+    if not tmp_path or not os.path.exists(tmp_path):
+        return JsonResponse({'error': '文件信息丢失，请重新上传文件'}, status=404)
+
+    try:
+        limit = min(int(request.GET.get('limit', 10)), 100)
+    except ValueError:
+        limit = 10
+
+    try:
+        header, rows = preview_sheet(
+            tmp_path,
+            sheet_name=request.GET.get('sheet') or None,
+            filename=request.session.get(filename_key),
+            limit=limit
+        )
+    except KeyError:
+        return JsonResponse({'error': '工作表不存在'}, status=404)
+    except Exception as e:
+        return JsonResponse({'error': f'读取Excel文件时发生错误: {str(e)}'}, status=400)
+
+    return JsonResponse({'header': header, 'rows': rows}, json_dumps_params={'ensure_ascii': False})
 
 
 @login_required
@@ -299,21 +257,12 @@ def project_mapping_excel(request):
         excel_file = request.FILES.get('excel_file')
         if excel_file:
             try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
-                    for chunk in excel_file.chunks():
-                        tmp.write(chunk)
-                    tmp_path = tmp.name
+                tmp_path, _ = save_uploaded_file(excel_file)
 
                 try:
-                    if excel_file.name.endswith('.xlsx'):
-                        engine = 'openpyxl'
-                    elif excel_file.name.endswith('.xls'):
-                        engine = 'xlrd'
-                    else:
-                        engine = None
-
-                    excel_file_obj = pd.ExcelFile(tmp_path, engine=engine)
-                    sheet_names = excel_file_obj.sheet_names
+                    sheets = inspect_workbook(tmp_path, excel_file.name)
+                    sheet_names = [sheet['name'] for sheet in sheets]
+                    preview_header, preview_rows = preview_sheet(tmp_path, filename=excel_file.name)
 
                     sheet_choices = [('', '使用第一个工作表（默认）')] + [(name, name) for name in sheet_names]
                     form = ProjectMappingExcelUploadForm(sheet_choices=sheet_choices)
@@ -325,6 +274,10 @@ def project_mapping_excel(request):
                     return render(request, 'project_mapping_excel.html', {
                         'form': form,
                         'sheet_names': sheet_names,
+                        'sheets': sheets,
+                        'preview_header': preview_header,
+                        'preview_rows': preview_rows,
+                        'preview_url': f"{reverse('projects:excel_preview')}?source=mapping",
                         'preview_mode': True
                     })
 
@@ -352,115 +305,71 @@ def project_mapping_excel(request):
                 data_upload = DataUpload.objects.create(
                     user=request.user,
                     file_path=excel_filename or 'unknown.xlsx',
-                    status='processing'
+                    file_name=excel_filename or 'unknown.xlsx',
+                    status=DataUpload.STATUS_QUEUED
                 )
+                # 项目映射在请求中同步导入，创建后直接进入处理中
+                data_upload.transition(DataUpload.STATUS_PROCESSING, started_at=timezone.now())
 
                 try:
-                    excel_file_name = excel_filename or 'unknown.xlsx'
-                    if excel_file_name.endswith('.xlsx'):
-                        engine = 'openpyxl'
-                    elif excel_file_name.endswith('.xls'):
-                        engine = 'xlrd'
-                    else:
-                        engine = None
-
-                    df = pd.read_excel(tmp_path, sheet_name=sheet_name, engine=engine)
-
-                    # 验证必要列
-                    required_columns = ['项目名称', '地区（区/县）', '地区（市）']
-                    missing_columns = [col for col in required_columns if col not in df.columns]
-                    if missing_columns:
-                        messages.error(request, f'Excel文件缺少必要的列: {", ".join(missing_columns)}')
-                        data_upload.status = 'failed'
-                        data_upload.save()
-                        del request.session['mapping_excel_tmp_path']
-                        del request.session['mapping_excel_filename']
+                    # 流式读取并验证必要列
+                    try:
+                        batches = iter_row_batches(
+                            tmp_path,
+                            sheet_name=sheet_name or None,
+                            filename=excel_filename or 'unknown.xlsx',
+                            batch_size=settings.IMPORT_BATCH_SIZE,
+                            required_columns=MAPPING_REQUIRED_COLUMNS
+                        )
+                    except MissingColumnsError as e:
+                        messages.error(request, str(e))
+                        data_upload.transition(DataUpload.STATUS_FAILED, error_message=str(e),
+                                               finished_at=timezone.now())
                         return redirect('projects:project_mapping_excel')
 
-                    success_count = 0
-                    error_messages = []
-
-                    with transaction.atomic():
-                        for index, row in df.iterrows():
-                            try:
-                                # 验证必要字段不为空
-                                if pd.isna(row['项目名称']):
-                                    raise ValueError("项目名称不能为空")
-
-                                project_name = str(row['项目名称']).strip()
-
-                                # 处理地区信息
-                                district = row['地区（区/县）']
-                                city = row['地区（市）']
-
-                                # 处理非正常地区数据
-                                if pd.isna(district) or district in ['/', '', None]:
-                                    district = ''
-                                else:
-                                    district = str(district).strip()
-
-                                if pd.isna(city) or city in ['/', '', None]:
-                                    raise ValueError("地区（市）不能为空")
-                                else:
-                                    city = str(city).strip()
-
-                                # 查找地区，不允许新增地区
-                                try:
-                                    if district:
-                                        # 优先查找区县
-                                        region = Region.objects.get(city=city, district=district)
-                                    else:
-                                        # 查找市级地区
-                                        region = Region.objects.get(city=city, district='')
-                                except Region.DoesNotExist:
-                                    if district:
-                                        # 如果区县找不到，尝试查找市级地区
-                                        try:
-                                            region = Region.objects.get(city=city, district='')
-                                            # 区县找不到，但市级存在，可以继续但需要提示
-                                            messages.warning(request,
-                                                             f'第{index + 2}行：区县"{district}"未找到，使用市级地区"{city}"')
-                                        except Region.DoesNotExist:
-                                            raise ValueError(f'地区"{city}"不存在')
-                                    else:
-                                        raise ValueError(f'地区"{city}"不存在')
-
-                                # 创建或更新项目映射
-                                project_mapping, created = ProjectMapping.objects.get_or_create(
-                                    project_name=project_name,
-                                    defaults={'region': region}
-                                )
-                                if not created and project_mapping.region != region:
-                                    project_mapping.region = region
-                                    project_mapping.save()
-
-                                success_count += 1
-
-                            except Exception as e:
-                                error_messages.append(f"第{index + 2}行数据导入失败: {str(e)}")
-
-                    if error_messages:
-                        for error in error_messages:
-                            messages.warning(request, error)
-
-                    messages.success(request, f'成功导入 {success_count} 条项目映射数据')
-                    data_upload.status = 'completed'
-                    data_upload.save()
+                    # 地区在内存中解析，项目映射批量创建和更新；失败和需提示的行写入错误报告
+                    report = ErrorReport()
+                    importer = ProjectMappingImporter(batch_size=settings.IMPORT_BATCH_SIZE, report=report)
+                    try:
+                        result = importer.run(batches)
+                    finally:
+                        data_upload.error_report = report.close()
+
+                    error_message = ''
+                    if result.error_count or result.warning_count:
+                        error_message = (f'{result.error_count} 行数据导入失败，'
+                                         f'{result.warning_count} 行使用了市级地区')
+                    data_upload.transition(
+                        DataUpload.STATUS_COMPLETED,
+                        rows_processed=result.success_count + result.error_count,
+                        rows_failed=result.error_count,
+                        error_message=error_message,
+                        error_report=data_upload.error_report,
+                        finished_at=timezone.now()
+                    )
+
+                    messages.success(request, f'成功导入 {result.success_count} 条项目映射数据')
+                    if error_message:
+                        messages.warning(request, format_html(
+                            '{}，<a href="{}">下载错误报告</a>',
+                            error_message,
+                            reverse('projects:upload_error_report', args=[data_upload.id])
+                        ))
 
                 finally:
                     os.unlink(tmp_path)
-                    del request.session['mapping_excel_tmp_path']
-                    del request.session['mapping_excel_filename']
+                    request.session.pop('mapping_excel_tmp_path', None)
+                    request.session.pop('mapping_excel_filename', None)
 
             except Exception as e:
                 messages.error(request, f'导入过程中发生错误: {str(e)}')
-                if 'data_upload' in locals():
-                    data_upload.status = 'failed'
-                    data_upload.save()
-                if 'tmp_path' in locals():
+                if 'data_upload' in locals() and not data_upload.is_finished:
+                    data_upload.transition(DataUpload.STATUS_FAILED, error_message=f'导入过程中发生错误: {str(e)}',
+                                           error_report=data_upload.error_report, finished_at=timezone.now())
+                if os.path.exists(tmp_path):
                     os.unlink(tmp_path)
-                del request.session['mapping_excel_tmp_path']
-                del request.session['mapping_excel_filename']
+                request.session.pop('mapping_excel_tmp_path', None)
+                request.session.pop('mapping_excel_filename', None)
 
             return redirect('projects:project_mapping_list')
         else:
@@ -492,31 +401,35 @@ def project_add(request):
     else:
         form = ProjectForm()
 
-    # 获取所有项目映射数据，包含地区信息
-    project_mappings = ProjectMapping.objects.select_related('region').all()
-    categories = MaterialCategory.objects.all()
-    brands = Brand.objects.all()
-    suppliers = Supplier.objects.all()  # 获取所有供应商
-
+    # 项目名称、供应商、物资类别和品牌的选项由自动补全接口按需加载，这里只回显已选中的值
     context = {
         'form': form,
-        'project_mappings': project_mappings,
-        'categories': categories,
-        'brands': brands,
-        'suppliers': suppliers,
+        'choices': form.selected_choices(),
         'user': request.user,
     }
 
     return render(request, 'project_add.html', context)
 
 
+def _page_query(request):
+    """
+    当前请求的查询参数（不含分页参数），非空时以&结尾，用于拼接分页链接
+    """
+    params = request.GET.copy()
+    for key in ('cursor', 'last', 'page'):
+        params.pop(key, None)
+    query = params.urlencode()
+    return f'{query}&' if query else ''
+
+
 @login_required
 def project_list(request):
     """
     查看所有项目信息，添加筛选和搜索功能
     """
     # 获取基础查询集 - 根据用户权限决定展示范围
-    projects_queryset = Project.objects.select_related(
+    scoped_projects = visible_projects(request.user)
+    projects_list = scoped_projects.select_related(
         'project_mapping__region',  # 项目映射及其地区
         'supplier',  # 供应商
         'category',  # 物资类别
@@ -525,135 +438,124 @@ def project_list(request):
         'user'  # 用户
     )
 
-    # 权限控制：管理员可以看到所有项目，普通用户只能看到自己填报的项目
-    if not (request.user.is_superuser or request.user.permission == 'admin'):
-        projects_list = projects_queryset.filter(user=request.user)
-    else:
-        projects_list = projects_queryset
-
-    # 获取搜索和筛选参数
-    search_query = request.GET.get('search', '')
-    project_name_filter = request.GET.get('project_name', '')
-    supplier_filter = request.GET.get('supplier', '')
-    category_filter = request.GET.get('category', '')
-    specification_filter = request.GET.get('specification', '')
-    brand_filter = request.GET.get('brand', '')
-    region_filter = request.GET.get('region', '')
-    user_filter = request.GET.get('user', '')
-    start_date = request.GET.get('start_date', '')
-    end_date = request.GET.get('end_date', '')
-
-    # 应用搜索条件（全局搜索）
-    if search_query:
-        projects_list = projects_list.filter(
-            Q(project_mapping__project_name__icontains=search_query) |
-            Q(supplier__supplier_name__icontains=search_query) |
-            Q(category__category_name__icontains=search_query) |
-            Q(specification__specification_name__icontains=search_query) |
-            Q(brand__brand_name__icontains=search_query) |
-            Q(project_mapping__region__city__icontains=search_query) |
-            Q(project_mapping__region__district__icontains=search_query) |
-            Q(user__username__icontains=search_query)
-        )
+    projects_list, filters = filter_projects(request, projects_list)
 
-    # 应用筛选条件
-    if project_name_filter:
-        projects_list = projects_list.filter(
-            project_mapping__project_name=project_name_filter
-        )
+    # 获取筛选选项数据 - 根据用户权限决定，按用户范围缓存
+    facets = get_project_facets(request.user)
 
-    if supplier_filter:
-        projects_list = projects_list.filter(
-            supplier__supplier_name=supplier_filter
-        )
+    # 有筛选条件时统计各选项在当前条件下的项目数
+    facet_counts = None
+    if any(filters.values()):
+        facet_counts = count_project_facets(request, scoped_projects)
 
-    if category_filter:
-        projects_list = projects_list.filter(
-            category__category_name=category_filter
-        )
+    # 键集分页，每页显示20条数据；总条数只在请求时统计
+    paginator = KeysetPaginator(projects_list, 20)
+    projects = paginator.get_page(
+        cursor=request.GET.get('cursor'),
+        last=request.GET.get('last') == '1',
+        with_count=request.GET.get('count') == '1'
+    )
 
-    if specification_filter:
-        projects_list = projects_list.filter(
-            specification__id=specification_filter
-        )
+    return render(request, 'project_list.html', {
+        'projects': projects,
+        **facets,
+        'facet_counts': facet_counts,
+        'page_query': _page_query(request),
+        **filters,
+    })
 
-    if brand_filter:
-        projects_list = projects_list.filter(
-            brand__brand_name=brand_filter
-        )
 
-    if region_filter:
-        projects_list = projects_list.filter(
-            project_mapping__region__id=region_filter
-        )
+@login_required
+@require_http_methods(["POST"])
+def project_bulk(request):
+    """
+    项目列表的批量操作：对勾选的项目或当前筛选结果的全部项目批量修改品牌、下浮率或删除
 
-    if user_filter:
-        # 管理员可以按用户筛选，普通用户只能看到自己的数据，不需要按用户筛选
-        if request.user.is_superuser or request.user.permission == 'admin':
-            projects_list = projects_list.filter(
-                user__username=user_filter
-            )
+    操作范围限定在当前用户可见的项目内，与单条编辑、删除的权限规则一致：
+    管理员可以操作所有项目，普通用户只能操作自己填报的项目。
+    """
+    list_url = f"{reverse('projects:project_list')}?{_page_query(request)}".rstrip('?&')
+    form = ProjectBulkForm(request.POST)
+    if not form.is_valid():
+        for errors in form.errors.values():
+            for error in errors:
+                messages.error(request, error)
+        return redirect(list_url)
+
+    projects_list = visible_projects(request.user)
+    ids = list(dict.fromkeys(int(value) for value in request.POST.getlist('ids') if value.isdigit()))
+    if form.cleaned_data['scope'] == 'all':
+        projects_list, _ = filter_projects(request, projects_list)
+    elif ids:
+        projects_list = projects_list.filter(id__in=ids)
+    else:
+        messages.error(request, '请先勾选要操作的项目。')
+        return redirect(list_url)
+
+    action = form.cleaned_data['action']
+    batch_size = settings.BULK_EDIT_BATCH_SIZE
+    if action == 'delete':
+        count = bulk_delete_projects(projects_list, batch_size)
+        messages.success(request, f'已删除 {count} 条项目数据。')
+    else:
+        count = bulk_update_projects(projects_list, form.changes(), batch_size)
+        messages.success(request, f'已修改 {count} 条项目数据的{BULK_EDIT_FIELDS[action]}。')
 
-    if start_date:
-        projects_list = projects_list.filter(
-            arrival_date__gte=start_date
-        )
+    if form.cleaned_data['scope'] == 'selected' and count < len(ids):
+        messages.warning(request, f'{len(ids) - count} 条项目不存在或没有操作权限，已跳过。')
+    return redirect(list_url)
 
-    if end_date:
-        projects_list = projects_list.filter(
-            arrival_date__lte=end_date
-        )
 
-    # 获取筛选选项数据 - 根据用户权限决定
-    if request.user.is_superuser or request.user.permission == 'admin':
-        # 管理员可以看到所有选项
-        project_names = ProjectMapping.objects.values_list('project_name', flat=True).distinct()
-        suppliers = Supplier.objects.values_list('supplier_name', flat=True).distinct()
-        categories = MaterialCategory.objects.values_list('category_name', flat=True).distinct()
-        brands = Brand.objects.values_list('brand_name', flat=True).distinct()
-        regions = Region.objects.all()
-        users = User.objects.values_list('username', flat=True).distinct()
+@login_required
+@require_http_methods(["GET"])
+def project_export(request):
+    """
+    按项目列表当前的权限范围和筛选条件导出项目数据（CSV或xlsx），分块读取并流式输出
+    """
+    projects_list, _ = filter_projects(request, visible_projects(request.user))
+    file_name = f'项目数据_{timezone.localtime():%Y%m%d%H%M%S}'
+    chunk_size = settings.EXPORT_CHUNK_SIZE
+
+    if request.GET.get('format') == 'xlsx':
+        response = StreamingHttpResponse(
+            stream_xlsx(projects_list, chunk_size),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+        file_name += '.xlsx'
     else:
-        # 普通用户只能看到与自己相关的选项
-        user_projects = projects_queryset.filter(user=request.user)
-        project_names = user_projects.values_list('project_mapping__project_name', flat=True).distinct()
-        suppliers = user_projects.values_list('supplier__supplier_name', flat=True).distinct()
-        categories = user_projects.values_list('category__category_name', flat=True).distinct()
-        brands = user_projects.values_list('brand__brand_name', flat=True).distinct()
-        regions = Region.objects.filter(
-            projectmapping__project__user=request.user
-        ).distinct()
-        users = [request.user.username]  # 普通用户只能看到自己
-
-    specifications = Specification.objects.select_related('category')
-
-    # 创建Paginator对象，每页显示20条数据
-    paginator = Paginator(projects_list, 20)
-    # 获取当前页码
-    page_number = request.GET.get('page')
-    # 获取当前页的项目数据
-    projects = paginator.get_page(page_number)
+        response = StreamingHttpResponse(stream_csv(projects_list, chunk_size), content_type='text/csv; charset=utf-8')
+        file_name += '.csv'
+    response['Content-Disposition'] = f"attachment; filename*=UTF-8''{quote(file_name)}"
+    return response
 
-    return render(request, 'project_list.html', {
-        'projects': projects,
-        'project_names': project_names,
-        'suppliers': suppliers,
-        'categories': categories,
-        'brands': brands,
-        'regions': regions,
-        'users': users,
-        'specifications': specifications,
-        'search_query': search_query,
-        'project_name_filter': project_name_filter,
-        'supplier_filter': supplier_filter,
-        'category_filter': category_filter,
-        'specification_filter': specification_filter,
-        'brand_filter': brand_filter,
-        'region_filter': region_filter,
-        'user_filter': user_filter,
-        'start_date': start_date,
-        'end_date': end_date,
-    })
+
+@login_required
+@require_http_methods(["GET"])
+def project_data(request):
+    """
+    项目数据JSON接口，筛选条件与项目列表相同
+
+    fields 指定返回的字段（逗号分隔），limit 指定行数，数据按列返回，
+    next_cursor 非空时作为 cursor 参数获取下一批数据。
+    """
+    fields = [name.strip() for name in request.GET.get('fields', '').split(',') if name.strip()]
+    fields = list(dict.fromkeys(fields)) or DEFAULT_API_FIELDS
+    unknown_fields = [name for name in fields if name not in API_FIELDS]
+    if unknown_fields:
+        return JsonResponse({
+            'error': f'不支持的字段: {", ".join(unknown_fields)}',
+            'available_fields': list(API_FIELDS),
+        }, status=400, json_dumps_params={'ensure_ascii': False})
+
+    try:
+        limit = int(request.GET.get('limit', settings.PROJECT_API_DEFAULT_ROWS))
+    except ValueError:
+        limit = settings.PROJECT_API_DEFAULT_ROWS
+    limit = max(1, min(limit, settings.PROJECT_API_MAX_ROWS))
+
+    projects_list, _ = filter_projects(request, visible_projects(request.user))
+    data = project_columns(projects_list, fields, limit, request.GET.get('cursor'))
+    return JsonResponse(data, json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')})
 
 
 @login_required
@@ -697,19 +599,11 @@ def project_edit(request, project_id):
     else:
         form = ProjectForm(instance=project)
 
-    # 获取所有项目映射数据，包含地区信息
-    project_mappings = ProjectMapping.objects.select_related('region').all()
-    categories = MaterialCategory.objects.all()
-    brands = Brand.objects.all()
-    suppliers = Supplier.objects.all()  # 获取所有供应商
-
+    # 项目名称、供应商、物资类别和品牌的选项由自动补全接口按需加载，这里只回显已选中的值
     context = {
         'form': form,
         'project': project,
-        'project_mappings': project_mappings,
-        'categories': categories,
-        'brands': brands,
-        'suppliers': suppliers,
+        'choices': form.selected_choices(),
         'user': request.user,
         'title': '编辑项目'
     }
@@ -950,6 +844,25 @@ def get_project_mapping_info(request):
             pass
     return JsonResponse({})
 
+@login_required
+@require_http_methods(["GET"])
+def autocomplete(request, source):
+    """
+    项目表单的自动补全接口，q 为关键字，limit 为返回的选项数（不超过 AUTOCOMPLETE_LIMIT）
+
+    返回 {'results': [{'id': ..., 'text': ...}]}，前缀匹配的选项排在前面。
+    """
+    if source not in AUTOCOMPLETE_SOURCES:
+        raise Http404('不支持的自动补全数据源')
+    try:
+        limit = int(request.GET.get('limit', settings.AUTOCOMPLETE_LIMIT))
+    except ValueError:
+        limit = settings.AUTOCOMPLETE_LIMIT
+    limit = max(1, min(limit, settings.AUTOCOMPLETE_LIMIT))
+    results = search_choices(source, request.GET.get('q', ''), limit)
+    return JsonResponse({'results': results}, json_dumps_params={'ensure_ascii': False})
+
+
 @require_http_methods(["GET"])
 def get_specifications(request):
     """
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('region', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='region',
+            index=models.Index(fields=['citypy', 'district'], name='region_citypy_district_idx'),
+        ),
+    ]
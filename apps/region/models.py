@@ -17,6 +17,10 @@ class Region(models.Model):
         verbose_name = '地区'
         verbose_name_plural = '地区'
         unique_together = ('city', 'district')
+        indexes = [
+            # 可视化接口按城市拼音查找市级地区（district为空）
+            models.Index(fields=['citypy', 'district'], name='region_citypy_district_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         # 自动生成城市拼音
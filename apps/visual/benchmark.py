@@ -0,0 +1,188 @@
+# apps/visual/benchmark.py
+import calendar
+import datetime
+import hashlib
+import json
+import random
+import time
+from decimal import Decimal
+from inspect import unwrap
+
+from django.db import connection, transaction
+from django.test import RequestFactory
+
+from apps.brand.models import Brand
+from apps.category.models import MaterialCategory
+from apps.price.models import ConcretePrice
+from apps.price.views import price_chart_data
+from apps.projects.benchmark import _QueryCounter
+from apps.projects.models import Project, ProjectMapping
+from apps.region.models import Region
+from apps.specification.models import Specification
+from apps.supplier.models import Supplier
+from apps.users.models import User
+from . import views
+from .models import ProjectMonthlyRollup
+from .rollups import rebuild_project_rollups
+
+BENCHMARK_CITIES = (('武汉市', 'wuhan'), ('黄冈市', 'huanggang'), ('襄阳市', 'xiangyang'), ('宜昌市', 'yichang'))
+
+# 合成数据从1990年开始，避开库中的真实数据
+BENCHMARK_START = datetime.date(1990, 1, 1)
+
+
+def _month_starts(months):
+    return [
+        datetime.date(BENCHMARK_START.year + month // 12, month % 12 + 1, 1)
+        for month in range(months)
+    ]
+
+
+def generate_chart_data(projects, mappings=200, months=24, seed=0):
+    """
+    在当前数据库中生成合成的商品混凝土项目数据和每月信息价，返回生成数据的用户
+
+    规格在C30和C35之间随机，到货日期在整个时间范围内（包括每月的1日和月末）随机分布。
+    """
+    rng = random.Random(seed)
+    user = User.objects.create(username=f'chart_benchmark_{seed}', permission='admin')
+    category, _ = MaterialCategory.objects.get_or_create(category_name='商品混凝土')
+    specifications = [
+        Specification.objects.get_or_create(category=category, specification_name=name)[0]
+        for name in ('C30', 'C35')
+    ]
+    supplier = Supplier.objects.create(supplier_name=f'基准供应商{seed}')
+    brand = Brand.objects.create(brand_name=f'基准品牌{seed}')
+
+    regions = []
+    for city, citypy in BENCHMARK_CITIES:
+        regions.append(Region.objects.get_or_create(city=city, district='', defaults={'citypy': citypy})[0])
+        regions.append(Region.objects.get_or_create(city=city, district=f'{city}基准区',
+                                                    defaults={'citypy': citypy})[0])
+    project_mappings = ProjectMapping.objects.bulk_create([
+        ProjectMapping(project_name=f'基准项目{seed}-{i}', region=regions[i % len(regions)])
+        for i in range(mappings)
+    ])
+
+    month_starts = _month_starts(months)
+    last = month_starts[-1]
+    end_date = last.replace(day=calendar.monthrange(last.year, last.month)[1])
+    days = (end_date - BENCHMARK_START).days
+    Project.objects.bulk_create([
+        Project(
+            project_mapping=rng.choice(project_mappings),
+            arrival_date=BENCHMARK_START + datetime.timedelta(days=rng.randrange(days + 1)),
+            supplier=supplier,
+            category=category,
+            specification=rng.choice(specifications),
+            quantity=Decimal(rng.randrange(100, 50000)) / 100,
+            unit_price=Decimal(rng.randrange(35000, 55000)) / 100,
+            brand=brand,
+            user=user,
+        )
+        for _ in range(projects)
+    ], batch_size=2000)
+    ConcretePrice.objects.bulk_create([
+        ConcretePrice(date=month_start, **{
+            citypy: Decimal(rng.randrange(40000, 50000)) / 100 for _, citypy in BENCHMARK_CITIES
+        })
+        for month_start in month_starts
+    ])
+    return user
+
+
+def _chart_requests(months):
+    """各图表接口的请求参数：(名称, 视图, 参数)"""
+    first, last = _month_starts(months)[0], _month_starts(months)[-1]
+    start, end = first.strftime('%Y-%m'), last.strftime('%Y-%m')
+    citypys = [citypy for _, citypy in BENCHMARK_CITIES]
+    return [
+        ('chart_hnt_bar_data:year', views.chart_hnt_bar_data, {'year': str(first.year)}),
+        ('chart_hnt_bar_data:month', views.chart_hnt_bar_data, {'month': end}),
+        ('chart_hnt_line_data', views.chart_hnt_line_data,
+         {'region': 'wuhan', 'start_date': start, 'end_date': end}),
+        ('chart_hntdata', views.chart_hntdata, {'regions[]': citypys, 'start_date': start, 'end_date': end}),
+        ('price_chart_data', price_chart_data, {'cities': ','.join(citypys), 'time_range': 'all'}),
+    ]
+
+
+def _normalize(value):
+    """浮点数保留6位小数：各数据库求和、相除的最后几位可能不同，不影响图表"""
+    if isinstance(value, float):
+        return round(value, 6)
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_normalize(item) for item in value]
+    return value
+
+
+def _digest(data):
+    payload = json.dumps(_normalize(data), ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _timed(func, repeat):
+    """执行 repeat 次，返回 (最后一次的结果, 最短耗时, 单次SQL条数)"""
+    best = None
+    for _ in range(repeat):
+        counter = _QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            result = func()
+        seconds = time.perf_counter() - started
+        best = seconds if best is None else min(best, seconds)
+    return result, best, counter.count
+
+
+def run_chart_benchmark(projects, mappings=200, months=24, seed=0, repeat=3):
+    """
+    生成合成数据，测量月度汇总重建（按 TruncMonth 分组）和各图表接口的耗时、SQL条数
+
+    每项结果带结果摘要，同样的参数在不同数据库上得到的摘要应当相同。
+    图表接口绕过登录检查和响应缓存直接调用视图函数；全部数据在结束后回滚。
+    """
+    results = []
+    with transaction.atomic():
+        user = generate_chart_data(projects, mappings, months, seed)
+
+        def rollup_rows():
+            rebuild_project_rollups()
+            return list(ProjectMonthlyRollup.objects.order_by(
+                'project_mapping__project_name', 'specification__specification_name', 'month'
+            ).values_list(
+                'project_mapping__project_name', 'citypy', 'specification__specification_name', 'month',
+                'project_count', 'unit_price_sum', 'quantity_sum', 'amount_sum', 'unit_price_min', 'unit_price_max',
+            ))
+
+        rows, seconds, queries = _timed(rollup_rows, repeat)
+        results.append({'name': 'rebuild_project_rollups', 'seconds': round(seconds, 4),
+                        'queries': queries, 'rows': len(rows), 'digest': _digest(rows)})
+
+        factory = RequestFactory()
+        for name, view, params in _chart_requests(months):
+            request = factory.get('/', params)
+            request.user = user
+            response, seconds, queries = _timed(lambda: unwrap(view)(request), repeat)
+            data = json.loads(response.content)
+            results.append({'name': name, 'seconds': round(seconds, 4), 'queries': queries,
+                            'rows': len(data.get('project_data', data.get('labels', []))),
+                            'digest': _digest(data)})
+
+        transaction.set_rollback(True)
+    return results
+
+
+def compare_results(baseline, current):
+    """
+    按名称对比两次基准结果，返回 [(名称, 基准耗时, 当前耗时, 摘要是否一致)]
+    """
+    baseline_by_name = {result['name']: result for result in baseline.get('results', [])}
+    comparison = []
+    for result in current.get('results', []):
+        previous = baseline_by_name.get(result['name'])
+        if previous is None:
+            continue
+        comparison.append((result['name'], previous['seconds'], result['seconds'],
+                           previous['digest'] == result['digest']))
+    return comparison
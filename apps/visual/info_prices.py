@@ -0,0 +1,79 @@
+# apps/visual/info_prices.py
+import numpy as np
+
+from apps.price.models import ConcretePrice
+
+
+def month_ordinal(value):
+    """日期的月份序号（年 × 12 + 月 - 1），相邻月份的序号相差1"""
+    return value.year * 12 + value.month - 1
+
+
+class InfoPriceMatrix:
+    """
+    信息价矩阵：按日期排序的信息价记录 × 城市拼音，空值为 NaN
+
+    每条记录的月份序号单独保存（有序），项目起止月份对应的记录范围用二分查找得到，
+    一个项目的信息价只需对所在城市列的一段切片求值，不再逐条比较年月。
+    """
+
+    def __init__(self, months, citypys, values):
+        self.months = months
+        self.columns = {citypy: index for index, citypy in enumerate(citypys)}
+        self.values = values
+
+    @classmethod
+    def load(cls, citypys, start_date=None, end_date=None):
+        """一次查询读取日期范围内的信息价，只读取信息价表中存在的城市列"""
+        field_names = {field.name for field in ConcretePrice._meta.get_fields()}
+        citypys = [citypy for citypy in dict.fromkeys(citypys) if citypy in field_names]
+
+        records = ConcretePrice.objects.order_by('date')
+        if start_date:
+            records = records.filter(date__gte=start_date)
+        if end_date:
+            records = records.filter(date__lte=end_date)
+        rows = list(records.values_list('date', *citypys))
+
+        months = np.array([month_ordinal(row[0]) for row in rows], dtype=np.int64)
+        values = np.array(
+            [[np.nan if value is None else float(value) for value in row[1:]] for row in rows],
+            dtype=float
+        ).reshape(len(rows), len(citypys))
+        return cls(months, citypys, values)
+
+    def __len__(self):
+        return len(self.months)
+
+    def span(self, citypy, start, end):
+        """城市在 start 所在月到 end 所在月之间的有效信息价（按日期顺序），城市没有信息价列时返回 None"""
+        column = self.columns.get(citypy)
+        if column is None:
+            return None
+        low = np.searchsorted(self.months, month_ordinal(start), side='left')
+        high = np.searchsorted(self.months, month_ordinal(end), side='right')
+        prices = self.values[low:high, column]
+        return prices[~np.isnan(prices)]
+
+    def project_price(self, citypy, start, end):
+        """
+        项目的信息价，保留两位小数：单月项目取当月最后一条信息价，跨月项目取起止月份内全部信息价的平均值
+        """
+        prices = self.span(citypy, start, end)
+        if prices is None or not len(prices):
+            return None
+        if month_ordinal(start) == month_ordinal(end):
+            return round(float(prices[-1]), 2)
+        # 按日期顺序逐个累加，与逐条累加的结果一致
+        return round(sum(prices.tolist()) / len(prices), 2)
+
+    def average(self, citypy):
+        """城市全部正数信息价的平均值，保留两位小数，没有时返回 None"""
+        column = self.columns.get(citypy)
+        if column is None:
+            return None
+        prices = self.values[:, column]
+        prices = prices[prices > 0]
+        if not len(prices):
+            return None
+        return round(sum(prices.tolist()) / len(prices), 2)
@@ -0,0 +1,69 @@
+# apps/visual/management/commands/benchmark_charts.py
+import json
+import platform
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from ...benchmark import run_chart_benchmark, compare_results
+
+
+class Command(BaseCommand):
+    help = '生成合成项目数据，测量月度汇总重建和图表接口的耗时，并可与其他数据库上的结果对比'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', type=int, default=100000, help='项目数据行数，默认100000')
+        parser.add_argument('--mappings', type=int, default=200, help='项目映射个数，默认200')
+        parser.add_argument('--months', type=int, default=24, help='数据覆盖的月数，默认24')
+        parser.add_argument('--seed', type=int, default=0, help='随机数种子，默认0')
+        parser.add_argument('--repeat', type=int, default=3, help='每项重复次数，取最短耗时，默认3')
+        parser.add_argument('--output', help='将结果写入JSON文件')
+        parser.add_argument('--compare', help='与已有的JSON结果（例如另一种数据库上的结果）对比')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'读取基准文件失败: {e}')
+
+        params = {name: options[name] for name in ('projects', 'mappings', 'months', 'seed')}
+        self.stdout.write(f'在 {connection.vendor} 上生成 {options["projects"]} 行项目数据...')
+        results = run_chart_benchmark(repeat=options['repeat'], **params)
+        for result in results:
+            self.stdout.write(
+                f'{result["name"]}: {result["seconds"]} 秒，{result["queries"]} 条SQL，{result["rows"]} 行'
+            )
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            **params,
+            'results': results,
+        }
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(f'基准结果已写入 {options["output"]}')
+
+        if baseline is not None:
+            if any(baseline.get(name) != value for name, value in params.items()):
+                self.stdout.write(self.style.WARNING('基准的数据参数与本次不同，结果摘要不可直接比较'))
+            mismatched = []
+            for name, before, after, same in compare_results(baseline, report):
+                style = self.style.SUCCESS if same else self.style.ERROR
+                self.stdout.write(style(
+                    f'{name}: {baseline.get("database")} {before} 秒 → {report["database"]} {after} 秒，'
+                    f'结果{"一致" if same else "不一致"}'
+                ))
+                if not same:
+                    mismatched.append(name)
+            if mismatched:
+                raise CommandError(f'结果不一致: {", ".join(mismatched)}')
@@ -0,0 +1,12 @@
+# apps/visual/management/commands/rebuild_project_rollups.py
+from django.core.management.base import BaseCommand
+
+from ...rollups import rebuild_project_rollups
+
+
+class Command(BaseCommand):
+    help = '按全部项目数据重建项目价格月度汇总表'
+
+    def handle(self, *args, **options):
+        count = rebuild_project_rollups()
+        self.stdout.write(self.style.SUCCESS(f'已重建 {count} 条月度汇总'))
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncMonth
+
+
+def fill_rollups(apps, schema_editor):
+    """按已有项目生成月度汇总（与 rollups.rebuild_project_rollups 规则一致）"""
+    Project = apps.get_model('projects', 'Project')
+    ProjectMonthlyRollup = apps.get_model('visual', 'ProjectMonthlyRollup')
+
+    rows = Project.objects.order_by().annotate(
+        month=TruncMonth('arrival_date')
+    ).values(
+        'project_mapping_id', 'project_mapping__region_id', 'project_mapping__region__citypy',
+        'category_id', 'specification_id', 'month',
+    ).annotate(
+        project_count=Count('id'),
+        unit_price_sum=Sum('unit_price'),
+        quantity_sum=Sum('quantity'),
+        amount_sum=Sum('total_amount'),
+        unit_price_min=Min('unit_price'),
+        unit_price_max=Max('unit_price'),
+    )
+    ProjectMonthlyRollup.objects.bulk_create([
+        ProjectMonthlyRollup(
+            project_mapping_id=row['project_mapping_id'],
+            region_id=row['project_mapping__region_id'],
+            citypy=row['project_mapping__region__citypy'] or '',
+            category_id=row['category_id'],
+            specification_id=row['specification_id'],
+            month=row['month'],
+            project_count=row['project_count'],
+            unit_price_sum=row['unit_price_sum'],
+            quantity_sum=row['quantity_sum'],
+            amount_sum=row['amount_sum'] or 0,
+            unit_price_min=row['unit_price_min'],
+            unit_price_max=row['unit_price_max'],
+        )
+        for row in rows
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('category', '0003_delete_surcharge'),
+        ('projects', '0008_lookup_indexes'),
+        ('region', '0002_lookup_indexes'),
+        ('specification', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectMonthlyRollup',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('citypy', models.CharField(blank=True, max_length=50, verbose_name='城市拼音')),
+                ('month', models.DateField(verbose_name='月份')),
+                ('project_count', models.PositiveIntegerField(default=0, verbose_name='项目数')),
+                ('unit_price_sum', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='单价合计')),
+                ('quantity_sum', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='数量合计')),
+                ('amount_sum', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='金额合计')),
+                ('unit_price_min', models.DecimalField(decimal_places=2, max_digits=15, verbose_name='最低单价')),
+                ('unit_price_max', models.DecimalField(decimal_places=2, max_digits=15, verbose_name='最高单价')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='category.materialcategory', verbose_name='物资类别')),
+                ('project_mapping', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='projects.projectmapping', verbose_name='项目映射')),
+                ('region', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='region.region', verbose_name='地区')),
+                ('specification', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='specification.specification', verbose_name='规格')),
+            ],
+            options={
+                'verbose_name': '项目价格月度汇总',
+                'verbose_name_plural': '项目价格月度汇总',
+                'db_table': 'PROJECT_MONTHLY_ROLLUP',
+                'indexes': [models.Index(fields=['specification', 'month'], name='rollup_spec_month_idx'), models.Index(fields=['citypy', 'specification', 'month'], name='rollup_city_spec_month_idx')],
+                'unique_together': {('project_mapping', 'category', 'specification', 'month')},
+            },
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
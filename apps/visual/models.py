@@ -1,3 +1,45 @@
+# apps/visual/models.py
 from django.db import models
 
-# Create your models here.
+from apps.category.models import MaterialCategory
+from apps.projects.models import ProjectMapping
+from apps.region.models import Region
+from apps.specification.models import Specification
+
+
+class ProjectMonthlyRollup(models.Model):
+    """
+    项目价格月度汇总表：按 (项目映射, 物资类别, 规格, 月份) 汇总项目数据，可视化接口只读这张表
+
+    地区和城市拼音取自项目映射，随项目映射和地区的修改同步；
+    汇总值由 rollups.refresh_project_rollups 按 (项目映射, 月份) 从项目表重新计算。
+    """
+    id = models.AutoField(primary_key=True)
+    project_mapping = models.ForeignKey(ProjectMapping, on_delete=models.CASCADE, verbose_name='项目映射')
+    region = models.ForeignKey(Region, on_delete=models.CASCADE, verbose_name='地区')
+    citypy = models.CharField('城市拼音', max_length=50, blank=True)
+    category = models.ForeignKey(MaterialCategory, on_delete=models.CASCADE, verbose_name='物资类别')
+    specification = models.ForeignKey(Specification, on_delete=models.CASCADE, verbose_name='规格')
+    month = models.DateField('月份')  # 当月第一天
+    project_count = models.PositiveIntegerField('项目数', default=0)
+    unit_price_sum = models.DecimalField('单价合计', max_digits=20, decimal_places=2, default=0)
+    quantity_sum = models.DecimalField('数量合计', max_digits=20, decimal_places=2, default=0)
+    amount_sum = models.DecimalField('金额合计', max_digits=20, decimal_places=2, default=0)
+    unit_price_min = models.DecimalField('最低单价', max_digits=15, decimal_places=2)
+    unit_price_max = models.DecimalField('最高单价', max_digits=15, decimal_places=2)
+
+    class Meta:
+        db_table = 'PROJECT_MONTHLY_ROLLUP'
+        verbose_name = '项目价格月度汇总'
+        verbose_name_plural = '项目价格月度汇总'
+        unique_together = ('project_mapping', 'category', 'specification', 'month')
+        indexes = [
+            # 柱状图按规格和月份范围汇总
+            models.Index(fields=['specification', 'month'], name='rollup_spec_month_idx'),
+            # 折线图、混凝土价格图按城市拼音、规格和月份范围汇总
+            models.Index(fields=['citypy', 'specification', 'month'], name='rollup_city_spec_month_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.project_mapping_id} - {self.month:%Y-%m}"
+
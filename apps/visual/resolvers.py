@@ -0,0 +1,28 @@
+# apps/visual/resolvers.py
+from apps.projects.models import ProjectMapping
+from apps.region.models import Region
+
+
+def city_regions(citypys=None):
+    """
+    市级地区（district 为空）{城市拼音: Region}，一次查询
+
+    citypys 为空时返回全部市级地区，否则只返回这些城市拼音对应的地区。
+    """
+    regions = Region.objects.filter(district='').order_by('id')
+    if citypys is not None:
+        regions = regions.filter(citypy__in=citypys)
+    return {region.citypy: region for region in regions}
+
+
+def mapping_regions(project_names):
+    """
+    {项目名称: 地区}，一次查询读取这些项目映射及其地区
+
+    同名的项目映射取ID最小的一条，与按名称逐个 get 的结果一致（名称唯一时）。
+    """
+    mappings = ProjectMapping.objects.filter(
+        project_name__in=set(project_names)
+    ).select_related('region').order_by('-id')
+    # 倒序写入字典，同名时ID最小的一条最后写入
+    return {mapping.project_name: mapping.region for mapping in mappings}
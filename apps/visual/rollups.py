@@ -0,0 +1,134 @@
+# apps/visual/rollups.py
+import calendar
+import threading
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+
+from apps.common.chart_cache import invalidate_chart_cache
+from apps.projects.models import Project, ProjectMapping
+from .models import ProjectMonthlyRollup
+
+# 每次刷新的 (项目映射, 月份) 个数
+REFRESH_BATCH_SIZE = 500
+
+_pending = threading.local()
+
+
+def month_start(value):
+    """日期所在月的第一天"""
+    return value.replace(day=1)
+
+
+def _month_end(month):
+    return month.replace(day=calendar.monthrange(month.year, month.month)[1])
+
+
+def _aggregate(projects):
+    """按 (项目映射, 物资类别, 规格, 月份) 分组汇总项目，返回未保存的汇总行"""
+    rows = projects.order_by().annotate(
+        month=TruncMonth('arrival_date')
+    ).values(
+        'project_mapping_id', 'project_mapping__region_id', 'project_mapping__region__citypy',
+        'category_id', 'specification_id', 'month',
+    ).annotate(
+        project_count=Count('id'),
+        unit_price_sum=Sum('unit_price'),
+        quantity_sum=Sum('quantity'),
+        amount_sum=Sum('total_amount'),
+        unit_price_min=Min('unit_price'),
+        unit_price_max=Max('unit_price'),
+    )
+    return [
+        ProjectMonthlyRollup(
+            project_mapping_id=row['project_mapping_id'],
+            region_id=row['project_mapping__region_id'],
+            citypy=row['project_mapping__region__citypy'] or '',
+            category_id=row['category_id'],
+            specification_id=row['specification_id'],
+            month=row['month'],
+            project_count=row['project_count'],
+            unit_price_sum=row['unit_price_sum'],
+            quantity_sum=row['quantity_sum'],
+            amount_sum=row['amount_sum'] or 0,
+            unit_price_min=row['unit_price_min'],
+            unit_price_max=row['unit_price_max'],
+        )
+        for row in rows
+    ]
+
+
+def refresh_project_rollups(keys, batch_size=REFRESH_BATCH_SIZE):
+    """
+    按项目表的当前数据重新计算 (项目映射ID, 月份) 对应的汇总行，返回写入的汇总行数
+
+    每批先删除这些项目映射和月份的旧汇总行，再写入重新分组的结果；
+    刷新结果只取决于项目表，同一个键重复刷新没有副作用。
+    """
+    keys = sorted({(mapping_id, month_start(month)) for mapping_id, month in keys})
+    count = 0
+    for i in range(0, len(keys), batch_size):
+        mappings_by_month = defaultdict(list)
+        for mapping_id, month in keys[i:i + batch_size]:
+            mappings_by_month[month].append(mapping_id)
+
+        project_filter = Q()
+        rollup_filter = Q()
+        for month, mapping_ids in mappings_by_month.items():
+            project_filter |= Q(project_mapping_id__in=mapping_ids,
+                                arrival_date__gte=month, arrival_date__lte=_month_end(month))
+            rollup_filter |= Q(project_mapping_id__in=mapping_ids, month=month)
+
+        rollups = _aggregate(Project.objects.filter(project_filter))
+        with transaction.atomic():
+            ProjectMonthlyRollup.objects.filter(rollup_filter).delete()
+            ProjectMonthlyRollup.objects.bulk_create(rollups)
+        count += len(rollups)
+    # 汇总在项目写入的事务提交后才刷新，刷新完成后再次更新版本号，避免缓存刷新前的结果
+    invalidate_chart_cache()
+    return count
+
+
+def rebuild_project_rollups():
+    """清空并按全部项目重建汇总表，返回写入的汇总行数"""
+    rollups = _aggregate(Project.objects.all())
+    with transaction.atomic():
+        ProjectMonthlyRollup.objects.all().delete()
+        ProjectMonthlyRollup.objects.bulk_create(rollups, batch_size=2000)
+    invalidate_chart_cache()
+    return len(rollups)
+
+
+def _flush_pending():
+    keys = getattr(_pending, 'keys', None)
+    if keys:
+        _pending.keys = set()
+        refresh_project_rollups(keys)
+
+
+def schedule_rollup_refresh(keys):
+    """
+    登记需要刷新的 (项目映射ID, 日期)，在当前事务提交后统一刷新；不在事务中时立即刷新
+
+    批量删除时每条项目都会登记一次，同一事务内的键合并后只刷新一次。
+    事务回滚时已登记的键会在下一次刷新时一并重新计算，结果仍与项目表一致。
+    """
+    if not hasattr(_pending, 'keys'):
+        _pending.keys = set()
+    _pending.keys.update((mapping_id, month_start(day)) for mapping_id, day in keys)
+    transaction.on_commit(_flush_pending)
+
+
+def sync_rollup_regions(mapping_ids=None):
+    """项目映射改了地区、或地区改了城市拼音后，同步汇总行的地区和城市拼音"""
+    rollups = ProjectMonthlyRollup.objects.all()
+    if mapping_ids is not None:
+        rollups = rollups.filter(project_mapping_id__in=mapping_ids)
+    mapping = ProjectMapping.objects.filter(id=OuterRef('project_mapping_id'))
+    invalidate_chart_cache()
+    return rollups.update(
+        region_id=Subquery(mapping.values('region_id')[:1]),
+        citypy=Coalesce(Subquery(mapping.values('region__citypy')[:1]), Value('')),
+    )
@@ -0,0 +1,49 @@
+# apps/visual/signals.py
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from apps.projects.models import Project, ProjectMapping
+from apps.region.models import Region
+from .rollups import schedule_rollup_refresh, sync_rollup_regions
+
+
+@receiver(pre_save, sender=Project)
+def remember_rollup_key(sender, instance, raw=False, **kwargs):
+    """记录修改前的项目映射和到货日期，修改后原来所在的汇总行也需要刷新"""
+    if raw or instance.pk is None:
+        return
+    instance._rollup_previous_key = Project.objects.filter(pk=instance.pk).values_list(
+        'project_mapping_id', 'arrival_date'
+    ).first()
+
+
+@receiver(post_save, sender=Project)
+def refresh_saved_project_rollup(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    keys = [(instance.project_mapping_id, instance.arrival_date)]
+    previous_key = getattr(instance, '_rollup_previous_key', None)
+    if previous_key:
+        keys.append(previous_key)
+    schedule_rollup_refresh(keys)
+
+
+@receiver(post_delete, sender=Project)
+def refresh_deleted_project_rollup(sender, instance, **kwargs):
+    schedule_rollup_refresh([(instance.project_mapping_id, instance.arrival_date)])
+
+
+@receiver(post_save, sender=ProjectMapping)
+def sync_mapping_rollup_region(sender, instance, created=False, raw=False, **kwargs):
+    """项目映射修改地区后同步汇总行"""
+    if raw or created:
+        return
+    sync_rollup_regions([instance.id])
+
+
+@receiver(post_save, sender=Region)
+def sync_region_rollup_citypy(sender, instance, created=False, raw=False, **kwargs):
+    """地区修改城市拼音后同步汇总行"""
+    if raw or created:
+        return
+    sync_rollup_regions(ProjectMapping.objects.filter(region=instance).values('id'))
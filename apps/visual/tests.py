@@ -1,3 +1,329 @@
+import contextlib
+import datetime
+import io
+from decimal import Decimal
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+
+from apps.brand.models import Brand
+from apps.category.models import MaterialCategory
+from apps.price.models import ConcretePrice
+from apps.projects.bulk import bulk_delete_projects
+from apps.projects.models import Project, ProjectMapping, ProjectSearchDocument
+from apps.projects.search import rebuild_search_documents
+from apps.region.models import Region
+from apps.specification.models import Specification
+from apps.supplier.models import Supplier
+from apps.users.models import User
+from .benchmark import run_chart_benchmark
+from .models import ProjectMonthlyRollup
+from .rollups import rebuild_project_rollups
+
+CITIES = (('武汉市', 'wuhan'), ('黄冈市', 'huanggang'), ('襄阳市', 'xiangyang'))
+
+
+def create_chart_data(mappings_per_city, months):
+    """按城市创建项目映射，每个项目映射每月一条C30项目数据，并创建每月的信息价"""
+    user = User.objects.create(username='chart', permission='admin')
+    category = MaterialCategory.objects.create(category_name='商品混凝土')
+    specification = Specification.objects.create(category=category, specification_name='C30')
+    supplier = Supplier.objects.create(supplier_name='供应商')
+    brand = Brand.objects.create(brand_name='/')
+    mappings = []
+    for city, citypy in CITIES:
+        city_region = Region.objects.create(city=city, citypy=citypy)
+        district = Region.objects.create(city=city, citypy=citypy, district=f'{city}某区')
+        for i in range(mappings_per_city):
+            # 一半项目映射挂在区县上，按城市拼音仍属于该市
+            region = district if i % 2 else city_region
+            mappings.append(ProjectMapping.objects.create(project_name=f'{city}项目{i}', region=region))
+
+    month_starts = [datetime.date(2023 + month // 12, month % 12 + 1, 1) for month in range(months)]
+    Project.objects.bulk_create([
+        Project(
+            project_mapping=mapping,
+            arrival_date=month_start + datetime.timedelta(days=9),
+            supplier=supplier,
+            category=category,
+            specification=specification,
+            quantity=Decimal('10'),
+            unit_price=Decimal('450') + index,
+            brand=brand,
+            user=user,
+        )
+        for index, mapping in enumerate(mappings)
+        for month_start in month_starts
+    ])
+    ConcretePrice.objects.bulk_create([
+        ConcretePrice(date=month_start, wuhan=Decimal('460'), huanggang=Decimal('440'), xiangyang=Decimal('430'))
+        for month_start in month_starts
+    ])
+    # bulk_create 不触发信号，直接重建月度汇总
+    rebuild_project_rollups()
+    return user
+
+
+class ChartHntDataQueryCountTests(TestCase):
+    """
+    chart_hntdata 的查询条数与项目、项目映射和信息价的数量无关
+    """
+
+    # 会话和用户 2 条，信息价、月度汇总、项目映射地区、选中的市级地区各 1 条
+    EXPECTED_QUERIES = 6
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_chart_data(mappings_per_city=6, months=24)
+
+    def setUp(self):
+        # 图表接口的响应缓存不随测试事务回滚，每个测试从空缓存开始
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def get_chart_data(self, regions, start_date='2023-01', end_date='2024-12'):
+        return self.client.get(reverse('visual:chart_hntdata'), {
+            'regions[]': regions,
+            'start_date': start_date,
+            'end_date': end_date,
+        })
+
+    def test_all_regions_two_years(self):
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            response = self.get_chart_data([citypy for _, citypy in CITIES])
+        data = response.json()
+        self.assertEqual(len(data['project_data']), 3 * 6 * 24)
+        self.assertEqual(len(data['reference_price_data']), 24)
+        self.assertEqual(sorted(data['regions']), sorted(city for city, _ in CITIES))
+        # 挂在区县上的项目映射也返回所属的市
+        for row in data['project_data']:
+            self.assertTrue(row['name'].startswith(row['region']), row)
+        self.assertEqual(data['reference_price_data'][0]['武汉市'], 460.0)
+
+    def test_query_count_independent_of_range(self):
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            self.get_chart_data(['wuhan'], start_date='2023-01', end_date='2023-01')
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            self.get_chart_data([citypy for _, citypy in CITIES], start_date='2023-01', end_date='2024-12')
+
+
+class ProjectMonthlyRollupTests(TestCase):
+    """
+    项目增删改后月度汇总与按项目表重新汇总的结果一致
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        create_chart_data(mappings_per_city=2, months=3)
+        cls.project = Project.objects.order_by('id').first()
+
+    def rollup_values(self):
+        return list(ProjectMonthlyRollup.objects.order_by(
+            'project_mapping_id', 'category_id', 'specification_id', 'month'
+        ).values_list(
+            'project_mapping_id', 'region_id', 'citypy', 'specification_id', 'month', 'project_count',
+            'unit_price_sum', 'quantity_sum', 'amount_sum', 'unit_price_min', 'unit_price_max',
+        ))
+
+    def assertRollupsMatchProjects(self):
+        maintained = self.rollup_values()
+        rebuild_project_rollups()
+        self.assertEqual(maintained, self.rollup_values())
+
+    def test_save_new_project(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.pk = None
+            self.project.unit_price = Decimal('520')
+            self.project.save()
+        rollup = ProjectMonthlyRollup.objects.get(project_mapping=self.project.project_mapping,
+                                                  month=self.project.arrival_date.replace(day=1))
+        self.assertEqual(rollup.project_count, 2)
+        self.assertEqual(rollup.unit_price_max, Decimal('520'))
+        self.assertRollupsMatchProjects()
+
+    def test_move_project_to_another_month(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.arrival_date = datetime.date(2024, 6, 15)
+            self.project.save()
+        self.assertFalse(ProjectMonthlyRollup.objects.filter(
+            project_mapping=self.project.project_mapping, month=datetime.date(2023, 1, 1)
+        ).exists())
+        self.assertRollupsMatchProjects()
+
+    def test_delete_project(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Project.objects.filter(project_mapping=self.project.project_mapping).delete()
+        self.assertFalse(ProjectMonthlyRollup.objects.filter(project_mapping=self.project.project_mapping).exists())
+        self.assertRollupsMatchProjects()
+
+    def test_queryset_update(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Project.objects.filter(pk=self.project.pk).update(unit_price=Decimal('900'))
+        rollup = ProjectMonthlyRollup.objects.get(project_mapping=self.project.project_mapping,
+                                                  month=self.project.arrival_date.replace(day=1))
+        self.assertEqual(rollup.unit_price_sum, Decimal('900'))
+        self.assertEqual(rollup.amount_sum, Decimal('9000'))
+        self.assertRollupsMatchProjects()
+
+    def test_queryset_update_moves_month(self):
+        # 查询条件在修改后不再匹配这些项目
+        old_month = self.project.arrival_date.replace(day=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Project.objects.filter(arrival_date__lt=datetime.date(2023, 2, 1)).update(
+                arrival_date=datetime.date(2024, 6, 15)
+            )
+        self.assertFalse(ProjectMonthlyRollup.objects.filter(month=old_month).exists())
+        self.assertRollupsMatchProjects()
+
+    def test_bulk_create_and_bulk_update(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            copy = Project.objects.get(pk=self.project.pk)
+            copy.pk = None
+            copy.arrival_date = datetime.date(2024, 8, 1)
+            Project.objects.bulk_create([copy])
+        self.assertRollupsMatchProjects()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.arrival_date = datetime.date(2024, 9, 1)
+            self.project.quantity = Decimal('3')
+            Project.objects.bulk_update([self.project], ['arrival_date', 'quantity'])
+        self.assertTrue(ProjectMonthlyRollup.objects.filter(month=datetime.date(2024, 9, 1)).exists())
+        self.assertRollupsMatchProjects()
+
+    def test_bulk_delete_projects(self):
+        rebuild_search_documents()
+        mapping = self.project.project_mapping
+        projects = Project.objects.filter(project_mapping=mapping)
+        ids = list(projects.values_list('id', flat=True))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(bulk_delete_projects(projects, batch_size=2), len(ids))
+        self.assertFalse(Project.objects.filter(id__in=ids).exists())
+        self.assertFalse(ProjectSearchDocument.objects.filter(project_id__in=ids).exists())
+        self.assertFalse(ProjectMonthlyRollup.objects.filter(project_mapping=mapping).exists())
+        self.assertRollupsMatchProjects()
+
+    def test_mapping_region_change(self):
+        mapping = self.project.project_mapping
+        mapping.region = Region.objects.get(citypy='xiangyang', district='')
+        mapping.save()
+        self.assertEqual(
+            set(ProjectMonthlyRollup.objects.filter(project_mapping=mapping).values_list('citypy', flat=True)),
+            {'xiangyang'}
+        )
+        self.assertRollupsMatchProjects()
+
+
+class ChartHntBarInfoPriceTests(TestCase):
+    """
+    柱状图的信息价：单月项目取当月信息价，跨月项目取起止月份内信息价的平均值
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_chart_data(mappings_per_city=1, months=3)
+        for month, price in ((1, '400'), (2, '430'), (3, '470')):
+            ConcretePrice.objects.filter(date=datetime.date(2023, month, 1)).update(wuhan=Decimal(price))
+
+    def setUp(self):
+        # 图表接口的响应缓存不随测试事务回滚，每个测试从空缓存开始
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def get_bar_data(self, **params):
+        data = self.client.get(reverse('visual:chart_hnt_bar_data'), params).json()
+        return {row['region_py']: row for row in data['project_data']}, data['reference_price_data']
+
+    def test_single_month(self):
+        projects, reference = self.get_bar_data(month='2023-03')
+        self.assertEqual(projects['wuhan']['duration_months'], 1)
+        self.assertEqual(projects['wuhan']['info_price'], 470.0)
+        self.assertEqual(projects['huanggang']['info_price'], 440.0)
+        self.assertEqual(reference, [{'date': '2023-03', '武汉市': 470.0, '黄冈市': 440.0, '襄阳市': 430.0}])
+
+    def test_month_span_average(self):
+        projects, reference = self.get_bar_data(year='2023')
+        self.assertEqual(projects['wuhan']['duration_months'], 3)
+        self.assertEqual(projects['wuhan']['project_period'], '2023-01至2023-03')
+        self.assertEqual(projects['wuhan']['info_price'], 433.33)
+        self.assertEqual(reference[0]['武汉市'], 433.33)
+
+    def test_one_row_per_project_over_range(self):
+        # 每个项目在查询范围内只返回一行，平均单价按范围内全部到货记录计算（不再按到货日期分行）
+        project = Project.objects.filter(project_mapping__region__citypy='wuhan').order_by('id').first()
+        with self.captureOnCommitCallbacks(execute=True):
+            project.pk = None
+            project.arrival_date = datetime.date(2023, 2, 20)
+            project.unit_price = Decimal('480')
+            project.save()
+        data = self.client.get(reverse('visual:chart_hnt_bar_data'), {'year': '2023'}).json()
+        self.assertEqual(len(data['project_data']), len(CITIES))
+        row = next(row for row in data['project_data'] if row['region_py'] == 'wuhan')
+        self.assertEqual(row['name'], project.project_mapping.project_name)
+        self.assertEqual(row['date'], '2023')
+        self.assertEqual(row['price'], (450 * 3 + 480) / 4)
+        self.assertEqual(row['project_period'], '2023-01至2023-03')
+
+
+class MonthBucketingTests(TestCase):
+    """
+    月份分组的边界：月末、月初、跨年和闰年
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_chart_data(mappings_per_city=1, months=1)
+        cls.mapping = ProjectMapping.objects.get(project_name='武汉市项目0')
+        template = Project.objects.filter(project_mapping=cls.mapping).first()
+        # 月末、月初、年末、年初和闰年2月29日
+        for day in ('2023-01-31', '2023-02-01', '2023-12-31', '2024-01-01', '2024-02-29'):
+            template.pk = None
+            template.arrival_date = datetime.date.fromisoformat(day)
+            template.save()
+        rebuild_project_rollups()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_month_boundaries(self):
+        expected = {}
+        for arrival_date in Project.objects.filter(project_mapping=self.mapping).values_list('arrival_date', flat=True):
+            month = arrival_date.replace(day=1)
+            expected[month] = expected.get(month, 0) + 1
+        self.assertEqual(
+            dict(ProjectMonthlyRollup.objects.filter(project_mapping=self.mapping).values_list('month', 'project_count')),
+            expected
+        )
+        self.assertEqual(expected[datetime.date(2023, 1, 1)], 2)
+        self.assertEqual(expected[datetime.date(2024, 2, 1)], 1)
+
+    def test_line_data_falls_back_to_latest_year(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            data = self.client.get(reverse('visual:chart_hnt_line_data'), {
+                'region': 'wuhan', 'start_date': '2025-01', 'end_date': '2025-03',
+            }).json()
+        self.assertEqual(sorted({row['date'] for row in data['project_data']}), ['2024-01', '2024-02'])
+
+
+class ChartDigestTests(TestCase):
+    """
+    月度汇总（TruncMonth 分组）和图表接口的结果与记录的摘要一致
+
+    摘要只在 SQLite（DJANGO_DB_ENGINE=sqlite）上验证过；在 MySQL 上运行本测试可以检查两种数据库的结果
+    是否相同，不一致时先用 benchmark_charts --compare 找出不同的接口。
+    """
+
+    # SQLite 上 run_chart_benchmark(projects=500, mappings=12, months=14, seed=1) 的结果摘要
+    BENCHMARK_DIGESTS = {
+        'rebuild_project_rollups': 'df64d8d5fa96fe32920eefd84f9692587402bb48',
+        'chart_hnt_bar_data:year': '74df42a1efbf456b62e6fe36f41082da4d2b9cdc',
+        'chart_hnt_bar_data:month': 'f6199997fabdce5f69782e7aa1f4e547ad48e131',
+        'chart_hnt_line_data': '03c2da0a2dfb3522d5b2b0ca50e7dc011a76b7a1',
+        'chart_hntdata': '01eae374e6baaaad9d7c3a227c437d01cd7eaf4f',
+        'price_chart_data': 'b445fa0f3a5c617d584d7254e25001984dff0ef5',
+    }
 
-# Create your tests here.
+    def test_benchmark_results_match_recorded_digests(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = run_chart_benchmark(projects=500, mappings=12, months=14, seed=1, repeat=1)
+        self.assertEqual({result['name']: result['digest'] for result in results}, self.BENCHMARK_DIGESTS)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -99,6 +100,16 @@ DATABASES = {
     }
 }
 
+# 设置环境变量 DJANGO_DB_ENGINE=sqlite 时改用SQLite（本地测试和性能对比），
+# 数据库文件由 DJANGO_SQLITE_PATH 指定，默认为项目根目录下的 db.sqlite3
+if os.environ.get('DJANGO_DB_ENGINE') == 'sqlite':
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get('DJANGO_SQLITE_PATH', BASE_DIR / "db.sqlite3"),
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -138,6 +149,18 @@ STATIC_URL = "static/"
 STATICFILES_DIRS = [
     BASE_DIR / "static",
 ]
+
+# 媒体文件（用户上传文件）
+MEDIA_ROOT = BASE_DIR / "media"
+
+# 缓存：Web进程和导入worker需要共享缓存版本号，不能使用进程内的 LocMemCache
+# 多台服务器部署时改为 Redis 或 Memcached
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / "cache",
+    }
+}
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -145,3 +168,25 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # 自定义用户模型
 AUTH_USER_MODEL = 'users.User'
+
+# 数据导入：流式读取和批量写入时每批的行数
+IMPORT_BATCH_SIZE = 1000
+# 数据导入：排队中的上传文件存放目录，由 run_import_worker 处理
+IMPORT_UPLOAD_DIR = MEDIA_ROOT / "uploads"
+# 数据导入：失败行错误报告（CSV）存放目录
+IMPORT_REPORT_DIR = MEDIA_ROOT / "reports"
+# 数据导入：开始后超过该时间（秒）仍在处理中的任务视为worker已中断，标记为失败
+IMPORT_STALE_TIMEOUT = 60 * 60 * 2
+# 项目列表筛选选项缓存时间（秒），数据变化时通过版本号立即失效
+PROJECT_FACET_CACHE_TIMEOUT = 60 * 60
+# 项目数据导出：每次从数据库读取的行数
+EXPORT_CHUNK_SIZE = 2000
+# 项目数据JSON接口：默认和最多返回的行数
+PROJECT_API_DEFAULT_ROWS = 5000
+PROJECT_API_MAX_ROWS = 20000
+# 项目表单自动补全：每次最多返回的选项数
+AUTOCOMPLETE_LIMIT = 20
+# 项目批量修改/删除：每条 UPDATE/DELETE 语句处理的行数
+BULK_EDIT_BATCH_SIZE = 1000
+# 图表JSON接口的响应缓存时间（秒），项目或信息价变化时通过版本号立即失效
+CHART_CACHE_TIMEOUT = 60 * 60 * 24
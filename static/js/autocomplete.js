@@ -0,0 +1,60 @@
+// static/js/autocomplete.js
+// 自动补全输入框：输入关键字后从接口加载匹配的选项，选中后把ID写入隐藏字段
+// 用法：<input class="autocomplete-input" data-url="接口地址" data-target="隐藏字段ID">
+$(function() {
+    $('.autocomplete-input').each(function() {
+        var input = $(this);
+        var hidden = $('#' + input.data('target'));
+        var menu = $('<div class="dropdown-menu autocomplete-menu"></div>').insertAfter(input);
+        var timer = null;
+
+        function load() {
+            var query = input.val();
+            $.getJSON(input.data('url'), {q: query}, function(data) {
+                // 请求返回前已经输入了新的关键字
+                if (input.val() !== query) {
+                    return;
+                }
+                menu.empty();
+                if (data.results.length === 0) {
+                    menu.append('<span class="dropdown-item-text text-muted">无匹配项</span>');
+                }
+                $.each(data.results, function(index, item) {
+                    $('<button type="button" class="dropdown-item"></button>')
+                        .text(item.text)
+                        .data('item', item)
+                        .appendTo(menu);
+                });
+                menu.addClass('show');
+            });
+        }
+
+        input.on('input', function() {
+            // 修改关键字后清空已选中的ID，必须重新从列表中选择
+            if (hidden.val()) {
+                hidden.val('').trigger('change');
+            }
+            clearTimeout(timer);
+            timer = setTimeout(load, 250);
+        });
+
+        input.on('focus', function() {
+            if (!hidden.val()) {
+                load();
+            }
+        });
+
+        input.on('blur', function() {
+            menu.removeClass('show');
+        });
+
+        // 使用 mousedown，在输入框失去焦点之前完成选择
+        menu.on('mousedown', '.dropdown-item', function(e) {
+            e.preventDefault();
+            var item = $(this).data('item');
+            input.val(item.text);
+            hidden.val(item.id).trigger('change');
+            menu.removeClass('show');
+        });
+    });
+});